@@ -1 +1,4 @@
-from . import monkeypatch  # noqa
+from . import monkeypatch, patching  # noqa
+patching.install()
+
+default_app_config = 'appsembleredx.apps.AppsemblerEdxConfig'
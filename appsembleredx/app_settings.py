@@ -1,56 +1,342 @@
+"""
+Appsembler settings, from settings.ENV_TOKENS['APPSEMBLER_FEATURES'].
+
+Read them through the features object:
+
+    from appsembleredx.app_settings import features
+
+    if features.USE_OPEN_ENDED_CERTS_DEFAULTS:
+        ...
+
+Nothing is read when this module is imported.  The tokens are read and
+validated together on first access, and kept until features.reload() is
+called, e.g. after changing APPSEMBLER_FEATURES in a running process.
+Functions registered with features.on_reload() are called on reload, to
+refresh anything derived from the settings.
+
+The settings in ORG_SETTINGS can be overridden per organization, in
+ORG_OVERRIDES, e.g. {"ORG_OVERRIDES": {"AcmeX": {"ACTIVATE_DEFAULT_CERTS": false}}}.
+Read them for a course through features.for_course(course_key), which
+returns the course's organization's OrgSettings:
+
+    if features.for_course(course_key).USE_OPEN_ENDED_CERTS_DEFAULTS:
+        ...
+
+Each organization's OrgSettings is built when the tokens are read, so this
+is a dict lookup.
+
+The settings can still be imported from this module, as they could before
+they were read lazily, e.g. from appsembleredx.app_settings import
+DEFAULT_COURSE_MODE, but that is deprecated.
+"""
+from collections import namedtuple
+import logging
 from os import environ
+import sys
+import threading
+from types import ModuleType
+import warnings
 
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.translation import ugettext_lazy as _
-from course_modes import models as course_modes_models
 
 try:
-    ENV_TOKENS = settings.ENV_TOKENS['APPSEMBLER_FEATURES']
+    from django.core.signals import setting_changed
+except ImportError:  # before Django 1.8
+    from django.test.signals import setting_changed
 
+
+logger = logging.getLogger(__name__)
+
+# ENV_TOKENS won't be available in these
+TEST_SETTINGS_MODULES = (
+    "lms.envs.acceptance", "lms.envs.test",
+    "cms.envs.acceptance", "cms.envs.test",
+)
+
+DEFAULT_ACCREDITATION_HELP = _("Additional or alternative explanation of accreditation conferred, "
+                               "standards met, or similar description.")
+
+NUMBER = (int, long, float)
+SEQUENCE = (list, tuple)
+# values of XBlock field choices, see mixins.build_field_values
+CHOICES = (list, tuple, dict)
+
+# name, default, and the types a value must have if it's not None (None for any)
+Setting = namedtuple('Setting', ['name', 'default', 'types'])
+
+SETTINGS = (
     # courses
-    DEFAULT_COURSE_MODE_SLUG = ENV_TOKENS.get("DEFAULT_COURSE_MODE_SLUG", "honor")
-    mode_name_from_slug = _(DEFAULT_COURSE_MODE_SLUG.capitalize())
-    try:
-        DEFAULT_COURSE_MODE = course_modes_models.Mode(DEFAULT_COURSE_MODE_SLUG, mode_name_from_slug,
-                                                       0, '', 'usd', None, None, None)
-    except TypeError:
-        # eucalyptus adds new field, bulk_sku
-        DEFAULT_COURSE_MODE = course_modes_models.Mode(DEFAULT_COURSE_MODE_SLUG, mode_name_from_slug,
-                                                       0, '', 'usd', None, None, None, None)
-
-    ENABLE_CREDITS_EXTRA_FIELDS = ENV_TOKENS.get("ENABLE_CREDITS_EXTRA_FIELDS", False)
-    CREDIT_PROVIDERS = ENV_TOKENS.get("CREDIT_PROVIDERS", [])
-    CREDIT_PROVIDERS_DEFAULT = ENV_TOKENS.get("CREDIT_PROVIDERS_DEFAULT", None)
-    DEFAULT_ACCREDITATION_HELP = _("Additional or alternative explanation of accreditation conferred, "
-                                   "standards met, or similar description.")
-    ACCREDITATION_CONFERRED_HELP = ENV_TOKENS.get("ACCREDITATION_CONFERRED_HELP", DEFAULT_ACCREDITATION_HELP)
-
-    ENABLE_INSTRUCTION_TYPE_EXTRA_FIELDS = ENV_TOKENS.get("ENABLE_INSTRUCTION_TYPE_EXTRA_FIELDS", [])
-    COURSE_INSTRUCTIONAL_METHODS = ENV_TOKENS.get("COURSE_INSTRUCTIONAL_METHODS", [])
-    COURSE_FIELDS_OF_STUDY = ENV_TOKENS.get("COURSE_FIELDS_OF_STUDY", [])
-    COURSE_INSTRUCTIONAL_METHOD_DEFAULT = ENV_TOKENS.get("COURSE_INSTRUCTIONAL_METHOD_DEFAULT", None)
-    COURSE_INSTRUCTION_LOCATIONS = ENV_TOKENS.get("COURSE_INSTRUCTION_LOCATIONS", [])
-    COURSE_INSTRUCTION_LOCATION_DEFAULT = ENV_TOKENS.get("COURSE_INSTRUCTION_LOCATION_DEFAULT", None)
+    Setting("DEFAULT_COURSE_MODE_SLUG", "honor", basestring),
+    Setting("ENABLE_CREDITS_EXTRA_FIELDS", False, None),
+    Setting("CREDIT_PROVIDERS", [], CHOICES),
+    Setting("CREDIT_PROVIDERS_DEFAULT", None, None),
+    Setting("ACCREDITATION_CONFERRED_HELP", DEFAULT_ACCREDITATION_HELP, None),
+
+    Setting("ENABLE_INSTRUCTION_TYPE_EXTRA_FIELDS", [], None),
+    Setting("COURSE_INSTRUCTIONAL_METHODS", [], CHOICES),
+    Setting("COURSE_FIELDS_OF_STUDY", [], CHOICES),
+    Setting("COURSE_INSTRUCTIONAL_METHOD_DEFAULT", None, None),
+    Setting("COURSE_INSTRUCTION_LOCATIONS", [], CHOICES),
+    Setting("COURSE_INSTRUCTION_LOCATION_DEFAULT", None, None),
 
     # certificates
-    USE_OPEN_ENDED_CERTS_DEFAULTS = ENV_TOKENS.get("USE_OPEN_ENDED_CERTS_DEFAULTS", False)
-    ACTIVATE_DEFAULT_CERTS = ENV_TOKENS.get("ACTIVATE_DEFAULT_CERTS", True)
-    ALWAYS_ENABLE_SELF_GENERATED_CERTS = ENV_TOKENS.get("ALWAYS_ENABLE_SELF_GENERATED_CERTS", False)
-    DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED = ENV_TOKENS.get("DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED", False)
-    CERTS_HTML_VIEW_CONFIGURATION = ENV_TOKENS.get("CERTS_HTML_VIEW_CONFIGURATION", None)
-    LINKEDIN_ADDTOPROFILE_COMPANY_ID = ENV_TOKENS.get("LINKEDIN_ADDTOPROFILE_COMPANY_ID", None)
-    LINKEDIN_ADDTOPROFILE_LICENSE_ID = ENV_TOKENS.get("LINKEDIN_ADDTOPROFILE_LICENSE_ID", None)
-    DEFAULT_CERT_SIGNATORIES = ENV_TOKENS.get("DEFAULT_CERT_SIGNATORIES", None)
+    Setting("USE_OPEN_ENDED_CERTS_DEFAULTS", False, None),
+    Setting("ACTIVATE_DEFAULT_CERTS", True, None),
+    Setting("ALWAYS_ENABLE_SELF_GENERATED_CERTS", False, None),
+    Setting("DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED", False, None),
+    Setting("CERTS_HTML_VIEW_CONFIGURATION", None, dict),
+    Setting("LINKEDIN_ADDTOPROFILE_COMPANY_ID", None, None),
+    Setting("LINKEDIN_ADDTOPROFILE_LICENSE_ID", None, None),
+    Setting("DEFAULT_CERT_SIGNATORIES", None, SEQUENCE),
+
+    # run course_published handlers as Celery tasks, coalescing publishes of a
+    # course within the debounce window into a single run
+    Setting("RUN_PUBLISH_HANDLERS_ASYNC", True, None),
+    Setting("PUBLISH_HANDLERS_DEBOUNCE_SECONDS", 10, NUMBER),
+
+    # where to send timing and query counts of signal handlers and monkeypatched functions;
+    # see appsembleredx.instrumentation
+    Setting("HANDLER_METRICS_SINKS", [], SEQUENCE),
 
     # badges
-    DISABLE_COURSE_COMPLETION_BADGES = ENV_TOKENS.get("DISABLE_COURSE_COMPLETION_BADGES", False)
+    Setting("DISABLE_COURSE_COMPLETION_BADGES", False, None),
+
+    # names of patches in appsembleredx.monkeypatch not to apply
+    Setting("DISABLED_MONKEYPATCHES", [], SEQUENCE),
+
+    # settings in ORG_SETTINGS to use instead for courses of an organization, by organization
+    Setting("ORG_OVERRIDES", {}, dict),
+)
+
+SETTING_TYPES = dict((setting.name, setting.types) for setting in SETTINGS)
+
+# settings that can differ between organizations.  Not those that change
+# which fields and patches a process has, or the choices of fields, which
+# are fixed when the process starts.
+ORG_SETTINGS = (
+    "CREDIT_PROVIDERS_DEFAULT",
+    "COURSE_INSTRUCTIONAL_METHOD_DEFAULT",
+    "COURSE_INSTRUCTION_LOCATION_DEFAULT",
+    "USE_OPEN_ENDED_CERTS_DEFAULTS",
+    "ACTIVATE_DEFAULT_CERTS",
+    "ALWAYS_ENABLE_SELF_GENERATED_CERTS",
+    "DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED",
+    "DEFAULT_CERT_SIGNATORIES",
+    "DISABLE_COURSE_COMPLETION_BADGES",
+)
+
+# the ORG_SETTINGS of an organization, with its overrides applied
+OrgSettings = namedtuple('OrgSettings', ORG_SETTINGS)
 
 
-except AttributeError, e:
-    # these won"t be available in test
-    if environ.get("DJANGO_SETTINGS_MODULE") in (
-            "lms.envs.acceptance", "lms.envs.test",
-            "cms.envs.acceptance", "cms.envs.test"):
-        pass
-    else:
+def _read_tokens():
+    try:
+        return settings.ENV_TOKENS['APPSEMBLER_FEATURES']
+    except AttributeError:
+        if environ.get("DJANGO_SETTINGS_MODULE") in TEST_SETTINGS_MODULES:
+            return {}
         raise
+
+
+def _check(values, prefix=u""):
+    """
+    Errors in values, a dict of some of the settings
+    """
+    errors = []
+    for name, value in sorted(values.items()):
+        types = SETTING_TYPES[name]
+        if value is not None and types is not None and not isinstance(value, types):
+            errors.append(u"{}{} should be {}, got {!r}".format(
+                prefix, name,
+                u" or ".join(t.__name__ for t in (types if isinstance(types, tuple) else (types,))), value))
+
+    if isinstance(values.get("DEFAULT_CERT_SIGNATORIES"), SEQUENCE):
+        for i, signatory in enumerate(values["DEFAULT_CERT_SIGNATORIES"]):
+            if not isinstance(signatory, dict) or "signature_image_path" not in signatory:
+                errors.append(u"{}DEFAULT_CERT_SIGNATORIES[{}] should be a dict with a signature_image_path".format(
+                    prefix, i))
+    if isinstance(values.get("PUBLISH_HANDLERS_DEBOUNCE_SECONDS"), NUMBER) and \
+            values["PUBLISH_HANDLERS_DEBOUNCE_SECONDS"] < 0:
+        errors.append(u"{}PUBLISH_HANDLERS_DEBOUNCE_SECONDS can't be negative".format(prefix))
+    return errors
+
+
+def _compile_org_settings(values, errors):
+    """
+    OrgSettings by organization, from the validated global values
+    """
+    org_settings = {}
+    for org, overrides in sorted(values["ORG_OVERRIDES"].items()):
+        prefix = u"ORG_OVERRIDES[{!r}].".format(org)
+        if not isinstance(overrides, dict):
+            errors.append(u"ORG_OVERRIDES[{!r}] should be dict, got {!r}".format(org, overrides))
+            continue
+        unknown = sorted(set(overrides) - set(ORG_SETTINGS))
+        if unknown:
+            errors.append(u"{}{} can't be set per organization".format(prefix, u", ".join(unknown)))
+        known = dict((name, value) for name, value in overrides.items() if name in ORG_SETTINGS)
+        errors.extend(_check(known, prefix))
+        org_settings[org] = OrgSettings(**dict((name, known.get(name, values[name])) for name in ORG_SETTINGS))
+    return org_settings
+
+
+def compile_settings(tokens):
+    """
+    Validate APPSEMBLER_FEATURES tokens and return a dict of every setting,
+    defaults filled in.  Raises ImproperlyConfigured listing every bad value.
+    """
+    values = dict((name, tokens.get(name, default)) for name, default, types in SETTINGS)
+    errors = _check(values)
+    values["org_settings"] = {}
+    if isinstance(values["ORG_OVERRIDES"], dict):
+        values["org_settings"] = _compile_org_settings(values, errors)
+    values["default_org_settings"] = OrgSettings(**dict((name, values[name]) for name in ORG_SETTINGS))
+    if errors:
+        raise ImproperlyConfigured(u"Invalid APPSEMBLER_FEATURES: {}".format(u"; ".join(errors)))
+
+    values["mode_name_from_slug"] = _(values["DEFAULT_COURSE_MODE_SLUG"].capitalize())
+    return values
+
+
+def course_org(course_key):
+    """
+    Organization of a course, from its CourseKey or its key as a string
+    """
+    if isinstance(course_key, basestring):
+        from opaque_keys import InvalidKeyError
+        from opaque_keys.edx.keys import CourseKey
+        try:
+            course_key = CourseKey.from_string(course_key)
+        except InvalidKeyError:
+            return None
+    return getattr(course_key, 'org', None)
+
+
+class AppsemblerFeatures(object):
+    """
+    The settings in SETTINGS as attributes, plus mode_name_from_slug and
+    DEFAULT_COURSE_MODE, read on first access, and the OrgSettings of
+    organizations
+    """
+
+    def __init__(self, read_tokens=_read_tokens):
+        self._read_tokens = read_tokens
+        self._values = None
+        self._lock = threading.RLock()
+        self._reload_callbacks = []
+
+    def _get_values(self):
+        values = self._values
+        if values is None:
+            with self._lock:
+                if self._values is None:
+                    self._values = compile_settings(self._read_tokens())
+                values = self._values
+        return values
+
+    def __getattr__(self, name):
+        # only called for names not set on the instance or class
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._get_values()[name]
+        except KeyError:
+            raise AttributeError("No Appsembler setting {}".format(name))
+
+    @property
+    def DEFAULT_COURSE_MODE(self):  # pylint: disable=invalid-name
+        """
+        Mode namedtuple for the default course mode.  Built on first use, so
+        course_modes isn't imported before it's needed.
+        """
+        values = self._get_values()
+        if "DEFAULT_COURSE_MODE" not in values:
+            from course_modes.models import Mode
+            # the number of fields differs between releases (eucalyptus adds bulk_sku)
+            mode = dict.fromkeys(Mode._fields)
+            mode.update(slug=values["DEFAULT_COURSE_MODE_SLUG"], name=values["mode_name_from_slug"],
+                        min_price=0, suggested_prices='', currency='usd')
+            values["DEFAULT_COURSE_MODE"] = Mode(**mode)
+        return values["DEFAULT_COURSE_MODE"]
+
+    def for_org(self, org):
+        """
+        OrgSettings of an organization, the global values for those it
+        doesn't override
+        """
+        values = self._get_values()
+        return values["org_settings"].get(org, values["default_org_settings"])
+
+    def for_course(self, course_key):
+        """
+        OrgSettings of the organization of a course
+        """
+        return self.for_org(course_org(course_key))
+
+    def on_reload(self, callback):
+        """
+        Call callback() after every reload.  Returns callback, so this can be
+        used as a decorator.
+        """
+        self._reload_callbacks.append(callback)
+        return callback
+
+    def reload(self):
+        """
+        Read APPSEMBLER_FEATURES again on next access
+        """
+        with self._lock:
+            self._values = None
+        for callback in self._reload_callbacks:
+            try:
+                callback()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception(u"Appsembler settings reload callback %s failed", callback)
+
+
+features = AppsemblerFeatures()
+
+
+def _reload_on_setting_changed(setting, **kwargs):  # pylint: disable=unused-argument
+    if setting == 'ENV_TOKENS':
+        features.reload()
+
+
+setting_changed.connect(_reload_on_setting_changed)
+
+
+# module attributes the settings used to be, read through features
+DEPRECATED_ATTRIBUTES = frozenset([setting.name for setting in SETTINGS] +
+                                  ["mode_name_from_slug", "DEFAULT_COURSE_MODE", "ENV_TOKENS"])
+
+
+class _SettingsModule(ModuleType):
+    """
+    This module, with the settings in DEPRECATED_ATTRIBUTES as attributes
+    """
+
+    def __getattr__(self, name):
+        # only called for names not in the module
+        if name not in DEPRECATED_ATTRIBUTES:
+            raise AttributeError("module {} has no attribute {}".format(self.__name__, name))
+        if name == "ENV_TOKENS":
+            warnings.warn(u"appsembleredx.app_settings.ENV_TOKENS is deprecated, use "
+                          "settings.ENV_TOKENS['APPSEMBLER_FEATURES']", DeprecationWarning, stacklevel=2)
+            return _read_tokens()
+        warnings.warn(u"appsembleredx.app_settings.{0} is deprecated, use "
+                      "appsembleredx.app_settings.features.{0}".format(name), DeprecationWarning, stacklevel=2)
+        return getattr(features, name)
+
+
+def _install_settings_module():
+    module = sys.modules[__name__]
+    settings_module = _SettingsModule(__name__, __doc__)
+    settings_module.__dict__.update(module.__dict__)
+    # Python 2 clears a module's globals when the module goes away
+    settings_module._module = module  # pylint: disable=protected-access
+    sys.modules[__name__] = settings_module
+
+
+_install_settings_module()
@@ -0,0 +1,13 @@
+"""
+Django app configuration for appsembleredx
+"""
+from django.apps import AppConfig
+
+
+class AppsemblerEdxConfig(AppConfig):
+    name = 'appsembleredx'
+
+    def ready(self):
+        from appsembleredx import patching
+        # not at import: applying a patch reads APPSEMBLER_FEATURES
+        patching.apply_to_imported()
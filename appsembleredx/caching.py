@@ -0,0 +1,90 @@
+"""
+Versioned cache keys for appsembleredx.  Every key in a namespace carries
+the namespace's current version, so bumping the version invalidates the
+whole namespace at once, e.g. after a bulk write that sends no model
+signals.  Single entries can still be invalidated by deleting their key.
+
+Entries read on hot paths can instead be stored under a fixed key with the
+version they were cached at (set_versioned), so that get_versioned reads
+the entry and the namespace version in one round trip.
+"""
+from django.core.cache import cache
+
+
+DEFAULT_TIMEOUT = 60 * 60 * 24
+
+NAMESPACE_VERSION_KEY = u"appsembleredx.{}.version"
+
+
+def namespace_version(namespace):
+    """
+    Current version of a cache namespace
+    """
+    version_key = NAMESPACE_VERSION_KEY.format(namespace)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, 1, None)
+        version = cache.get(version_key) or 1
+    return version
+
+
+def bump_namespace_version(namespace):
+    """
+    Invalidate every key in a cache namespace
+    """
+    version_key = NAMESPACE_VERSION_KEY.format(namespace)
+    try:
+        cache.incr(version_key)
+    except ValueError:  # not set or evicted; any new version will do
+        cache.set(version_key, namespace_version(namespace) + 1, None)
+
+
+def versioned_key(namespace, *parts):
+    """
+    Cache key for parts in the current version of a namespace
+    """
+    return u"appsembleredx.{}.v{}.{}".format(
+        namespace, namespace_version(namespace), u".".join(unicode(part) for part in parts)
+    )
+
+
+def namespace_versions(namespaces):
+    """
+    Current versions of many cache namespaces, by namespace, read at once
+    """
+    namespaces = list(namespaces)
+    versions = cache.get_many([NAMESPACE_VERSION_KEY.format(namespace) for namespace in namespaces])
+    return dict(
+        (namespace, versions.get(NAMESPACE_VERSION_KEY.format(namespace)) or namespace_version(namespace))
+        for namespace in namespaces
+    )
+
+
+def get_versioned(namespace, key):
+    """
+    The current version of a namespace and the value cached under key with
+    set_versioned() at that version, or None if it isn't
+    """
+    version_key = NAMESPACE_VERSION_KEY.format(namespace)
+    cached = cache.get_many([version_key, key])
+    version = cached.get(version_key) or namespace_version(namespace)
+    entry = cached.get(key)
+    if entry is None or entry[0] != version:
+        return version, None
+    return version, entry[1]
+
+
+def set_versioned(key, version, value, timeout=DEFAULT_TIMEOUT):
+    """
+    Cache value under key for the version of its namespace it was read at,
+    as returned by get_versioned() or namespace_versions()
+    """
+    set_many_versioned({key: (version, value)}, timeout)
+
+
+def set_many_versioned(entries, timeout=DEFAULT_TIMEOUT):
+    """
+    set_versioned() for many keys at once, entries mapping each key to its
+    (version, value)
+    """
+    cache.set_many(entries, timeout)
@@ -0,0 +1,150 @@
+"""
+Cached per-course self-generated certificate state, and bulk reads and
+writes of it
+"""
+import logging
+
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.dispatch.dispatcher import receiver
+
+from certificates.models import CertificateGenerationCourseSetting
+
+from appsembleredx import caching
+from appsembleredx.app_settings import features
+
+
+logger = logging.getLogger(__name__)
+
+
+SELF_GENERATED_CERTS_CACHE_NAMESPACE = 'self_generated_certs'
+
+
+def _self_generated_certs_cache_key(course_key):
+    return caching.versioned_key(SELF_GENERATED_CERTS_CACHE_NAMESPACE, course_key)
+
+
+def is_self_generated_certs_enabled(course_key):
+    """
+    Cached CertificateGenerationCourseSetting.is_enabled_for_course
+    """
+    cache_key = _self_generated_certs_cache_key(course_key)
+    enabled = cache.get(cache_key)
+    if enabled is None:
+        enabled = CertificateGenerationCourseSetting.is_enabled_for_course(course_key)
+        cache.set(cache_key, enabled, caching.DEFAULT_TIMEOUT)
+    return enabled
+
+
+def courses_with_self_generated_certs(course_keys):
+    """
+    Unicode keys of the courses among course_keys with self-generated
+    certificates enabled, in one query.  As in is_enabled_for_course, the
+    latest setting of a course counts.
+    """
+    latest = {}
+    rows = CertificateGenerationCourseSetting.objects.filter(
+        course_key__in=list(course_keys)
+    ).order_by('created', 'id').values_list('course_key', 'enabled')
+    for course_key, enabled in rows:
+        latest[unicode(course_key)] = enabled
+    return set(course_key for course_key, enabled in latest.items() if enabled)
+
+
+def _wants(org_settings, self_paced):
+    if self_paced:
+        return not org_settings.DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED
+    return bool(org_settings.ALWAYS_ENABLE_SELF_GENERATED_CERTS)
+
+
+def wants_self_generated_certs(self_paced, course_key=None):
+    """
+    Whether a course that is self-paced or not should have self-generated
+    certificates enabled, with the settings of course_key's organization
+    """
+    return _wants(features.for_course(course_key), self_paced)
+
+
+# whether a course of any organization qualifies, worked out once per reload
+_any_org_wants = None
+
+
+@features.on_reload
+def _forget_any_org_wants():
+    global _any_org_wants  # pylint: disable=global-statement
+    _any_org_wants = None
+
+
+def any_wants_self_generated_certs(course_key=None):
+    """
+    Whether any course, self-paced or not, of course_key's organization
+    should have self-generated certificates enabled; of any organization
+    if course_key is None
+    """
+    global _any_org_wants  # pylint: disable=global-statement
+    if course_key is not None:
+        org_settings = features.for_course(course_key)
+        return _wants(org_settings, True) or _wants(org_settings, False)
+
+    if _any_org_wants is None:
+        orgs = [None] + list(features.ORG_OVERRIDES)
+        _any_org_wants = any(
+            _wants(features.for_org(org), self_paced) for org in orgs for self_paced in (True, False)
+        )
+    return _any_org_wants
+
+
+def enable_self_generated_certs_in_bulk(course_keys):
+    """
+    Enable self-generated certificates on the courses among course_keys that
+    should have them and don't, reading their settings and their
+    CourseOverviews with one query each, and adding their settings with one
+    bulk_create.  Returns the keys of the courses enabled, and the keys of
+    those left alone because they have no CourseOverview to tell whether
+    they are self-paced.
+    """
+    if not any_wants_self_generated_certs():
+        return [], []
+
+    course_keys = dict((unicode(course_key), course_key) for course_key in course_keys).values()
+    enabled = courses_with_self_generated_certs(course_keys)
+    candidates = [course_key for course_key in course_keys if unicode(course_key) not in enabled]
+    if not candidates:
+        return [], []
+
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+    self_paced = dict(
+        (unicode(course_id), is_self_paced) for course_id, is_self_paced in
+        CourseOverview.objects.filter(id__in=candidates).values_list('id', 'self_paced')
+    )
+    to_enable = []
+    undecided = []
+    for course_key in candidates:
+        if unicode(course_key) not in self_paced:
+            undecided.append(course_key)
+        elif wants_self_generated_certs(self_paced[unicode(course_key)], course_key):
+            to_enable.append(course_key)
+
+    if to_enable:
+        CertificateGenerationCourseSetting.objects.bulk_create([
+            CertificateGenerationCourseSetting(course_key=course_key, enabled=True) for course_key in to_enable
+        ])
+        # bulk_create sends no post_save
+        cache.delete_many([_self_generated_certs_cache_key(course_key) for course_key in to_enable])
+        logger.info(u"Enabled self-generated certificates on %d course(s)", len(to_enable))
+    return to_enable, undecided
+
+
+def invalidate_self_generated_certs_cache(course_key=None):
+    """
+    Forget the cached state of one course, or of all courses
+    """
+    if course_key is None:
+        caching.bump_namespace_version(SELF_GENERATED_CERTS_CACHE_NAMESPACE)
+    else:
+        cache.delete(_self_generated_certs_cache_key(course_key))
+
+
+@receiver(post_save, sender=CertificateGenerationCourseSetting)
+def _invalidate_on_setting_save(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    invalidate_self_generated_certs_cache(instance.course_key)
@@ -0,0 +1,158 @@
+"""
+Bring the site-wide ConfigurationModels appsembleredx manages in line with
+APPSEMBLER_FEATURES.
+
+ConfigurationModels keep their history as rows, the latest one being
+current, and saving a row invalidates their caches on every worker.  So a
+new row is only added when the current row's content differs from what the
+settings ask for, and running sync on every deploy writes nothing unless
+the settings changed.
+"""
+from collections import namedtuple
+import hashlib
+import json
+import logging
+
+from django.db import transaction
+
+from certificates import models as cert_models
+from student import models as student_models
+
+from appsembleredx.app_settings import features
+
+
+logger = logging.getLogger(__name__)
+
+# what sync did for a config
+CREATED = 'created'
+UNCHANGED = 'unchanged'
+NOT_CONFIGURED = 'not configured'
+
+# name: how sync refers to the config
+# model: the ConfigurationModel
+# get_values: returns the field values the current row should have, or None
+#     if the settings don't ask for this config
+# json_fields: text fields holding JSON, compared by content rather than by text
+# disable_others: disable every other enabled row, for models whose rows are
+#     read regardless of which one is current
+ConfigSpec = namedtuple('ConfigSpec', ['name', 'model', 'get_values', 'json_fields', 'disable_others'])
+
+# what sync did for a config, and the rows of other versions it disabled
+SyncResult = namedtuple('SyncResult', ['name', 'status', 'disabled'])
+
+
+def _linkedin_values():
+    company_id = features.LINKEDIN_ADDTOPROFILE_COMPANY_ID
+    if not company_id:
+        return None
+    return {'company_identifier': company_id, 'enabled': True}
+
+
+def _self_generated_certs_values():
+    return {'enabled': True}
+
+
+def _cert_html_view_values():
+    config = features.CERTS_HTML_VIEW_CONFIGURATION
+    if not config:
+        return None
+    return {'configuration': config, 'enabled': True}
+
+
+CONFIGS = (
+    ConfigSpec('linkedin', student_models.LinkedInAddToProfileConfiguration, _linkedin_values, (), False),
+    ConfigSpec('self_generated_certs', cert_models.CertificateGenerationConfiguration,
+               _self_generated_certs_values, (), False),
+    # Eucalyptus+ certificate previews use any enabled html view configuration
+    ConfigSpec('cert_html_view', cert_models.CertificateHtmlViewConfiguration,
+               _cert_html_view_values, ('configuration', ), True),
+)
+
+CONFIG_NAMES = tuple(spec.name for spec in CONFIGS)
+
+
+def content_hash(values):
+    """
+    Digest of a config's field values, with JSON fields as parsed JSON
+    """
+    return hashlib.sha1(json.dumps(values, sort_keys=True, default=unicode)).hexdigest()
+
+
+def _normalized(spec, values):
+    """
+    Field values as the model's fields hold them, e.g. a company identifier
+    given as a number in settings as the text stored, so that values from
+    settings and from a row compare equal when saving one gives the other
+    """
+    normalized = {}
+    for name, value in values.items():
+        if name not in spec.json_fields:
+            field = spec.model._meta.get_field(name)
+            # TextField converts to text in get_prep_value, not to_python, before Django 1.9
+            value = field.to_python(field.get_prep_value(value))
+        normalized[name] = value
+    return normalized
+
+
+def _row_values(spec, row, names):
+    values = {}
+    for name in names:
+        value = getattr(row, name)
+        if name in spec.json_fields:
+            try:
+                value = json.loads(value)
+            except (TypeError, ValueError):
+                pass  # not JSON, so it differs from any config in settings
+        values[name] = value
+    return values
+
+
+def _current_row(model):
+    # query rather than model.current(), which may be cached
+    return model.objects.order_by('-change_date', '-id').first()
+
+
+def _sync_one(spec, dry_run):
+    values = spec.get_values()
+    if values is None:
+        return SyncResult(spec.name, NOT_CONFIGURED, 0)
+
+    current = _current_row(spec.model)
+    if current is not None and (content_hash(_normalized(spec, _row_values(spec, current, values))) ==
+                                content_hash(_normalized(spec, values))):
+        status = UNCHANGED
+    else:
+        status = CREATED
+        current = None
+        if not dry_run:
+            row_values = dict(values)
+            for name in spec.json_fields:
+                row_values[name] = json.dumps(row_values[name])
+            # save() rather than bulk_create, so ConfigurationModel's caches are invalidated
+            current = spec.model(**row_values)
+            current.save()
+
+    disabled = 0
+    if spec.disable_others:
+        others = spec.model.objects.filter(enabled=True)
+        if current is not None:
+            others = others.exclude(pk=current.pk)
+        disabled = others.count() if dry_run else others.update(enabled=False)
+    return SyncResult(spec.name, status, disabled)
+
+
+def sync(names=CONFIG_NAMES, dry_run=False):
+    """
+    Add a row to each named config whose current row differs from settings,
+    in one transaction.  With dry_run, only report what would be written.
+    Returns a SyncResult per config.
+    """
+    unknown = set(names) - set(CONFIG_NAMES)
+    if unknown:
+        raise ValueError(u"Unknown config(s): {}".format(u", ".join(sorted(unknown))))
+
+    with transaction.atomic():
+        results = [_sync_one(spec, dry_run) for spec in CONFIGS if spec.name in names]
+    for result in results:
+        logger.info(u"Config %s: %s, %d other row(s) disabled", *result)
+    return results
@@ -0,0 +1,457 @@
+"""
+Run appsembleredx per-course setup over many courses, serially or on
+a pool of worker processes, optionally restricted to one shard of the
+course keys so that several hosts can share a run.
+
+Course keys are streamed rather than collected from full course
+descriptors, and per-course caches are released after each course, so
+memory use doesn't grow with the size of the catalog.  Courses are checked
+for drift in batches first, see appsembleredx.drift, and only the steps a
+course needs are run on it.  Incremental runs don't even check courses
+the ledger (appsembleredx.ledger) has as set up and unchanged since.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+
+from django import db
+from opaque_keys.edx.keys import CourseKey
+from xmodule.modulestore.django import modulestore
+
+try:
+    from request_cache.middleware import RequestCache
+except ImportError:  # moved after ficus
+    from openedx.core.djangoapps.request_cache.middleware import RequestCache
+
+from appsembleredx import certs, drift, ledger, modes, profiling, signals, throttling
+
+
+logger = logging.getLogger(__name__)
+
+
+def _as_course_key(value):
+    if isinstance(value, CourseKey):
+        return value
+    return CourseKey.from_string(unicode(value))
+
+
+def iter_all_course_keys(store=None):
+    """
+    Yield the key of every course without loading course descriptors.
+    Uses modulestore course summaries where the store supports them,
+    otherwise iterates over CourseOverview ids.
+    """
+    store = store or modulestore()
+    if hasattr(store, 'get_course_summaries'):
+        for summary in store.get_course_summaries():
+            course_key = getattr(summary, 'id', None)
+            if course_key is None:
+                logger.warn('Skipping course summary without id attr')
+                continue
+            yield course_key
+        return
+
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+    for course_key in CourseOverview.objects.order_by('id').values_list('id', flat=True).iterator():
+        yield _as_course_key(course_key)
+
+
+def release_course_caches():
+    """
+    Drop what the modulestore and Django accumulate while processing one
+    course.  Outside of a request nothing else clears these.
+    """
+    RequestCache.clear_request_cache()
+    db.reset_queries()
+
+
+def parse_shard(raw_value):
+    """
+    Parse a shard spec of the form 'i/n' (1-based) into (index, count).
+    Raises ValueError for anything else.
+    """
+    try:
+        index, count = [int(part) for part in raw_value.split('/')]
+    except (AttributeError, ValueError):
+        raise ValueError("Shard must look like 'i/n', got '{}'".format(raw_value))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError("Shard index must be between 1 and n, got '{}'".format(raw_value))
+    return index, count
+
+
+def shard_of(course_key, count):
+    """
+    Return the 1-based shard a course key belongs to.  Uses a stable hash of
+    the key string, so every host computes the same split.
+    """
+    digest = hashlib.md5(unicode(course_key).encode('utf-8')).hexdigest()
+    return int(digest, 16) % count + 1
+
+
+def filter_shard(course_keys, index, count):
+    """
+    Yield only the course keys that belong to shard index of count
+    """
+    for course_key in course_keys:
+        if shard_of(course_key, count) == index:
+            yield course_key
+
+
+def with_default_modes(course_drifts, batch_size=modes.BULK_INSERT_BATCH_SIZE):
+    """
+    Create missing default-mode CourseModes for each batch of CourseDrifts in
+    bulk, yielding the CourseDrifts without the default mode step.  If a batch
+    fails, its CourseDrifts are yielded unchanged so they get the per-course path.
+    """
+    for batch in drift.iter_batches(course_drifts, batch_size):
+        missing = [course_key for course_key, steps in batch if drift.DEFAULT_MODE in steps]
+        try:
+            if missing:
+                modes.create_missing_default_modes(missing)
+        except Exception:  # pylint: disable=broad-except
+            logger.error(u"Failed to create default course modes in bulk\n%s", traceback.format_exc())
+            for course_drift in batch:
+                yield course_drift
+        else:
+            for course_key, steps in batch:
+                yield drift.CourseDrift(course_key, tuple(step for step in steps if step != drift.DEFAULT_MODE))
+
+
+def with_self_generated_certs(course_drifts, batch_size=drift.CHECK_BATCH_SIZE):
+    """
+    Enable self-generated certificates in bulk for each batch of CourseDrifts,
+    yielding the CourseDrifts without that step for the courses it was
+    settled for.  Courses without a CourseOverview, and every course of a
+    batch that fails, keep the step so they get the per-course path.
+    """
+    for batch in drift.iter_batches(course_drifts, batch_size):
+        wanted = [course_key for course_key, steps in batch if drift.SELF_GENERATED_CERTS in steps]
+        try:
+            _enabled, undecided = certs.enable_self_generated_certs_in_bulk(wanted) if wanted else ([], [])
+        except Exception:  # pylint: disable=broad-except
+            logger.error(u"Failed to enable self-generated certificates in bulk\n%s", traceback.format_exc())
+            for course_drift in batch:
+                yield course_drift
+        else:
+            undecided = set(unicode(course_key) for course_key in undecided)
+            for course_key, steps in batch:
+                if unicode(course_key) not in undecided:
+                    steps = tuple(step for step in steps if step != drift.SELF_GENERATED_CERTS)
+                yield drift.CourseDrift(course_key, steps)
+
+
+# pre-publish steps by drift step name
+PRE_PUBLISH_STEPS = {
+    drift.CERT_DEFAULTS: signals._apply_cert_defaults,
+    drift.DEFAULT_CERTIFICATE: signals._apply_default_active_certificate,
+}
+
+
+def setup_course(course_key, replace_certs=False, steps=drift.STEPS):
+    """
+    Call the functions that are normally signal handlers for one course.
+    Pass steps, names from appsembleredx.drift.STEPS, to only run those; of
+    drift.COURSE_STEPS, only those the course still needs are run.  Returns
+    the steps run.
+    """
+    if drift.MISSING_COURSE in steps:
+        raise ValueError(u"Course {} is not in the modulestore".format(course_key))
+    store = modulestore()
+    with store.bulk_operations(course_key):
+        course = None
+        if any(step in drift.COURSE_STEPS for step in steps):
+            course = signals._get_course(store, course_key)
+            if course is None:
+                raise ValueError(u"Course {} is not in the modulestore".format(course_key))
+            needed = drift.course_steps(course, course_key, replace_certs)
+            steps = tuple(step for step in steps if step not in drift.COURSE_STEPS or step in needed)
+
+        if drift.DEFAULT_MODE in steps:
+            signals._default_mode_on_course_publish(store.__class__, course_key)
+        # cert defaults and the default certificate share one course read and write
+        pre_publish_steps = [PRE_PUBLISH_STEPS[step] for step in drift.STEPS
+                             if step in steps and step in PRE_PUBLISH_STEPS]
+        if pre_publish_steps:
+            signals.run_pre_publish_steps(
+                course_key,
+                steps=pre_publish_steps,
+                course=course,
+                replace=replace_certs,
+                force=True  # always force when using command
+            )
+        if drift.SELF_GENERATED_CERTS in steps:
+            signals.enable_self_generated_certs(store.__class__, course_key)
+    return tuple(steps)
+
+
+class SetupReport(object):
+    """
+    Collects per-course results and per-worker throughput for a setup run.
+    Thread-safe: run_parallel counts courses from the thread feeding the pool too.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.workers = {}
+        self.failed = []
+        self.up_to_date = 0
+        self.unchanged = 0
+        self.started = time.time()
+        self.finished = None
+
+    def record(self, worker, course_key, started, ended, error=None):
+        with self.lock:
+            stats = self.workers.setdefault(worker, {'processed': 0, 'failed': 0, 'first': started, 'last': ended})
+            stats['processed'] += 1
+            stats['first'] = min(stats['first'], started)
+            stats['last'] = max(stats['last'], ended)
+            if error:
+                stats['failed'] += 1
+                self.failed.append((course_key, error))
+
+    def skip(self):
+        """
+        Count a course that needed no setup
+        """
+        with self.lock:
+            self.up_to_date += 1
+
+    def skip_unchanged(self):
+        """
+        Count a course unchanged since it was last set up
+        """
+        with self.lock:
+            self.unchanged += 1
+
+    def finish(self):
+        self.finished = time.time()
+
+    @property
+    def processed(self):
+        return sum(stats['processed'] for stats in self.workers.values())
+
+    def lines(self):
+        """
+        Human-readable summary of the run
+        """
+        elapsed = (self.finished or time.time()) - self.started
+        yield u"Processed {} course(s) in {:.1f}s, {} failed, {} already set up, {} unchanged since last setup".format(
+            self.processed, elapsed, len(self.failed), self.up_to_date, self.unchanged)
+        for worker in sorted(self.workers):
+            stats = self.workers[worker]
+            busy = max(stats['last'] - stats['first'], 0.001)
+            yield u"  worker {}: {} course(s), {} failed, {:.2f} courses/s".format(
+                worker, stats['processed'], stats['failed'], stats['processed'] / busy)
+        if self.failed:
+            yield u"Failed course keys:"
+            for course_key, error in self.failed:
+                yield u"  {}: {}".format(course_key, error)
+
+
+# what setting up one course gave: the steps it needed, a profiling.CourseProfile
+# if profiled, its datastore latency (see throttling.LatencyProbe) if probed, and
+# the version and settings fingerprint it was set up at, for the ledger
+CourseResult = namedtuple('CourseResult', ['worker', 'course_key', 'started', 'ended', 'error', 'steps', 'profile',
+                                           'latency', 'course_version', 'fingerprint'])
+
+
+@contextmanager
+def _within(context):
+    if context is None:
+        yield
+    else:
+        with context:
+            yield
+
+
+def _run_one(course_key, replace_certs, steps=drift.STEPS, profile=False, probe_latency=False):
+    """
+    Set up a single course, returning a CourseResult instead of raising
+    so that one broken course doesn't stop the run
+    """
+    started = time.time()
+    error = None
+    steps_run = steps
+    course_version = fingerprint = None
+    profiler = profiling.CourseProfiler() if profile else None
+    probe = throttling.LatencyProbe() if probe_latency else None
+    try:
+        with _within(profiler), _within(probe):
+            steps_run = setup_course(course_key, replace_certs, steps)
+        course_version = ledger.course_versions([course_key]).get(unicode(course_key))
+        fingerprint = ledger.course_fingerprint(course_key)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error(u"Failed to set up course %s\n%s", course_key, traceback.format_exc())
+        error = u"{}: {}".format(e.__class__.__name__, e)
+    finally:
+        release_course_caches()
+    return CourseResult(os.getpid(), unicode(course_key), started, time.time(), error, steps_run,
+                        profiler.profile if profiler else None, probe.latency if probe else None,
+                        course_version, fingerprint)
+
+
+def _close_db_connections():
+    for conn in db.connections.all():
+        conn.close()
+
+
+def _init_worker():
+    """
+    Give each worker process its own DB and modulestore connections rather
+    than sharing the sockets inherited from the parent on fork
+    """
+    _close_db_connections()
+    from xmodule.modulestore import django as modulestore_django
+    from xmodule.contentstore import django as contentstore_django
+    modulestore_django.clear_existing_modulestores()
+    contentstore_django._CONTENTSTORE.clear()  # pylint: disable=protected-access
+
+
+def _worker_run_one(args):
+    course_key, replace_certs, steps, profile, probe_latency = args
+    return _run_one(_as_course_key(course_key), replace_certs, steps, profile, probe_latency)
+
+
+@contextmanager
+def _paced_batch(throttle):
+    """
+    Pace the bulk reads and writes of a batch of courses with throttle, as
+    one course, and feed it their datastore latency
+    """
+    if throttle is None:
+        yield
+        return
+    throttle.acquire()
+    probe = throttling.LatencyProbe() if throttle.probes_latency else None
+    with _within(probe):
+        yield
+    if probe is not None:
+        throttle.observe(probe.latency)
+
+
+def _drifted(course_keys, replace_certs, incremental, report, throttle=None):
+    """
+    CourseDrifts of the courses among course_keys that may need setup, with
+    their default modes created and self-generated certificates enabled in
+    bulk; courses unchanged since the ledger recorded them are counted in
+    report.  The bulk work on each batch is paced with throttle.
+
+    Only SQL is read here, so every other course is passed on with the
+    certificate steps it may need: whoever sets it up reads the course from
+    the modulestore and runs only those it needs (drift.course_steps), so
+    with workers these reads are spread over them.
+    """
+    incremental = incremental and not replace_certs
+    for batch in drift.iter_batches(course_keys, drift.CHECK_BATCH_SIZE):
+        with _paced_batch(throttle):
+            if incremental:
+                unchanged = ledger.unchanged_course_keys(batch)
+                for _course_key in unchanged:
+                    report.skip_unchanged()
+                batch = [course_key for course_key in batch if unicode(course_key) not in unchanged]
+            course_drifts = list(with_self_generated_certs(with_default_modes(
+                drift.check_batch(batch, replace_certs, load_courses=False)
+            ))) if batch else []
+        for course_drift in course_drifts:
+            yield course_drift
+
+
+def _closing_db_connections(course_drifts):
+    """
+    Yield course_drifts, then close the DB connections of the thread that
+    consumed them: the pool's task feeder thread has its own, which
+    nothing else closes
+    """
+    try:
+        for course_drift in course_drifts:
+            yield course_drift
+    finally:
+        _close_db_connections()
+
+
+def _paced(course_drifts, throttle):
+    for course_drift in course_drifts:
+        throttle.acquire()
+        yield course_drift
+
+
+def _record(report, setup_ledger, result, profile_report=None, throttle=None):
+    if result.error or result.steps:
+        report.record(result.worker, result.course_key, result.started, result.ended, result.error)
+    else:
+        report.skip()  # the course turned out to be set up
+    if throttle is not None:
+        throttle.observe(result.latency)
+    if profile_report is not None and result.profile is not None:
+        profile_report.record(result.worker, result.course_key, result.error, result.profile)
+    if not result.error:
+        setup_ledger.record(_as_course_key(result.course_key), result.course_version, result.fingerprint)
+
+
+def run_serial(course_keys, replace_certs=False, incremental=True, profile_report=None, throttle=None):
+    """
+    Set up courses one at a time in this process.  If incremental, skip
+    courses the ledger has as unchanged since they were set up.  Pass a
+    profiling.ProfileReport to profile each course set up, and a
+    throttling.Throttle to pace them.
+    """
+    report = SetupReport()
+    setup_ledger = ledger.Ledger()
+    profile = profile_report is not None
+    probe_latency = throttle is not None and throttle.probes_latency
+    course_drifts = _drifted(course_keys, replace_certs, incremental, report, throttle)
+    if throttle is not None:
+        course_drifts = _paced(course_drifts, throttle)
+    try:
+        for course_key, steps in course_drifts:
+            result = _run_one(course_key, replace_certs, steps, profile, probe_latency)
+            _record(report, setup_ledger, result, profile_report, throttle)
+    finally:
+        # keep what was done, so an interrupted run can pick up from there
+        setup_ledger.flush()
+    report.finish()
+    return report
+
+
+def run_parallel(course_keys, workers, replace_certs=False, incremental=True, profile_report=None,
+                 throttle=None):
+    """
+    Set up courses on a pool of worker processes.  If incremental, skip
+    courses the ledger has as unchanged since they were set up.  Pass a
+    profiling.ProfileReport to profile each course set up, and a
+    throttling.Throttle to pace them across all workers.
+    """
+    report = SetupReport()
+    setup_ledger = ledger.Ledger()
+    profile = profile_report is not None
+    probe_latency = throttle is not None and throttle.probes_latency
+    course_drifts = _drifted(course_keys, replace_certs, incremental, report, throttle)
+    if throttle is not None:
+        # paced as they are fed to the pool, so the pace holds for the pool as a whole
+        course_drifts = _paced(course_drifts, throttle)
+    # don't let children inherit open DB sockets
+    _close_db_connections()
+    pool = multiprocessing.Pool(processes=workers, initializer=_init_worker)
+    try:
+        # courses are checked against the DB and default modes created in bulk
+        # in this process as keys are fed to the pool, and against the
+        # modulestore in the workers
+        tasks = ((unicode(course_key), replace_certs, steps, profile, probe_latency)
+                 for course_key, steps in _closing_db_connections(course_drifts))
+        for result in pool.imap_unordered(_worker_run_one, tasks):
+            _record(report, setup_ledger, result, profile_report, throttle)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        setup_ledger.flush()
+    report.finish()
+    return report
@@ -0,0 +1,161 @@
+"""
+Find the courses appsembler_setup_courses still has work to do on, and the
+steps it has to run for each.
+
+State is read for a batch of course keys at a time: CourseModes,
+CertificateGenerationCourseSettings and CourseOverviews with one query each,
+and the certificate flags of each course from the modulestore, without its
+children.  appsembler_setup_courses leaves the modulestore reads to
+whichever process sets the course up, see check_batch.
+"""
+from collections import namedtuple
+import logging
+
+from xmodule.modulestore.django import modulestore
+
+from appsembleredx import certs, modes
+from appsembleredx.app_settings import features
+from appsembleredx.instrumentation import count, MODULESTORE_READS
+
+
+logger = logging.getLogger(__name__)
+
+CHECK_BATCH_SIZE = 500
+
+# setup steps, in the order setup_course runs them
+DEFAULT_MODE = 'default_mode'
+CERT_DEFAULTS = 'cert_defaults'
+DEFAULT_CERTIFICATE = 'default_certificate'
+SELF_GENERATED_CERTS = 'self_generated_certs'
+STEPS = (DEFAULT_MODE, CERT_DEFAULTS, DEFAULT_CERTIFICATE, SELF_GENERATED_CERTS)
+# steps whose need is read from the course in the modulestore
+COURSE_STEPS = (CERT_DEFAULTS, DEFAULT_CERTIFICATE)
+# the course isn't in the modulestore, so no step is run and setting it up fails
+MISSING_COURSE = 'missing_course'
+
+# a course and the steps it needs, empty if it is set up
+CourseDrift = namedtuple('CourseDrift', ['course_key', 'steps'])
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _self_paced_by_course(course_keys):
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+    return dict(
+        (unicode(course_id), self_paced) for course_id, self_paced in
+        CourseOverview.objects.filter(id__in=course_keys).values_list('id', 'self_paced')
+    )
+
+
+def course_steps(course, course_key, replace_certs=False):
+    """
+    Those of COURSE_STEPS a course loaded from the modulestore needs
+    """
+    steps = []
+    if features.for_course(course_key).USE_OPEN_ENDED_CERTS_DEFAULTS and not course.cert_defaults_set:
+        steps.append(CERT_DEFAULTS)
+    if replace_certs or not course.active_default_cert_created:
+        steps.append(DEFAULT_CERTIFICATE)
+    return tuple(steps)
+
+
+def _possible_course_steps(course_key):
+    """
+    Those of COURSE_STEPS a course may need, without reading it
+    """
+    if features.for_course(course_key).USE_OPEN_ENDED_CERTS_DEFAULTS:
+        return (CERT_DEFAULTS, DEFAULT_CERTIFICATE)
+    return (DEFAULT_CERTIFICATE, )
+
+
+def check_batch(course_keys, replace_certs=False, store=None, load_courses=True):
+    """
+    Return a CourseDrift for each of course_keys.  Without load_courses, the
+    modulestore isn't read: the CourseDrifts have every one of COURSE_STEPS
+    the course may need, for whoever sets it up to check against the course
+    with course_steps, and courses missing from the modulestore aren't found.
+    """
+    if load_courses:
+        store = store or modulestore()
+    course_keys = list(course_keys)
+    missing_default_mode = set(unicode(key) for key in modes.course_keys_missing_default_mode(course_keys))
+    self_generated_certs = certs.courses_with_self_generated_certs(course_keys)
+    self_paced = _self_paced_by_course(course_keys)
+
+    drift = []
+    for course_key in course_keys:
+        key = unicode(course_key)
+        steps = []
+        if key in missing_default_mode:
+            steps.append(DEFAULT_MODE)
+
+        course = None
+        if load_courses:
+            course = store.get_course(course_key, depth=0)
+            count(MODULESTORE_READS)
+            if course is None:
+                drift.append(CourseDrift(course_key, (MISSING_COURSE, )))
+                continue
+            steps.extend(course_steps(course, course_key, replace_certs))
+        else:
+            steps.extend(_possible_course_steps(course_key))
+
+        if key not in self_generated_certs:
+            if key in self_paced:
+                wanted = certs.wants_self_generated_certs(self_paced[key], course_key)
+            elif course is not None:
+                wanted = certs.wants_self_generated_certs(course.self_paced, course_key)
+            else:
+                # setting it up reads self_paced from the course
+                wanted = certs.any_wants_self_generated_certs(course_key)
+            if wanted:
+                steps.append(SELF_GENERATED_CERTS)
+        drift.append(CourseDrift(course_key, tuple(steps)))
+    return drift
+
+
+def iter_drift(course_keys, replace_certs=False, batch_size=CHECK_BATCH_SIZE, load_courses=True):
+    """
+    Yield a CourseDrift for each of course_keys, checking them in batches.
+    See check_batch for load_courses.
+    """
+    store = modulestore() if load_courses else None
+    for batch in iter_batches(course_keys, batch_size):
+        for course_drift in check_batch(batch, replace_certs, store, load_courses):
+            yield course_drift
+
+
+class DriftReport(object):
+    """
+    Counts the courses needing each step, for a --check run
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.drifted = 0
+        self.steps = dict((step, 0) for step in STEPS + (MISSING_COURSE, ))
+
+    def record(self, course_drift):
+        self.checked += 1
+        if course_drift.steps:
+            self.drifted += 1
+            for step in course_drift.steps:
+                self.steps[step] += 1
+
+    def lines(self):
+        """
+        Human-readable summary of the check
+        """
+        yield u"{} of {} course(s) need setup".format(self.drifted, self.checked)
+        for step in STEPS + (MISSING_COURSE, ):
+            if self.steps[step]:
+                yield u"  {}: {}".format(step, self.steps[step])
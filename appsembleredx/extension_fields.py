@@ -0,0 +1,155 @@
+"""
+Keep the CourseExtensionFields table in step with the fields CreditsMixin
+and InstructionTypeMixin add to courses: one course on publish, or many
+courses at once with appsembler_backfill_extension_fields.
+
+A course's row is only written when one of its MIRRORED_FIELDS changed, so
+its course_version is that of the course when they last changed.
+"""
+from collections import namedtuple
+import logging
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from xmodule.modulestore.django import modulestore
+
+from appsembleredx.app_settings import features
+from appsembleredx.drift import iter_batches
+from appsembleredx.instrumentation import count, MODULESTORE_READS
+from appsembleredx.models import CourseExtensionFields
+
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+# course fields copied to CourseExtensionFields; those of a disabled mixin are copied as None
+MIRRORED_FIELDS = (
+    'credit_provider', 'credits', 'credit_unit', 'accreditation_conferred',
+    'field_of_study', 'instructional_method', 'instruction_location',
+)
+
+# what backfill did, as numbers of courses
+BackfillResult = namedtuple('BackfillResult', ['created', 'updated', 'unchanged', 'missing'])
+
+
+def is_enabled():
+    """
+    Whether courses have any of the mirrored fields
+    """
+    return bool(features.ENABLE_CREDITS_EXTRA_FIELDS or features.ENABLE_INSTRUCTION_TYPE_EXTRA_FIELDS)
+
+
+def values_for_course(course):
+    """
+    Column values of the CourseExtensionFields row for a course
+    """
+    values = dict((field, getattr(course, field, None)) for field in MIRRORED_FIELDS)
+    values['org'] = course.id.org
+    version = getattr(course, 'course_version', None)
+    values['course_version'] = None if version is None else unicode(version)
+    return values
+
+
+def _differs(row, values):
+    # not course_version, which changes on every publish
+    return any(getattr(row, name) != values[name] for name in MIRRORED_FIELDS)
+
+
+def update_course(course_key, store=None):
+    """
+    Copy a course's fields to its CourseExtensionFields row, deleting the
+    row if the course is gone.  Returns True if the table was written.
+    """
+    store = store or modulestore()
+    course = store.get_course(course_key, depth=0)
+    count(MODULESTORE_READS)
+    if course is None:
+        rows = CourseExtensionFields.objects.filter(course_id=course_key)
+        if not rows.exists():
+            return False
+        rows.delete()
+        return True
+
+    values = values_for_course(course)
+    row = CourseExtensionFields.objects.filter(course_id=course_key).first()
+    if row is not None and not _differs(row, values):
+        return False
+    # the row may be created or changed by a concurrent publish or backfill in
+    # the meantime; update_or_create updates it rather than failing then
+    CourseExtensionFields.objects.update_or_create(course_id=course_key, defaults=values)
+    return True
+
+
+def backfill_batch(course_keys, store=None):
+    """
+    Bring the rows of course_keys up to date with one query to read them and,
+    if any changed, one transaction to write them.  Returns a BackfillResult.
+    """
+    store = store or modulestore()
+    course_keys = list(course_keys)
+    rows = dict(
+        (unicode(row.course_id), row) for row in CourseExtensionFields.objects.filter(course_id__in=course_keys)
+    )
+
+    new_rows = []
+    stale = []
+    missing = []
+    unchanged = 0
+    for course_key in course_keys:
+        course = store.get_course(course_key, depth=0)
+        count(MODULESTORE_READS)
+        if course is None:
+            missing.append(course_key)
+            continue
+        values = values_for_course(course)
+        row = rows.get(unicode(course_key))
+        if row is None:
+            new_rows.append(CourseExtensionFields(course_id=course_key, **values))
+        elif _differs(row, values):
+            stale.append((course_key, values))
+        else:
+            unchanged += 1
+
+    gone = [key for key in missing if unicode(key) in rows]
+    if new_rows or stale or gone:
+        with transaction.atomic():
+            for course_key, values in stale:
+                _update_row(course_key, values)
+            if gone:
+                CourseExtensionFields.objects.filter(course_id__in=gone).delete()
+            try:
+                with transaction.atomic():
+                    CourseExtensionFields.objects.bulk_create(new_rows)
+            except IntegrityError:
+                # a publish created some of the rows since they were read
+                logger.info(u"Course extension fields changed during backfill, writing them one at a time")
+                for row in new_rows:
+                    _update_row(row.course_id, dict(
+                        (name, getattr(row, name)) for name in ('org', 'course_version') + MIRRORED_FIELDS
+                    ))
+    return BackfillResult(len(new_rows), len(stale), unchanged, len(missing))
+
+
+def _update_row(course_key, values):
+    """
+    Update a course's row in place, keeping its id, which the API pages on,
+    or create it if there is none
+    """
+    updated = CourseExtensionFields.objects.filter(course_id=course_key).update(modified=timezone.now(), **values)
+    if not updated:
+        CourseExtensionFields.objects.update_or_create(course_id=course_key, defaults=values)
+
+
+def backfill(course_keys, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Bring the rows of course_keys up to date, batch_size courses at a time.
+    Returns the totals as a BackfillResult.
+    """
+    store = modulestore()
+    totals = BackfillResult(0, 0, 0, 0)
+    for batch in iter_batches(course_keys, batch_size):
+        result = backfill_batch(batch, store)
+        totals = BackfillResult(*(total + n for total, n in zip(totals, result)))
+        logger.info(u"Backfilled course extension fields of %d course(s): %s", len(batch), result)
+    return totals
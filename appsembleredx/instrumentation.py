@@ -0,0 +1,318 @@
+"""
+Timing and query-count instrumentation for appsembleredx signal handlers
+and monkeypatched functions.
+
+Wrap a function with @instrumented('name') and each call records its wall
+time, DB query count, and the modulestore/contentstore operations counted
+with count() while it runs.  Measurements go to the sinks named in
+APPSEMBLER_FEATURES['HANDLER_METRICS_SINKS']:
+
+    'logging'    log a line per call
+    'statsd'     send histograms and counters through dogstatsd
+    'histogram'  keep an in-process histogram, shared through the Django cache
+                 so that the appsembler_handler_stats command can read it
+
+or the dotted path of any class with a record(name, wall_time, counters)
+method.  With no sinks configured, instrumented functions do no extra work
+beyond checking for sinks.
+"""
+from collections import deque
+from contextlib import contextmanager
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from appsembleredx.app_settings import features
+
+
+logger = logging.getLogger(__name__)
+
+DB_QUERIES = 'db_queries'
+MODULESTORE_READS = 'modulestore_reads'
+MODULESTORE_WRITES = 'modulestore_writes'
+CONTENTSTORE_WRITES = 'contentstore_writes'
+COUNTERS = (DB_QUERIES, MODULESTORE_READS, MODULESTORE_WRITES, CONTENTSTORE_WRITES)
+# total time of the DB queries counted in DB_QUERIES, in seconds; not a count, so not in COUNTERS
+DB_QUERY_SECONDS = 'db_query_seconds'
+
+_local = threading.local()
+
+
+def _active_counters():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def count(counter, n=1):
+    """
+    Add n to counter for every instrumented call in progress on this thread
+    """
+    for counters in getattr(_local, 'stack', ()):
+        counters[counter] = counters.get(counter, 0) + n
+
+
+class QueryCountingCursor(object):
+    """
+    Cursor wrapper counting the queries run through it, and their time,
+    for the measurements in progress on this thread
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.cursor.__exit__(*exc_info)
+
+    def _timed(self, method, *args):
+        started = time.time()
+        try:
+            return method(*args)
+        finally:
+            seconds = time.time() - started
+            for counters in getattr(_local, 'stack', ()):
+                counters[DB_QUERIES] += 1
+                counters[DB_QUERY_SECONDS] += seconds
+
+    def execute(self, sql, params=None):
+        return self._timed(self.cursor.execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self._timed(self.cursor.executemany, sql, param_list)
+
+    def callproc(self, procname, params=None):
+        return self._timed(self.cursor.callproc, procname, params)
+
+
+def _counting(make_cursor, cursor):
+    return QueryCountingCursor(make_cursor(cursor))
+
+
+def _count_queries(connection):
+    """
+    Wrap the cursors connection makes from now on in QueryCountingCursor.
+    Unlike queries_log, this doesn't keep the SQL, and keeps counting once
+    queries_log is full in processes that never call reset_queries.
+    """
+    if getattr(connection, 'appsembleredx_counts_queries', False):
+        return
+    # connections are per thread, so this only changes this thread's
+    connection.make_cursor = functools.partial(_counting, connection.make_cursor)
+    connection.make_debug_cursor = functools.partial(_counting, connection.make_debug_cursor)
+    connection.appsembleredx_counts_queries = True
+
+
+@contextmanager
+def measuring():
+    """
+    Yield a dict of COUNTERS, filled in with the DB queries made on any
+    database and the operations count()ed while the block runs, plus
+    DB_QUERY_SECONDS
+    """
+    counters = dict((counter, 0) for counter in COUNTERS)
+    counters[DB_QUERY_SECONDS] = 0.0
+    for connection in connections.all():
+        _count_queries(connection)
+    stack = _active_counters()
+    stack.append(counters)
+    try:
+        yield counters
+    finally:
+        stack.pop()
+
+
+def instrumented(name):
+    """
+    Decorator recording each call of the wrapped function under name
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            sinks = get_sinks()
+            if not sinks:
+                return func(*args, **kwargs)
+
+            started = time.time()
+            try:
+                with measuring() as counters:
+                    return func(*args, **kwargs)
+            finally:
+                wall_time = time.time() - started
+                for sink in sinks:
+                    try:
+                        sink.record(name, wall_time, counters)
+                    except Exception:  # pylint: disable=broad-except
+                        logger.exception(u"Metrics sink %s failed", sink)
+        return wrapper
+    return decorator
+
+
+class LoggingSink(object):
+    """
+    Log one line per instrumented call
+    """
+
+    def record(self, name, wall_time, counters):
+        logger.info(u"%s took %.1fms, %s", name, wall_time * 1000,
+                    u", ".join(u"{} {}".format(counters[c], c) for c in COUNTERS))
+
+
+class StatsdSink(object):
+    """
+    Send a wall time histogram and a counter per measurement through dogstatsd
+    """
+
+    def __init__(self):
+        try:
+            from dogapi import dog_stats_api
+        except ImportError:  # replaced by datadog after dogwood
+            from datadog import statsd as dog_stats_api
+        self.stats = dog_stats_api
+
+    def record(self, name, wall_time, counters):
+        tags = [u"handler:{}".format(name)]
+        self.stats.histogram('appsembleredx.handler.wall_time', wall_time * 1000, tags=tags)
+        for counter in COUNTERS:
+            self.stats.increment('appsembleredx.handler.{}'.format(counter), counters[counter], tags=tags)
+
+
+class HistogramSink(object):
+    """
+    Keep recent wall times and counter totals per name in this process, and
+    periodically copy them into the Django cache so that other processes
+    (the appsembler_handler_stats command) can read them
+    """
+    RESERVOIR_SIZE = 1000
+    FLUSH_INTERVAL = 30
+    CACHE_TIMEOUT = 60 * 60 * 24
+    PROCESSES_CACHE_KEY = u"appsembleredx.instrumentation.histogram.processes"
+    PROCESS_CACHE_KEY = u"appsembleredx.instrumentation.histogram.{}"
+
+    def __init__(self):
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.time()
+        self.process_key = self.PROCESS_CACHE_KEY.format(u"{}.{}".format(socket.gethostname(), os.getpid()))
+
+    def record(self, name, wall_time, counters):
+        with self.lock:
+            stats = self.stats.setdefault(name, {
+                'calls': 0,
+                'wall_times': deque(maxlen=self.RESERVOIR_SIZE),
+                'counters': dict((counter, 0) for counter in COUNTERS),
+            })
+            stats['calls'] += 1
+            stats['wall_times'].append(wall_time)
+            for counter in COUNTERS:
+                stats['counters'][counter] += counters[counter]
+            if time.time() - self.last_flush >= self.FLUSH_INTERVAL:
+                self.flush()
+
+    def snapshot(self):
+        return dict(
+            (name, {'calls': stats['calls'], 'wall_times': list(stats['wall_times']),
+                    'counters': dict(stats['counters'])})
+            for name, stats in self.stats.items()
+        )
+
+    def flush(self):
+        self.last_flush = time.time()
+        cache.set(self.process_key, self.snapshot(), self.CACHE_TIMEOUT)
+        processes = cache.get(self.PROCESSES_CACHE_KEY) or []
+        if self.process_key not in processes:
+            cache.set(self.PROCESSES_CACHE_KEY, processes + [self.process_key], self.CACHE_TIMEOUT)
+
+    @classmethod
+    def read_all(cls):
+        """
+        Merge the histograms flushed by every process
+        """
+        merged = {}
+        for process_key in cache.get(cls.PROCESSES_CACHE_KEY) or []:
+            for name, stats in (cache.get(process_key) or {}).items():
+                into = merged.setdefault(name, {'calls': 0, 'wall_times': [],
+                                                'counters': dict((counter, 0) for counter in COUNTERS)})
+                into['calls'] += stats['calls']
+                into['wall_times'].extend(stats['wall_times'])
+                for counter in COUNTERS:
+                    into['counters'][counter] += stats['counters'].get(counter, 0)
+        return merged
+
+    @classmethod
+    def clear_all(cls):
+        for process_key in cache.get(cls.PROCESSES_CACHE_KEY) or []:
+            cache.delete(process_key)
+        cache.delete(cls.PROCESSES_CACHE_KEY)
+
+
+SINKS = {
+    'logging': LoggingSink,
+    'statsd': StatsdSink,
+    'histogram': HistogramSink,
+}
+
+_sinks = None
+# sinks added in code with add_sink, kept across reloads and configure()
+_added_sinks = ()
+
+
+def get_sinks():
+    """
+    Sinks configured in HANDLER_METRICS_SINKS, created on first use
+    """
+    global _sinks  # pylint: disable=global-statement
+    if _sinks is None:
+        configure(features.HANDLER_METRICS_SINKS)
+    return _sinks
+
+
+@features.on_reload
+def _reset_sinks():
+    global _sinks  # pylint: disable=global-statement
+    _sinks = None
+
+
+def configure(sink_names):
+    """
+    Replace the active sinks with those named
+    """
+    global _sinks  # pylint: disable=global-statement
+    sinks = []
+    for sink_name in sink_names:
+        try:
+            sink_class = SINKS[sink_name] if sink_name in SINKS else import_string(sink_name)
+            sinks.append(sink_class())
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(u"Couldn't set up metrics sink %s", sink_name)
+    _sinks = tuple(sinks) + _added_sinks
+
+
+def add_sink(sink):
+    """
+    Also record to sink, on top of the configured sinks
+    """
+    global _added_sinks  # pylint: disable=global-statement
+    _added_sinks += (sink, )
+    _reset_sinks()
+
+
+def remove_sink(sink):
+    global _added_sinks  # pylint: disable=global-statement
+    _added_sinks = tuple(added for added in _added_sinks if added is not sink)
+    _reset_sinks()
@@ -0,0 +1,145 @@
+"""
+A ledger of the courses appsembler_setup_courses has set up, so that runs
+only check courses that changed since they were last set up: the course
+itself (its CourseOverview.modified), the setup code (SETUP_VERSION), or
+the settings setup depends on for the course's organization
+(settings_fingerprint()).
+
+Courses are recorded as they are set up, so a run that stops part way
+picks up where it left off when run again.
+"""
+import hashlib
+import json
+import logging
+import threading
+
+from django.db import transaction
+
+from appsembleredx.app_settings import ORG_SETTINGS, course_org, features
+from appsembleredx.models import CourseSetupRecord
+
+
+logger = logging.getLogger(__name__)
+
+# bump when setup steps change, so every course is checked again
+SETUP_VERSION = 1
+
+# APPSEMBLER_FEATURES setup depends on
+SETUP_SETTINGS = (
+    'DEFAULT_COURSE_MODE_SLUG',
+    'USE_OPEN_ENDED_CERTS_DEFAULTS',
+    'ACTIVATE_DEFAULT_CERTS',
+    'DEFAULT_CERT_SIGNATORIES',
+    'ALWAYS_ENABLE_SELF_GENERATED_CERTS',
+    'DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED',
+    'DISABLE_COURSE_COMPLETION_BADGES',
+)
+
+FLUSH_EVERY = 100
+
+
+# fingerprints by organization, worked out once per reload
+_fingerprints = {}
+
+
+@features.on_reload
+def _forget_fingerprints():
+    _fingerprints.clear()
+
+
+def settings_fingerprint(org=None):
+    """
+    Digest of the current values of SETUP_SETTINGS for courses of org
+    """
+    fingerprint = _fingerprints.get(org)
+    if fingerprint is None:
+        org_settings = features.for_org(org)
+        values = dict(
+            (name, getattr(org_settings if name in ORG_SETTINGS else features, name)) for name in SETUP_SETTINGS
+        )
+        fingerprint = hashlib.sha1(json.dumps(values, sort_keys=True, default=unicode)).hexdigest()
+        _fingerprints[org] = fingerprint
+    return fingerprint
+
+
+def course_fingerprint(course_key):
+    """
+    settings_fingerprint() for the organization of a course
+    """
+    return settings_fingerprint(course_org(course_key))
+
+
+def course_versions(course_keys):
+    """
+    CourseOverview.modified by unicode course key, for those of course_keys
+    with an overview
+    """
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+    return dict(
+        (unicode(course_id), modified) for course_id, modified in
+        CourseOverview.objects.filter(id__in=course_keys).values_list('id', 'modified')
+    )
+
+
+def unchanged_course_keys(course_keys):
+    """
+    Unicode keys of the courses among course_keys recorded as set up by
+    this setup version, with these settings, at their current version
+    """
+    course_keys = list(course_keys)
+    versions = course_versions(course_keys)
+    records = CourseSetupRecord.objects.filter(
+        course_id__in=course_keys, setup_version=SETUP_VERSION
+    ).values_list('course_id', 'course_version', 'settings_fingerprint')
+    return set(
+        unicode(course_id) for course_id, course_version, fingerprint in records
+        if course_version is not None and versions.get(unicode(course_id)) == course_version and
+        fingerprint == course_fingerprint(course_id)
+    )
+
+
+class Ledger(object):
+    """
+    Records courses as set up, writing FLUSH_EVERY courses at a time.
+    Each course is recorded with the version and settings fingerprint it
+    had when it was checked or set up, not when written, so a course
+    republished in between is checked again by the next run.
+    Thread-safe: run_parallel records from the thread feeding the pool too.
+    """
+
+    def __init__(self, flush_every=FLUSH_EVERY):
+        self.flush_every = flush_every
+        self.pending = []
+        self.lock = threading.Lock()
+        # one flush at a time, so that records are written in order
+        self.flush_lock = threading.Lock()
+
+    def record(self, course_key, course_version, fingerprint):
+        with self.lock:
+            self.pending.append((course_key, course_version, fingerprint))
+            full = len(self.pending) >= self.flush_every
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Write pending courses, the latest record of a course recorded twice
+        """
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, []
+            if pending:
+                self._write(pending)
+
+    def _write(self, pending):
+        records = dict((unicode(record[0]), record) for record in pending).values()
+        with transaction.atomic():
+            CourseSetupRecord.objects.filter(course_id__in=[record[0] for record in records]).delete()
+            CourseSetupRecord.objects.bulk_create([
+                CourseSetupRecord(
+                    course_id=course_key,
+                    setup_version=SETUP_VERSION,
+                    settings_fingerprint=fingerprint,
+                    course_version=course_version,
+                ) for course_key, course_version, fingerprint in records
+            ])
@@ -0,0 +1,77 @@
+"""
+Copy the credit and instruction type fields of existing courses to the
+CourseExtensionFields table, which is otherwise only updated on publish
+"""
+import logging
+from django.core.management import BaseCommand, CommandError
+from optparse import make_option
+from textwrap import dedent
+
+from opaque_keys.edx.keys import CourseKey
+from opaque_keys import InvalidKeyError
+
+from appsembleredx import course_setup, extension_fields
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Command to backfill CourseExtensionFields
+
+    Examples:
+        # backfills courses with keys course_id_1 and course_id_2
+        ./manage.py appsembler_backfill_extension_fields <course_id_1> <course_id_2>
+
+        # backfills all available courses, 1000 at a time
+        ./manage.py appsembler_backfill_extension_fields --all --batch-size 1000
+
+    Only rows whose values changed are written.
+    """
+    help = dedent(__doc__)
+
+    can_import_settings = True
+
+    args = "<course_id course_id ...>"
+
+    option_list = BaseCommand.option_list + (
+        make_option('--all',
+                    action='store_true',
+                    dest='all',
+                    default=False,
+                    help='Backfill all courses'),
+        make_option('--batch-size',
+                    action='store',
+                    dest='batch_size',
+                    type='int',
+                    default=extension_fields.BACKFILL_BATCH_SIZE,
+                    help='Number of courses to read and write at a time'),
+    )
+
+    def _parse_course_key(self, raw_value):
+        """ Parses course key from string """
+        try:
+            return CourseKey.from_string(raw_value)
+        except InvalidKeyError:
+            raise CommandError("Invalid course_key: '%s'." % raw_value)
+
+    def handle(self, *args, **options):
+        batch_size = options.get('batch_size') or extension_fields.BACKFILL_BATCH_SIZE
+
+        if len(args) == 0 and not options.get('all'):
+            raise CommandError(u"appsembler_backfill_extension_fields requires one or more arguments: "
+                               "<course_id>, or --all")
+        if batch_size < 1:
+            raise CommandError(u"--batch-size must be at least 1")
+        if not extension_fields.is_enabled():
+            raise CommandError(u"Neither ENABLE_CREDITS_EXTRA_FIELDS nor ENABLE_INSTRUCTION_TYPE_EXTRA_FIELDS "
+                               "is set in APPSEMBLER_FEATURES")
+
+        if options.get('all'):
+            course_keys = course_setup.iter_all_course_keys()
+        else:
+            course_keys = map(self._parse_course_key, args)
+
+        result = extension_fields.backfill(course_keys, batch_size)
+        self.stdout.write(u"{} created, {} updated, {} unchanged, {} missing from the modulestore".format(*result))
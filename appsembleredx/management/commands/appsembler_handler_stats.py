@@ -0,0 +1,59 @@
+# show timing and query counts of appsembleredx signal handlers and
+# monkeypatched functions, as collected by the 'histogram' metrics sink
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from appsembleredx.instrumentation import COUNTERS, HistogramSink
+
+
+def percentile(sorted_values, pct):
+    """ Nearest-rank percentile of an already sorted list """
+    if not sorted_values:
+        return 0
+    index = max(int(round(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class Command(BaseCommand):
+    help = """Shows wall time percentiles and mean DB queries, modulestore and
+    contentstore operations per call of each instrumented appsembleredx function.
+    Requires 'histogram' in APPSEMBLER_FEATURES['HANDLER_METRICS_SINKS'].
+    """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--reset',
+                    action='store_true',
+                    dest='reset',
+                    default=False,
+                    help='Clear collected stats after showing them'),
+    )
+
+    def handle(self, *args, **options):
+
+        def stdout(msg, style=self.style.NOTICE):
+            self.stdout.write(style(msg))
+
+        stats = HistogramSink.read_all()
+        if not stats:
+            stdout("No stats collected yet.  Is 'histogram' in APPSEMBLER_FEATURES['HANDLER_METRICS_SINKS']?")
+            return
+
+        stdout(u"{:<60} {:>7} {:>9} {:>9} {:>9}  {}".format(
+            'name', 'calls', 'p50 ms', 'p95 ms', 'p99 ms', '  '.join('mean ' + c for c in COUNTERS)))
+        for name in sorted(stats):
+            wall_times = sorted(stats[name]['wall_times'])
+            calls = stats[name]['calls']
+            self.stdout.write(u"{:<60} {:>7} {:>9.1f} {:>9.1f} {:>9.1f}  {}".format(
+                name, calls,
+                percentile(wall_times, 50) * 1000,
+                percentile(wall_times, 95) * 1000,
+                percentile(wall_times, 99) * 1000,
+                '  '.join('{:>{}.2f}'.format(float(stats[name]['counters'][c]) / calls, len('mean ' + c))
+                          for c in COUNTERS)
+            ))
+
+        if options.get('reset'):
+            HistogramSink.clear_all()
+            stdout('Cleared collected stats')
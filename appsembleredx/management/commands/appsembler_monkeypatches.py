@@ -0,0 +1,43 @@
+# show appsembleredx monkeypatches, whether they've been applied in this
+# process, and how long applying them and importing their targets took
+
+from importlib import import_module
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from appsembleredx import patching
+
+
+class Command(BaseCommand):
+    help = """Lists appsembleredx monkeypatches with their state in this process,
+    the time spent applying each and the time spent importing the modules it
+    patches, if they were first imported after appsembleredx.
+    """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--import-targets',
+                    action='store_true',
+                    dest='import_targets',
+                    default=False,
+                    help='First import every patched module not imported yet'),
+    )
+
+    def handle(self, *args, **options):
+
+        def stdout(msg, style=self.style.NOTICE):
+            self.stdout.write(style(msg))
+
+        if options.get('import_targets'):
+            for _name, targets, state, _apply_seconds, _import_seconds in patching.report():
+                if state == patching.PENDING:
+                    for target in targets:
+                        try:
+                            import_module(target)
+                        except ImportError as e:
+                            stdout(u"Couldn't import {}: {}".format(target, e), style=self.style.ERROR)
+
+        stdout(u"{:<28} {:<9} {:>10} {:>10}  {}".format('name', 'state', 'apply ms', 'import ms', 'targets'))
+        for name, targets, state, apply_seconds, import_seconds in patching.report():
+            self.stdout.write(u"{:<28} {:<9} {:>10.1f} {:>10.1f}  {}".format(
+                name, state, apply_seconds * 1000, import_seconds * 1000, ', '.join(targets)))
@@ -2,7 +2,9 @@
 Run all pre-/ and publish handlers to set up existing
 courses.  Doesn't actually publish the course
 """
+import cProfile
 import logging
+import sys
 from django.core.management import BaseCommand, CommandError
 from optparse import make_option
 from textwrap import dedent
@@ -13,9 +15,7 @@ from opaque_keys.edx.locator import CourseLocator
 
 from contentstore.management.commands.prompt import query_yes_no
 
-from xmodule.modulestore.django import modulestore
-
-from appsembleredx import signals
+from appsembleredx import course_setup, drift, profiling, throttling
 
 
 logger = logging.getLogger(__name__)
@@ -31,6 +31,25 @@ class Command(BaseCommand):
 
          # sets up all available courses
         ./manage.py appsembler_setup_courses --all
+
+        # sets up courses whose keys are listed one per line in a file, or on stdin with -
+        ./manage.py appsembler_setup_courses --from-file course_ids.txt
+
+        # sets up the second quarter of all courses on 8 worker processes
+        ./manage.py appsembler_setup_courses --all --shard 2/4 --workers 8
+
+        # lists the courses that need setup and the steps they need, changing nothing
+        ./manage.py appsembler_setup_courses --all --check
+
+        # writes a profile of each course set up to profile.jsonl, and cProfile stats to setup.prof
+        ./manage.py appsembler_setup_courses --all --profile profile.jsonl --cprofile setup.prof
+
+        # sets up at most 5 courses a second, slowing down while datastore latency is above 50ms
+        ./manage.py appsembler_setup_courses --all --workers 4 --max-rate 5 --latency-threshold 50
+
+    Only courses that need setup are written to.  Courses set up by an
+    earlier run are skipped unless they, the settings they were set up with,
+    or appsembleredx's setup steps have changed since; --full checks them all.
     """
     help = dedent(__doc__)
 
@@ -49,7 +68,68 @@ class Command(BaseCommand):
                                  default=False,
                                  help='Replace existing certificates')
 
-    option_list = BaseCommand.option_list + (all_option, replace_option)
+    from_file_option = make_option('--from-file',
+                                   action='store',
+                                   dest='from_file',
+                                   default=None,
+                                   help='Read course keys one per line from a file, or from stdin if -')
+    workers_option = make_option('--workers',
+                                 action='store',
+                                 dest='workers',
+                                 type='int',
+                                 default=1,
+                                 help='Number of worker processes to set up courses with')
+    shard_option = make_option('--shard',
+                               action='store',
+                               dest='shard',
+                               default=None,
+                               help='Only set up shard i of n of the course keys, given as i/n (1-based)')
+
+    check_option = make_option('--check',
+                               action='store_true',
+                               dest='check',
+                               default=False,
+                               help='Only list the courses that need setup and the steps they need')
+
+    full_option = make_option('--full',
+                              action='store_true',
+                              dest='full',
+                              default=False,
+                              help='Check courses set up by earlier runs again, even if unchanged since')
+
+    profile_option = make_option('--profile',
+                                 action='store',
+                                 dest='profile',
+                                 default=None,
+                                 help='Write per-course, per-phase timings, query counts and peak memory '
+                                      'as JSON lines to this file as courses are set up, and print a summary '
+                                      'of the slowest courses and phases at the end')
+
+    cprofile_option = make_option('--cprofile',
+                                  action='store',
+                                  dest='cprofile',
+                                  default=None,
+                                  help='Dump cProfile stats of the run to this file; needs --workers 1')
+
+    max_rate_option = make_option('--max-rate',
+                                  action='store',
+                                  dest='max_rate',
+                                  type='float',
+                                  default=None,
+                                  help='Set up at most this many courses per second, across all workers')
+
+    latency_threshold_option = make_option('--latency-threshold',
+                                           action='store',
+                                           dest='latency_threshold',
+                                           type='float',
+                                           default=None,
+                                           help='Slow down while the mean latency of modulestore operations or '
+                                                'DB queries is above this many milliseconds')
+
+    option_list = BaseCommand.option_list + (all_option, replace_option, from_file_option,
+                                             workers_option, shard_option, check_option, full_option,
+                                             profile_option, cprofile_option,
+                                             max_rate_option, latency_threshold_option)
 
     CONFIRMATION_PROMPT = u"Setting up all courses might be a time consuming operation. Do you want to continue?"
     REPLACE_CONFIRMATION_PROMPT = (u"Are you sure you want to replace all existing certificates?  "
@@ -67,6 +147,28 @@ class Command(BaseCommand):
 
         return result
 
+    def _iter_file_course_keys(self, path):
+        """ Yields course keys listed one per line, skipping blank lines and # comments """
+        lines = sys.stdin if path == '-' else open(path)
+        try:
+            for line in lines:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield self._parse_course_key(line)
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+
+    def _check(self, course_keys, replace_certs):
+        """ Writes the steps each course needs, without changing anything """
+        report = drift.DriftReport()
+        for course_drift in drift.iter_drift(course_keys, replace_certs):
+            report.record(course_drift)
+            if course_drift.steps:
+                self.stdout.write(u"{}: {}".format(course_drift.course_key, u", ".join(course_drift.steps)))
+        for line in report.lines():
+            self.stdout.write(line)
+
     def handle(self, *args, **options):
         """
         By convention set by Django developers, this method actually executes command's actions.
@@ -74,49 +176,91 @@ class Command(BaseCommand):
         """
         all_option = options.get('all', False)
         replace_option = options.get('replace', False)
+        from_file = options.get('from_file')
+        workers = options.get('workers') or 1
+        shard = options.get('shard')
+        check = options.get('check', False)
+        incremental = not options.get('full', False)
+        profile = options.get('profile')
+        cprofile = options.get('cprofile')
+        max_rate = options.get('max_rate')
+        latency_threshold = options.get('latency_threshold')
         replace_certs = False
 
-        if len(args) == 0 and not all_option:
-            raise CommandError(u"appsembler_setup_courses requires one or more arguments: <course_id>, or --all")
-
-        store = modulestore()
+        if len(args) == 0 and not all_option and not from_file:
+            raise CommandError(u"appsembler_setup_courses requires one or more arguments: <course_id>, "
+                               "--from-file, or --all")
+        if from_file == '-' and replace_option and not check:
+            raise CommandError(u"--replace asks for confirmation on stdin, so it can't be used with --from-file -")
+        if workers < 1:
+            raise CommandError(u"--workers must be at least 1")
+        if cprofile and workers > 1:
+            raise CommandError(u"--cprofile only profiles this process, so it needs --workers 1")
+        if max_rate is not None and max_rate <= 0:
+            raise CommandError(u"--max-rate must be more than 0")
+        if latency_threshold is not None and latency_threshold <= 0:
+            raise CommandError(u"--latency-threshold must be more than 0")
+        if shard:
+            try:
+                shard = course_setup.parse_shard(shard)
+            except ValueError, e:
+                raise CommandError(unicode(e))
 
         if all_option:
             # if reindexing is done during devstack setup step, don't prompt the user
-            if query_yes_no(self.CONFIRMATION_PROMPT, default="no"):
-                # in case of --all, get the list of course keys from all courses
+            if check or query_yes_no(self.CONFIRMATION_PROMPT, default="no"):
+                # in case of --all, stream the keys of all courses
                 # that are stored in the modulestore
-                course_keys = []
-                try:
-                    for course in modulestore().get_courses():
-                        course_keys.append(course.id)
-                except AttributeError, e:
-                    if 'HiddenDescriptor' in e.message:
-                        logger.warn('Failed on hidden course without id attr')
-                    pass
+                course_keys = course_setup.iter_all_course_keys()
             else:
                 return
+        elif from_file:
+            course_keys = self._iter_file_course_keys(from_file)
         else:
             # in case course keys are provided as arguments
             course_keys = map(self._parse_course_key, args)
 
+        if shard:
+            course_keys = course_setup.filter_shard(course_keys, *shard)
+
+        if check:
+            self._check(course_keys, replace_option)
+            return
+
         if replace_option:
             if query_yes_no(self.REPLACE_CONFIRMATION_PROMPT, default="no"):
+                # replacing ignores active_default_cert_created, so there is
+                # no need to load each course up front to reset it
                 replace_certs = True
-                # set active_default_cert_created to False for courses
-                for key in course_keys:
-                    course = store.get_course(key)
-                    course.active_default_cert_created = False
-                    course.save()
-
-        for course_key in course_keys:
-            # call functions that are normally signal handlers
-            signals._default_mode_on_course_publish(store.__class__, course_key)
-            signals._change_cert_defaults_on_pre_publish(store.__class__, course_key)
-            signals.enable_self_generated_certs(store.__class__, course_key)
-            signals._make_default_active_certificate(
-                store.__class__,
-                course_key,
-                replace_certs,
-                True  # always force when using command
+
+        profile_file = open(profile, 'w') if profile else None
+        profile_report = profiling.ProfileReport(profile_file) if profile_file else None
+        profiler = cProfile.Profile() if cprofile else None
+        throttle = None
+        if max_rate or latency_threshold:
+            throttle = throttling.Throttle(
+                max_rate, latency_threshold / 1000.0 if latency_threshold is not None else None
             )
+        try:
+            if profiler:
+                profiler.enable()
+            if workers > 1:
+                report = course_setup.run_parallel(course_keys, workers, replace_certs, incremental, profile_report,
+                                                   throttle)
+            else:
+                report = course_setup.run_serial(course_keys, replace_certs, incremental, profile_report, throttle)
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(cprofile)
+            if profile_file:
+                profile_file.close()
+
+        for line in report.lines():
+            self.stdout.write(line)
+        if throttle:
+            for line in throttle.lines():
+                self.stdout.write(line)
+        if profile_report:
+            for line in profile_report.lines():
+                self.stdout.write(line)
@@ -0,0 +1,49 @@
+# run this on every deploy to bring the site-wide configurations appsembleredx
+# manages in line with APPSEMBLER_FEATURES; it only writes when they differ
+# called by Ansible playbook
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appsembleredx import config_sync
+
+
+class Command(BaseCommand):
+    help = """Adds a LinkedInAddToProfileConfiguration, CertificateGenerationConfiguration
+    and CertificateHtmlViewConfiguration record if the current one differs from
+    APPSEMBLER_FEATURES, in one transaction.  Configs the settings don't ask
+    for are left alone.
+    """
+
+    option_list = BaseCommand.option_list + (
+        make_option('--only',
+                    action='append',
+                    dest='only',
+                    default=None,
+                    choices=config_sync.CONFIG_NAMES,
+                    help='Only sync this config; may be given more than once ({})'.format(
+                        ', '.join(config_sync.CONFIG_NAMES))),
+        make_option('--dry-run',
+                    action='store_true',
+                    dest='dry_run',
+                    default=False,
+                    help='Only report what would be written'),
+    )
+
+    def handle(self, *args, **options):
+
+        def stdout(msg, style=self.style.NOTICE):
+            self.stdout.write(style(msg))
+
+        try:
+            results = config_sync.sync(options.get('only') or config_sync.CONFIG_NAMES, options.get('dry_run'))
+        except Exception:  # pylint: disable=broad-except
+            stdout("Couldn't sync configurations", style=self.style.ERROR)
+            raise CommandError("Couldn't sync configurations")
+
+        for name, status, disabled in results:
+            msg = u"{}: {}".format(name, status)
+            if disabled:
+                msg += u", {} other enabled row(s) disabled".format(disabled)
+            stdout(msg)
@@ -1,16 +1,15 @@
 # run this to enable LinkedIn configuration on an Open edX install
-# called by Ansible playbook
+# called by Ansible playbook; appsembler_sync_config --only linkedin does the same
 
 from django.core.management.base import BaseCommand, CommandError
 
-from student import models
-
-from appsembleredx import app_settings
+from appsembleredx import config_sync
+from appsembleredx.app_settings import features
 
 
 class Command(BaseCommand):
     help = """Creates a LinkedInAddToProfileConfiguration record to enable
-    certificate sharing on LinkedIn
+    certificate sharing on LinkedIn, unless the current one already does
     """
 
     def handle(self, *args, **options):
@@ -18,17 +17,17 @@ class Command(BaseCommand):
         def stdout(msg, style=self.style.NOTICE):
             self.stdout.write(style(msg))
 
-        company_id = app_settings.LINKEDIN_ADDTOPROFILE_COMPANY_ID
-
-        if not company_id:
+        if not features.LINKEDIN_ADDTOPROFILE_COMPANY_ID:
             raise CommandError("You must specify a value for "
                                "APPSEMBLER_FEATURES['LINKEDIN_ADDTOPROFILE_COMPANY_ID'] in your env.json file")
 
         try:
-            enable = models.LinkedInAddToProfileConfiguration(company_identifier=company_id, enabled=True)
-            enable.save()
+            result, = config_sync.sync(['linkedin'])
         except Exception:  # pylint: disable=broad-except
             stdout("Couldn't enable a LinkedIn Add to Profile configuration", style=self.style.ERROR)
             raise CommandError("Couldn't enable a LinkedIn Add to Profile configuration")
 
-        stdout('Enabled a LinkedIn Add to Profile configuration')
+        if result.status == config_sync.UNCHANGED:
+            stdout('LinkedIn Add to Profile configuration already enabled')
+        else:
+            stdout('Enabled a LinkedIn Add to Profile configuration')
@@ -1,14 +1,14 @@
 # run this to enable self-generated certs on an Open edX install
-# called by Ansible playbook
+# called by Ansible playbook; appsembler_sync_config --only self_generated_certs does the same
 
 from django.core.management.base import BaseCommand, CommandError
 
-from certificates import models
+from appsembleredx import config_sync
 
 
 class Command(BaseCommand):
     help = """Creates a CertificateGenerationConfiguration record to enable
-    self-generated certificates.
+    self-generated certificates, unless they already are
     """
 
     def handle(self, *args, **options):
@@ -17,10 +17,12 @@ class Command(BaseCommand):
             self.stdout.write(style(msg))
 
         try:
-            enable = models.CertificateGenerationConfiguration(enabled=True)
-            enable.save()
+            result, = config_sync.sync(['self_generated_certs'])
         except Exception:  # pylint: disable=broad-except
             stdout("Couldn't enable self-generated certs", style=self.style.ERROR)
             raise CommandError("Couldn't enable self-generated certs")
 
-        stdout('Enabled self-generated certificates')
+        if result.status == config_sync.UNCHANGED:
+            stdout('Self-generated certificates already enabled')
+        else:
+            stdout('Enabled self-generated certificates')
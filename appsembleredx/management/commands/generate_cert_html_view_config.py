@@ -1,18 +1,16 @@
 # this will generate an HTML View Configuration for certs based
-# on ENV token values
-
-import json
+# on ENV token values; appsembler_sync_config --only cert_html_view does the same
 
 from django.core.management.base import BaseCommand, CommandError
 
-from certificates import models
-
-from appsembleredx import app_settings
+from appsembleredx import config_sync
+from appsembleredx.app_settings import features
 
 
 class Command(BaseCommand):
     help = """Creates a CertificateHtmlViewConfiguration from
-    dict in settings.
+    dict in settings, unless the current one matches it, and disables
+    any other enabled one.
     """
 
     def handle(self, *args, **options):
@@ -20,25 +18,19 @@ class Command(BaseCommand):
         def stdout(msg, style=self.style.NOTICE):
             self.stdout.write(style(msg))
 
+        if not features.CERTS_HTML_VIEW_CONFIGURATION:
+            raise CommandError("Nothing to generate.  Set APPSEMBLER_CERTS_HTML_VIEW_CONFIGURATION "
+                               "in your lms/cms.env.json")
+
         try:
-            config = app_settings.CERTS_HTML_VIEW_CONFIGURATION
-            if not config:
-                raise CommandError("Nothing to generate.  Set APPSEMBLER_CERTS_HTML_VIEW_CONFIGURATION "
-                                   "in your lms/cms.env.json")
-
-            # disable all old configs
-            try:
-                existing_configs = models.CertificateHtmlViewConfiguration.objects.all()
-                for old in existing_configs:
-                    old.enabled = False
-                    old.save()
-                stdout('Disabled old HTML View Configurations for certs')
-            except models.CertificateHtmlViewConfiguration.DoesNotExist:
-                pass
-            htmlviewconfig = models.CertificateHtmlViewConfiguration(configuration=json.dumps(config), enabled=True)
-            htmlviewconfig.save()
+            result, = config_sync.sync(['cert_html_view'])
         except Exception:  # pylint: disable=broad-except
             stdout("Couldn't set an HTML View Configuration for certs", style=self.style.ERROR)
             raise CommandError("Couldn't set an HTML View Configuration for certs")
 
-        stdout('Set an HTML View Configuration for certs')
+        if result.disabled:
+            stdout('Disabled old HTML View Configurations for certs')
+        if result.status == config_sync.UNCHANGED:
+            stdout('HTML View Configuration for certs already set')
+        else:
+            stdout('Set an HTML View Configuration for certs')
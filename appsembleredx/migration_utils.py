@@ -0,0 +1,65 @@
+"""
+Helpers for appsembleredx data migrations
+"""
+import re
+import sys
+
+from course_modes.models import CourseMode
+
+from appsembleredx.modes import invalidate_modes_cache
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def chunked_update(queryset, batch_size=DEFAULT_BATCH_SIZE, stdout=None, **values):
+    """
+    Set values on every row matched by queryset, batch_size rows at a time,
+    walking the primary key so each batch is a short UPDATE ... WHERE pk IN
+    (...) rather than one statement locking the whole table.  Rows that stop
+    matching once updated are simply not seen again.  Updating CourseModes
+    forgets the cached modes of the courses each batch touched, as a queryset
+    update sends no signals.  Writes progress to stdout and returns the number
+    of rows updated.
+
+    Use in a RunPython operation, e.g.
+        chunked_update(CourseMode.objects.filter(mode_slug='audit'), mode_slug='honor')
+    """
+    stdout = stdout or sys.stdout
+    model = queryset.model
+    label = model._meta.db_table
+    total = queryset.count()
+    if not total:
+        return 0
+
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    updated = 0
+    last_pk = None
+    while True:
+        remaining = pks if last_pk is None else pks.filter(pk__gt=last_pk)
+        batch = list(remaining[:batch_size])
+        if not batch:
+            break
+        updated += model._default_manager.filter(pk__in=batch).update(**values)
+        _invalidate_caches(model, batch)
+        last_pk = batch[-1]
+        stdout.write("\n  {}: updated {} of {} row(s)".format(label, updated, total))
+        stdout.flush()
+    return updated
+
+
+def _invalidate_caches(model, pks):
+    # a migration passes its historical model, so compare tables rather than classes
+    if model._meta.db_table == CourseMode._meta.db_table:
+        course_keys = model._default_manager.filter(pk__in=pks).values_list('course_id', flat=True).distinct()
+        for course_key in course_keys:
+            invalidate_modes_cache(course_key)
+
+
+def exact(queryset, field, value):
+    """
+    Filter queryset on field being exactly value, case included.  MySQL's
+    default collation compares case-insensitively, so the plain filter (which
+    can use an index) is narrowed with a case-sensitive regex.
+    """
+    return queryset.filter(**{field: value}).filter(**{field + '__regex': r'^{}$'.format(re.escape(value))})
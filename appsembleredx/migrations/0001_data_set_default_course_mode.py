@@ -3,7 +3,8 @@ import json
 
 from django.db import migrations
 
-from appsembleredx import app_settings
+from appsembleredx.app_settings import features
+from appsembleredx.migration_utils import chunked_update, exact
 
 
 def get_models(apps):
@@ -16,11 +17,11 @@ def change_audit_course_modes(apps, schema_editor):
     """
     (CourseMode, ) = get_models(apps)
 
-    for cm in CourseMode.objects.all():
-        if cm.mode_slug == 'audit':
-            cm.mode_slug = app_settings.DEFAULT_COURSE_MODE_SLUG
-            cm.mode_display_name = app_settings.mode_name_from_slug
-            cm.save()
+    chunked_update(
+        exact(CourseMode.objects.all(), 'mode_slug', 'audit'),
+        mode_slug=features.DEFAULT_COURSE_MODE_SLUG,
+        mode_display_name=unicode(features.mode_name_from_slug)
+    )
 
 
 class Migration(migrations.Migration):
@@ -4,6 +4,7 @@ import json
 from django.db import migrations
 
 from appsembleredx import app_settings
+from appsembleredx.migration_utils import chunked_update, exact
 
 
 def get_models(apps):
@@ -16,11 +17,11 @@ def fix_honor_course_mode_slugs(apps, schema_editor):
     """
     (CourseMode, ) = get_models(apps)
 
-    for cm in CourseMode.objects.all():
-        if cm.mode_slug == 'HONOR':
-            cm.mode_slug = 'honor'
-            cm.mode_display_name = 'Honor'
-            cm.save()
+    chunked_update(
+        exact(CourseMode.objects.all(), 'mode_slug', 'HONOR'),
+        mode_slug='honor',
+        mode_display_name='Honor'
+    )
 
 
 class Migration(migrations.Migration):
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from django.db import migrations, models
+
+try:
+    from openedx.core.djangoapps.xmodule_django.models import CourseKeyField
+except ImportError:  # moved in ficus
+    from xmodule_django.models import CourseKeyField
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appsembleredx', '0002_data_fix_honor_course_mode_slugs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSetupRecord',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('course_id', CourseKeyField(unique=True, max_length=255)),
+                ('setup_version', models.PositiveIntegerField()),
+                ('settings_fingerprint', models.CharField(max_length=40)),
+                ('course_version', models.DateTimeField(null=True)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from django.db import migrations, models
+
+try:
+    from openedx.core.djangoapps.xmodule_django.models import CourseKeyField
+except ImportError:  # moved in ficus
+    from xmodule_django.models import CourseKeyField
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appsembleredx', '0003_coursesetuprecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseExtensionFields',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('course_id', CourseKeyField(unique=True, max_length=255)),
+                ('org', models.CharField(max_length=255, db_index=True)),
+                ('credit_provider', models.CharField(max_length=255, null=True, db_index=True)),
+                ('credits', models.FloatField(null=True, db_index=True)),
+                ('credit_unit', models.CharField(max_length=255, null=True)),
+                ('accreditation_conferred', models.TextField(null=True)),
+                ('field_of_study', models.CharField(max_length=255, null=True, db_index=True)),
+                ('instructional_method', models.CharField(max_length=255, null=True, db_index=True)),
+                ('instruction_location', models.CharField(max_length=255, null=True, db_index=True)),
+                ('course_version', models.CharField(max_length=255, null=True)),
+                ('modified', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='courseextensionfields',
+            index_together=set([('field_of_study', 'credits')]),
+        ),
+    ]
@@ -4,10 +4,12 @@ Reusable mixins for XBlocks and/or XModules
 import inspect
 from new import instancemethod
 
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.functional import lazy
 from xblock.fields import Scope, String, Float, Boolean, XBlockMixin
-from xmodule import course_module, xml_module
 
-from . import app_settings
+from .app_settings import features
+from .instrumentation import instrumented
 
 # Make '_' a no-op so we can scrape strings
 _ = lambda text: text  # noqa
@@ -15,14 +17,6 @@ _ = lambda text: text  # noqa
 
 CREDITS_VIEW = 'credits_view'
 INSTRUCTION_TYPE_VIEW = 'instruction_type_view'
-CREDIT_PROVIDERS = app_settings.CREDIT_PROVIDERS
-CREDIT_PROVIDERS_DEFAULT = app_settings.CREDIT_PROVIDERS_DEFAULT
-COURSE_INSTRUCTIONAL_METHODS = app_settings.COURSE_INSTRUCTIONAL_METHODS
-COURSE_FIELDS_OF_STUDY = app_settings.COURSE_FIELDS_OF_STUDY
-COURSE_INSTRUCTIONAL_METHOD_DEFAULT = app_settings.COURSE_INSTRUCTIONAL_METHOD_DEFAULT
-COURSE_INSTRUCTION_LOCATIONS = app_settings.COURSE_INSTRUCTION_LOCATIONS
-COURSE_INSTRUCTION_LOCATION_DEFAULT = app_settings.COURSE_INSTRUCTION_LOCATION_DEFAULT
-ACCREDITATION_CONFERRED_HELP = app_settings.ACCREDITATION_CONFERRED_HELP
 
 # this is included as a mixin in xmodule.course_module.CourseDescriptor
 
@@ -40,6 +34,36 @@ def build_field_values(values):
         return None
 
 
+# resolved chains of classes to call definition_to_xml/definition_from_xml on,
+# by (concrete class, method name)
+_DEFINITION_CHAINS = {}
+
+
+def _definition_chain(cls, method_name):
+    """
+    Classes in the MRO of cls, base classes first, whose method_name
+    XMLDefinitionChainingMixin calls in turn.  Resolved once per class.
+    """
+    try:
+        return _DEFINITION_CHAINS[(cls, method_name)]
+    except KeyError:
+        pass
+
+    # not imported at the top: this module is imported while xmodule.course_module is being patched
+    from xmodule import course_module, xml_module
+    dont_call_twice = (str(cls),
+                       "<class 'xblock.internal.CourseDescriptorWithMixins'>",  # generated class name
+                       str(course_module.CourseDescriptor),
+                       str(XMLDefinitionChainingMixin),
+                       str(xml_module.XmlParserMixin)
+                       )
+    chain = tuple(klass for klass in reversed(inspect.getmro(cls))
+                  if str(klass) not in dont_call_twice and
+                  type(getattr(klass, method_name, None)) == instancemethod)
+    _DEFINITION_CHAINS[(cls, method_name)] = chain
+    return chain
+
+
 class XMLDefinitionChainingMixin(XBlockMixin):
     """
     Provide for chaining of definition_to_xml, definition_from_xml
@@ -86,6 +110,7 @@ class XMLDefinitionChainingMixin(XBlockMixin):
     # <class 'xblock.plugin.Plugin'>,
     # <type 'object'>)
 
+    @instrumented('mixins.XMLDefinitionChainingMixin.definition_to_xml')
     def definition_to_xml(self, resource_fs):
         """
         append any additional xml from Mixin Classes' definition_to_xml methods
@@ -97,51 +122,26 @@ class XMLDefinitionChainingMixin(XBlockMixin):
         # explicitly calls LicenseMixin's add_license_to_xml()
 
         xmlobj = resource_fs  # not really an XML object but first called needs this val.
-        mro = list(inspect.getmro(type(self)))
-        mro.reverse()
-        dont_call_twice = (str(self.__class__),
-                           "<class 'xblock.internal.CourseDescriptorWithMixins'>",  # generated class name
-                           str(course_module.CourseDescriptor),
-                           str(XMLDefinitionChainingMixin),
-                           str(xml_module.XmlParserMixin)
-                           )
-
-        for klass in mro:
-            if str(klass) in dont_call_twice:
+        for klass in _definition_chain(type(self), 'definition_to_xml'):
+            try:
+                xmlobj = klass.definition_to_xml(self, xmlobj)
+            except NotImplementedError:  # some base classes raise this
                 continue
 
-            if type(getattr(klass, 'definition_to_xml', None)) == instancemethod:
-                try:
-                    xmlobj = klass.definition_to_xml(self, xmlobj)
-                except NotImplementedError:  # some base classes raise this
-                    continue
-
         return xmlobj
 
     @classmethod
+    @instrumented('mixins.XMLDefinitionChainingMixin.definition_from_xml')
     def definition_from_xml(cls, definition, children):
         """
         set field values from Mixin Classes' definition_from_xml methods
         """
-        mro = list(inspect.getmro(cls))
-        mro.reverse()
-        dont_call_twice = (str(cls),
-                           "<class 'xblock.internal.CourseDescriptorWithMixins'>",  # generated class name
-                           str(course_module.CourseDescriptor),
-                           str(XMLDefinitionChainingMixin),
-                           str(xml_module.XmlParserMixin)
-                           )
-
-        for klass in mro:
-            if str(klass) in dont_call_twice:
+        for klass in _definition_chain(cls, 'definition_from_xml'):
+            try:
+                definition, children = klass.definition_from_xml(definition, children)
+            except NotImplementedError:  # some base classes raise this
                 continue
 
-            if type(getattr(klass, 'definition_to_xml', None)) == instancemethod:
-                try:
-                    definition, children = klass.definition_from_xml(definition, children)
-                except NotImplementedError:  # some base classes raise this
-                    continue
-
         return definition, children
 
 
@@ -160,27 +160,89 @@ class CertificatesExtensionMixin(XBlockMixin):
 
     @classmethod
     def definition_from_xml(cls, definition, children):
-        print "in CertificatesExtensionMixin definition_to_xml"
         return definition, children
 
     def definition_to_xml(self, xml_object):
-        print "in CertificatesExtensionMixin definition_to_xml"
         for field in ('cert_defaults_set', 'active_default_cert_created'):
             if getattr(self, field, None):
                 xml_object.set(field, str(getattr(self, field)))
         return xml_object
 
 
+def setting_values(setting):
+    """
+    Callable for an XBlock Field's values, building them from the setting
+    when they are read
+    """
+    return lambda: build_field_values(getattr(features, setting))
+
+
+def _setting_text(setting):
+    return unicode(getattr(features, setting))
+
+
+# text of a setting, read when the text is used
+setting_text = lazy(_setting_text, unicode)
+
+
+def check_default_value_hook(field_class):
+    """
+    Raise ImproperlyConfigured unless field_class has XBlock's
+    _get_default_value_to_cache(self, xblock), which Field.__get__ calls for
+    the value of a field a block hasn't set, as in XBlock 1.0.  The public
+    default has no block to find an organization from.
+    """
+    hook = getattr(field_class, '_get_default_value_to_cache', None)
+    if hook is None or inspect.getargspec(hook).args != ['self', 'xblock']:
+        raise ImproperlyConfigured(
+            u"{}._get_default_value_to_cache(self, xblock) is missing from this XBlock; "
+            u"OrgDefaultString can't default to organization settings".format(field_class.__name__)
+        )
+
+
+class OrgDefaultString(String):
+    """
+    String field defaulting to the setting default_setting of the block's
+    organization (see app_settings.ORG_OVERRIDES), for blocks where it's not
+    set.  Its default is the global one.
+    """
+
+    def __init__(self, default_setting, **kwargs):
+        self.default_setting = default_setting
+        super(OrgDefaultString, self).__init__(**kwargs)
+
+    @property
+    def default(self):
+        return getattr(features, self.default_setting)
+
+    def _get_default_value_to_cache(self, xblock):
+        try:
+            # an inherited value, as in Field
+            return self.from_json(xblock._field_data.default(xblock, self.name))  # pylint: disable=protected-access
+        except KeyError:
+            pass
+        course_key = getattr(xblock.scope_ids.usage_id, 'course_key', None)
+        return getattr(features.for_course(course_key), self.default_setting)
+
+
+# fail on import, rather than have every block fall back to the global default
+check_default_value_hook(String)
+
+
+# settings are read when fields are, not when the classes below are defined,
+# so importing them doesn't read APPSEMBLER_FEATURES
+
+
 class CreditsMixin(XBlockMixin):
     """
     Mixin that allows an author to specify a credit provider and a number of credit
     units.
     """
-    credit_provider = String(
+    credit_provider = OrgDefaultString(
+        "CREDIT_PROVIDERS_DEFAULT",
         display_name=_("Credit Provider"),
         help=_("Name of the entity providing the credit units"),
-        values=build_field_values(CREDIT_PROVIDERS),
-        default=CREDIT_PROVIDERS_DEFAULT,
+        values=setting_values("CREDIT_PROVIDERS"),
         scope=Scope.settings,
     )
 
@@ -200,18 +262,16 @@ class CreditsMixin(XBlockMixin):
 
     accreditation_conferred = String(
         display_name=_("Accreditation Conferred"),
-        help=ACCREDITATION_CONFERRED_HELP,
+        help=setting_text("ACCREDITATION_CONFERRED_HELP"),
         default=None,
         scope=Scope.settings,
     )
 
     @classmethod
     def definition_from_xml(cls, definition, children):
-        print "in CreditsMixin definition_to_xml"
         return definition, children
 
     def definition_to_xml(self, xml_object):
-        print "in CreditsMixin definition_to_xml"
         for field in ('credit_provider', 'credits', 'credit_unit', 'accreditation_conferred'):
             if getattr(self, field, None):
                 xml_object.set(field, str(getattr(self, field)))
@@ -226,35 +286,33 @@ class InstructionTypeMixin(XBlockMixin):
     field_of_study = String(
         display_name=_("Field of Study"),
         help=_("Topic/field classification of the course content"),
-        values=build_field_values(COURSE_FIELDS_OF_STUDY),
+        values=setting_values("COURSE_FIELDS_OF_STUDY"),
         scope=Scope.settings,
     )
 
     # we could create course_modes for this, but better to keep this separate.
-    instructional_method = String(
+    instructional_method = OrgDefaultString(
+        "COURSE_INSTRUCTIONAL_METHOD_DEFAULT",
         display_name=_("Instructional Method"),
         help=_("Type of instruction; e.g., classroom, self-paced"),
-        default=COURSE_INSTRUCTIONAL_METHOD_DEFAULT,
-        values=build_field_values(COURSE_INSTRUCTIONAL_METHODS),
+        values=setting_values("COURSE_INSTRUCTIONAL_METHODS"),
         scope=Scope.settings,
     )
 
-    instruction_location = String(
+    instruction_location = OrgDefaultString(
+        "COURSE_INSTRUCTION_LOCATION_DEFAULT",
         display_name=_("Instruction Location"),
         help=_("Physical location of insruction; for cases where Open edX courseware is "
                "used in a specific physical setting"),
-        values=build_field_values(COURSE_INSTRUCTION_LOCATIONS),
-        default=COURSE_INSTRUCTION_LOCATION_DEFAULT,
+        values=setting_values("COURSE_INSTRUCTION_LOCATIONS"),
         scope=Scope.settings,
     )
 
     @classmethod
     def definition_from_xml(cls, definition, children):
-        print "in InstructionTypeMixin definition_to_xml"
         return definition, children
 
     def definition_to_xml(self, xml_object):
-        print "in InstructionTypeMixin definition_to_xml"
         for field in ('field_of_study', 'instructional_method', 'instruction_location'):
             if getattr(self, field, None):
                 xml_object.set(field, str(getattr(self, field)))
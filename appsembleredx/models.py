@@ -0,0 +1,64 @@
+"""
+Models for appsembleredx
+"""
+from django.db import models
+
+try:
+    from openedx.core.djangoapps.xmodule_django.models import CourseKeyField
+except ImportError:  # moved in ficus
+    from xmodule_django.models import CourseKeyField
+
+
+class CourseSetupRecord(models.Model):
+    """
+    When appsembler_setup_courses last set up a course, and under which
+    setup version, settings and course version, so later runs can skip
+    courses that haven't changed since
+    """
+    course_id = CourseKeyField(max_length=255, unique=True)
+    # appsembleredx.ledger.SETUP_VERSION of the run
+    setup_version = models.PositiveIntegerField()
+    # digest of the APPSEMBLER_FEATURES values setup depends on
+    settings_fingerprint = models.CharField(max_length=40)
+    # CourseOverview.modified when recorded, None if the course had no overview
+    course_version = models.DateTimeField(null=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta(object):
+        app_label = 'appsembleredx'
+
+    def __unicode__(self):
+        return u"{} set up with version {}".format(self.course_id, self.setup_version)
+
+
+class CourseExtensionFields(models.Model):
+    """
+    Copy of the course fields added by CreditsMixin and InstructionTypeMixin,
+    kept up to date on publish, so courses can be listed and filtered by
+    them without loading each from the modulestore
+    """
+    course_id = CourseKeyField(max_length=255, unique=True)
+    org = models.CharField(max_length=255, db_index=True)
+
+    # CreditsMixin
+    credit_provider = models.CharField(max_length=255, null=True, db_index=True)
+    credits = models.FloatField(null=True, db_index=True)
+    credit_unit = models.CharField(max_length=255, null=True)
+    accreditation_conferred = models.TextField(null=True)
+
+    # InstructionTypeMixin
+    field_of_study = models.CharField(max_length=255, null=True, db_index=True)
+    instructional_method = models.CharField(max_length=255, null=True, db_index=True)
+    instruction_location = models.CharField(max_length=255, null=True, db_index=True)
+
+    # modulestore version of the course the values were copied from, when they last changed;
+    # publishing without changing them doesn't write the row
+    course_version = models.CharField(max_length=255, null=True)
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta(object):
+        app_label = 'appsembleredx'
+        index_together = (('field_of_study', 'credits'), )
+
+    def __unicode__(self):
+        return u"Extension fields of {}".format(self.course_id)
@@ -0,0 +1,219 @@
+"""
+Race-safe creation of CourseModes in the default mode, for one course on
+publish or for many courses at once during bulk setup, and a cache of
+CourseMode.modes_for_course.
+"""
+import functools
+import logging
+
+from django.db import connections, router, transaction
+from django.db.models import AutoField
+from django.db.models.signals import post_delete, post_save
+from django.dispatch.dispatcher import receiver
+
+from course_modes.models import CourseMode
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+from appsembleredx import caching
+from appsembleredx.app_settings import features
+
+
+logger = logging.getLogger(__name__)
+
+BULK_INSERT_BATCH_SIZE = 500
+
+# arguments to modes_for_course cached modes hold for, when they hold for any
+ANY_ARGUMENTS = None
+
+# how each backend spells "skip rows that conflict with a unique constraint", appended
+# to a multi-row INSERT.  Only the conflict is skipped: MySQL's INSERT IGNORE (and
+# SQLite's INSERT OR IGNORE) would also skip rows with a NULL in a NOT NULL column, a
+# value too long or a missing foreign key, so MySQL updates the existing row to itself.
+INSERT_IGNORE_SQL = {
+    'mysql': u' ON DUPLICATE KEY UPDATE {pk} = {pk}',
+    'postgresql': u' ON CONFLICT DO NOTHING',  # 9.5+
+    'sqlite': u' ON CONFLICT DO NOTHING',  # 3.24+
+}
+
+
+def _supports_insert_ignore(connection):
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 24)
+    return connection.vendor in INSERT_IGNORE_SQL
+
+
+def _new_default_mode(course_key):
+    return CourseMode(course_id=course_key, mode_slug=features.DEFAULT_COURSE_MODE_SLUG,
+                      mode_display_name=unicode(features.mode_name_from_slug))
+
+
+def _insert_ignore_sql(connection, fields, row_count):
+    """
+    INSERT of row_count CourseModes' fields which skips those that conflict
+    with an existing row, with a parameter per field of each row
+    """
+    quote_name = connection.ops.quote_name
+    row = u"({})".format(u", ".join([u"%s"] * len(fields)))
+    return u"INSERT INTO {} ({}) VALUES {}{}".format(
+        quote_name(CourseMode._meta.db_table),
+        u", ".join(quote_name(field.column) for field in fields),
+        u", ".join([row] * row_count),
+        INSERT_IGNORE_SQL[connection.vendor].format(pk=quote_name(CourseMode._meta.pk.column)),
+    )
+
+
+def _insert_ignore(course_modes):
+    """
+    Insert CourseModes in multi-row INSERTs, like bulk_create, but let the
+    database skip rows that already exist under CourseMode's unique
+    (course_id, mode_slug, currency) constraint, rather than raising
+    IntegrityError.  Returns the number of rows inserted; on MySQL, which
+    Django connects with CLIENT_FOUND_ROWS, rows skipped are counted too.
+    """
+    connection = connections[router.db_for_write(CourseMode)]
+    fields = [f for f in CourseMode._meta.local_concrete_fields if not isinstance(f, AutoField)]
+    batch_size = max(connection.ops.bulk_batch_size(fields, course_modes), 1)
+    inserted = 0
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            for start in range(0, len(course_modes), batch_size):
+                batch = course_modes[start:start + batch_size]
+                params = [field.get_db_prep_save(field.pre_save(course_mode, True), connection=connection)
+                          for course_mode in batch for field in fields]
+                cursor.execute(_insert_ignore_sql(connection, fields, len(batch)), params)
+                inserted += max(cursor.rowcount, 0)
+    return inserted
+
+
+def _modes_cache_namespace(course_key):
+    return u"course_modes.{}".format(course_key)
+
+
+def _modes_cache_key(course_key):
+    return u"appsembleredx.course_modes.{}.modes.{}".format(course_key, features.DEFAULT_COURSE_MODE_SLUG)
+
+
+def invalidate_modes_cache(course_key):
+    """
+    Forget the cached modes of a course
+    """
+    caching.bump_namespace_version(_modes_cache_namespace(course_key))
+
+
+def caching_modes_for_course(modes_for_course):
+    """
+    Wrap CourseMode.modes_for_course, bound to the class, to cache its
+    results per course and arguments.  Results with a mode that expires
+    aren't cached, as they change when it does.  Most courses only have
+    the default mode, so most calls are answered with one cache round trip
+    and no query.
+    """
+    @functools.wraps(modes_for_course)
+    def wrapper(cls, course_id, *args, **kwargs):  # pylint: disable=unused-argument
+        cache_key = _modes_cache_key(course_id)
+        version, modes_by_arguments = caching.get_versioned(_modes_cache_namespace(course_id), cache_key)
+        modes_by_arguments = modes_by_arguments or {}
+        arguments = repr((args, sorted(kwargs.items())))
+        modes = modes_by_arguments.get(arguments, modes_by_arguments.get(ANY_ARGUMENTS))
+        if modes is None:
+            modes = modes_for_course(course_id, *args, **kwargs)
+            if all(getattr(mode, 'expiration_datetime', None) is None for mode in modes):
+                modes_by_arguments = dict(modes_by_arguments)
+                modes_by_arguments[arguments] = modes
+                caching.set_versioned(cache_key, version, modes_by_arguments)
+        return modes
+    return wrapper
+
+
+def _fill_modes_cache(course_keys, versions):
+    """
+    Cache the modes of courses whose default mode was just created, at the
+    cache versions (by namespace) read before it was, so that a change made
+    since wins.  A course whose only mode is the default mode, not
+    expiring, has it whatever modes_for_course is asked; the cached modes
+    of the others are forgotten.
+    """
+    course_modes = {}
+    for course_mode in CourseMode.objects.filter(course_id__in=course_keys):
+        course_modes.setdefault(unicode(course_mode.course_id), []).append(course_mode)
+    entries = {}
+    for course_key in course_keys:
+        found = course_modes.get(unicode(course_key), [])
+        if (len(found) == 1 and found[0].mode_slug == features.DEFAULT_COURSE_MODE_SLUG and
+                found[0].expiration_datetime is None):
+            entries[_modes_cache_key(course_key)] = (
+                versions[_modes_cache_namespace(course_key)], {ANY_ARGUMENTS: [found[0].to_tuple()]}
+            )
+        else:
+            invalidate_modes_cache(course_key)
+    caching.set_many_versioned(entries)
+
+
+@receiver(post_save, sender=CourseMode)
+@receiver(post_delete, sender=CourseMode)
+def _invalidate_on_course_mode_change(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    invalidate_modes_cache(instance.course_id)
+
+
+def ensure_default_mode(course_key):
+    """
+    Create the default-mode CourseMode for a course unless it already exists,
+    in a single statement that is safe against concurrent publishes.
+    Returns True if it was created, or on MySQL (see _insert_ignore) found.
+    """
+    connection = connections[router.db_for_write(CourseMode)]
+    if not _supports_insert_ignore(connection):
+        return CourseMode.objects.get_or_create(
+            course_id=course_key, mode_slug=features.DEFAULT_COURSE_MODE_SLUG,
+            defaults={'mode_display_name': unicode(features.mode_name_from_slug)}
+        )[1]
+    versions = caching.namespace_versions([_modes_cache_namespace(course_key)])
+    created = _insert_ignore([_new_default_mode(course_key)]) > 0
+    if created:
+        # inserted without post_save
+        _fill_modes_cache([course_key], versions)
+    return created
+
+
+def course_keys_missing_default_mode(course_keys=None):
+    """
+    Return keys of courses without a CourseMode in the default mode: among
+    course_keys if given, otherwise among all courses with a CourseOverview,
+    with a single anti-join query
+    """
+    with_default_mode = CourseMode.objects.filter(mode_slug=features.DEFAULT_COURSE_MODE_SLUG)
+    if course_keys is None:
+        return list(CourseOverview.objects.exclude(
+            id__in=with_default_mode.values('course_id')
+        ).values_list('id', flat=True))
+
+    course_keys = list(course_keys)
+    existing = set(unicode(key) for key in with_default_mode.filter(
+        course_id__in=course_keys
+    ).values_list('course_id', flat=True))
+    return [key for key in course_keys if unicode(key) not in existing]
+
+
+def create_missing_default_modes(course_keys=None):
+    """
+    Create default-mode CourseModes for every course missing one, among
+    course_keys if given, otherwise among all courses with a CourseOverview.
+    Returns the number created.
+    """
+    missing = course_keys_missing_default_mode(course_keys)
+    connection = connections[router.db_for_write(CourseMode)]
+    created = 0
+    for start in range(0, len(missing), BULK_INSERT_BATCH_SIZE):
+        batch_keys = missing[start:start + BULK_INSERT_BATCH_SIZE]
+        versions = caching.namespace_versions(_modes_cache_namespace(key) for key in batch_keys)
+        batch = [_new_default_mode(key) for key in batch_keys]
+        if _supports_insert_ignore(connection):
+            created += _insert_ignore(batch)
+        else:
+            CourseMode.objects.bulk_create(batch)
+            created += len(batch)
+        # inserted without post_save; rows skipped as created meanwhile are read back too
+        _fill_modes_cache(batch_keys, versions)
+    if created:
+        logger.info(u"Created %d default '%s' course mode(s)", created, features.DEFAULT_COURSE_MODE_SLUG)
+    return created
@@ -1,48 +1,139 @@
-from django.conf import settings
+"""
+Monkeypatches to edx-platform.  Each is applied when the module it patches
+is first imported, see appsembleredx.patching, and can be turned off by
+adding its name to APPSEMBLER_FEATURES['DISABLED_MONKEYPATCHES'].
+"""
+from contextlib import contextmanager
+import sys
 
-from xmodule import course_module
-from course_modes import models as course_modes_models
-from student.models import LinkedInAddToProfileConfiguration
+from django.conf import settings
+from django.core.cache import cache
 
-from appsembleredx import app_settings
-from appsembleredx import mixins
+from appsembleredx.app_settings import features
+from appsembleredx import caching
+from appsembleredx.instrumentation import instrumented
+from appsembleredx.patching import before_import, get_patch, patches, APPLIED
 
 import logging
 logger = logging.getLogger(__name__)
 
-# some trickery here to get around AppRegsitryNotReady error b/c of translation strings otherwise
-from django.utils import translation  # noqa
-orig_ugettext = translation.ugettext
-translation.ugettext = translation.ugettext_lazy
 
+def get_CourseDescriptor_mixins():
+    from appsembleredx import mixins
+    new_mixins = [mixins.XMLDefinitionChainingMixin, mixins.CertificatesExtensionMixin, ]
+    if features.ENABLE_CREDITS_EXTRA_FIELDS:
+        new_mixins.append(mixins.CreditsMixin)
+    if features.ENABLE_INSTRUCTION_TYPE_EXTRA_FIELDS:
+        new_mixins.append(mixins.InstructionTypeMixin)
+    return tuple(new_mixins)
 
-if 'cms' in settings.SETTINGS_MODULE:
-    # if we are in CMS we need to mock out unimportable modules
-    # load a fake certificates.views.support module for now
-    class fakemodule(object):
-        __path__ = []
 
-    import sys
-    logger.warn("Setting fake certificates.views.support module for CMS.  Not used in Studio")
-    sys.modules['certificates.views.support'] = fakemodule()  # noqa: load an empty module
+def get_CourseDescriptor_extension_fields():
+    return tuple(field for mixin in get_CourseDescriptor_mixins() for field in mixin.fields)
 
-from certificates.views import webview  # noqa
-from certificates.signals import enable_self_generated_certs  # noqa
-from lms.djangoapps.certificates.signals import enable_self_generated_certs as enable_self_generated_certs_fullpath  # noqa
 
-# and then put back the originals
-translation.ugettext = orig_ugettext
+# names of our course extension fields, set once we patch CourseDescriptor
+COURSE_EXTENSION_FIELDS = ()
 
 
-def get_CourseDescriptor_mixins():
-    new_mixins = [mixins.XMLDefinitionChainingMixin, mixins.CertificatesExtensionMixin, ]
-    if app_settings.ENABLE_CREDITS_EXTRA_FIELDS:
-        new_mixins.append(mixins.CreditsMixin)
-    if app_settings.ENABLE_INSTRUCTION_TYPE_EXTRA_FIELDS:
-        new_mixins.append(mixins.InstructionTypeMixin)
-    return tuple(new_mixins)
+@patches('xmodule.course_module')
+def course_descriptor_mixins(course_module):
+    global orig_CourseDescriptor, CDbases, COURSE_EXTENSION_FIELDS  # pylint: disable=global-statement
+    logger.warn('Monkeypatching course_module.CourseDescriptor to add Appsembler Mixins')
+    orig_CourseDescriptor = course_module.CourseDescriptor
+    CDbases = course_module.CourseDescriptor.__bases__
+    course_module.CourseDescriptor.__bases__ = get_CourseDescriptor_mixins() + CDbases
+    COURSE_EXTENSION_FIELDS = get_CourseDescriptor_extension_fields()
+
+
+def _set_default_course_mode(course_modes_models):
+    course_modes_models.CourseMode.DEFAULT_MODE_SLUG = features.DEFAULT_COURSE_MODE_SLUG
+    course_modes_models.CourseMode.DEFAULT_MODE = features.DEFAULT_COURSE_MODE
+
+
+@patches('course_modes.models')
+def default_course_mode(course_modes_models):
+    global orig_DEFAULT_MODE_SLUG, orig_DEFAULT_MODE  # pylint: disable=global-statement
+    logger.warn('Monkeypatching course_modes_models.CourseMode.DEFAULT_MODE_SLUG and ...DEFAULT_MODE')
+    orig_DEFAULT_MODE_SLUG = course_modes_models.CourseMode.DEFAULT_MODE_SLUG
+    orig_DEFAULT_MODE = course_modes_models.CourseMode.DEFAULT_MODE
+    _set_default_course_mode(course_modes_models)
+
+
+@patches('course_modes.models')
+def cached_modes_for_course(course_modes_models):
+    global orig_modes_for_course  # pylint: disable=global-statement
+    # imports course_modes.models, so only once it is imported
+    from appsembleredx import modes
+    logger.warn('Monkeypatching course_modes_models.CourseMode.modes_for_course to cache modes per course')
+    orig_modes_for_course = course_modes_models.CourseMode.modes_for_course
+    course_modes_models.CourseMode.modes_for_course = classmethod(
+        modes.caching_modes_for_course(orig_modes_for_course)
+    )
+
 
+@features.on_reload
+def _reset_default_course_mode():
+    if get_patch('default_course_mode').state == APPLIED:
+        _set_default_course_mode(sys.modules['course_modes.models'])
 
+
+@before_import('certificates.views')
+@contextmanager
+def certificate_views_import():
+    """
+    Make certificates.views importable before the app registry is ready,
+    and in CMS
+    """
+    # some trickery here to get around AppRegsitryNotReady error b/c of translation strings otherwise
+    from django.utils import translation
+    orig_ugettext = translation.ugettext
+    translation.ugettext = translation.ugettext_lazy
+
+    if 'cms' in settings.SETTINGS_MODULE:
+        # if we are in CMS we need to mock out unimportable modules
+        # load a fake certificates.views.support module for now
+        class fakemodule(object):
+            __path__ = []
+
+        logger.warn("Setting fake certificates.views.support module for CMS.  Not used in Studio")
+        sys.modules['certificates.views.support'] = fakemodule()  # noqa: load an empty module
+
+    try:
+        yield
+    finally:
+        # and then put back the originals
+        translation.ugettext = orig_ugettext
+
+
+def _course_context_cache_namespace(course_key):
+    if hasattr(course_key, 'version_agnostic'):
+        course_key = course_key.version_agnostic()  # drop any branch or version
+    return u"certificate_context.{}".format(course_key)
+
+
+def invalidate_course_context_cache(course_key):
+    """
+    Forget cached certificate context of every version of a course
+    """
+    caching.bump_namespace_version(_course_context_cache_namespace(course_key))
+
+
+def _course_extension_context(course):
+    """
+    Values of our course extension fields, cached per course version
+    """
+    cache_key = caching.versioned_key(
+        _course_context_cache_namespace(course.id), getattr(course, 'course_version', None)
+    )
+    extension_context = cache.get(cache_key)
+    if extension_context is None:
+        extension_context = dict((field, getattr(course, field)) for field in COURSE_EXTENSION_FIELDS)
+        cache.set(cache_key, extension_context, caching.DEFAULT_TIMEOUT)
+    return extension_context
+
+
+@instrumented('monkeypatch._update_course_context')
 def _update_course_context(request, context, course, platform_name):
     """
     Course-related context for certificate webview, extended
@@ -52,42 +143,37 @@ def _update_course_context(request, context, course, platform_name):
     orig__update_course_context(request, context, course, platform_name)
 
     # add our course extension fields
-    course_mixins = get_CourseDescriptor_mixins()
-    for mixin in course_mixins:
-        for f in mixin.fields:
-            context[f] = getattr(course, f)
-
+    context.update(_course_extension_context(course))
 
-logger.warn('Monkeypatching course_module.CourseDescriptor to add Appsembler Mixins')
-orig_CourseDescriptor = course_module.CourseDescriptor
-CDbases = course_module.CourseDescriptor.__bases__
-course_module.CourseDescriptor.__bases__ = get_CourseDescriptor_mixins() + CDbases
 
-logger.warn('Monkeypatching course_modes_models.CourseMode.DEFAULT_MODE_SLUG and ...DEFAULT_MODE')
-orig_DEFAULT_MODE_SLUG = course_modes_models.CourseMode.DEFAULT_MODE_SLUG
-course_modes_models.CourseMode.DEFAULT_MODE_SLUG = app_settings.DEFAULT_COURSE_MODE_SLUG
-orig_DEFAULT_MODE = course_modes_models.CourseMode.DEFAULT_MODE
-course_modes_models.CourseMode.DEFAULT_MODE = app_settings.DEFAULT_COURSE_MODE
+@patches('certificates.views.webview')
+def webview_course_context(webview):
+    global orig__update_course_context  # pylint: disable=global-statement
+    logger.warn('Monkeypatching lms.djangoapps.certificates.views.webview._update_course_context '
+                'to extend with Appsembler Mixin fields')
+    orig__update_course_context = webview._update_course_context
+    webview._update_course_context = _update_course_context
 
-logger.warn('Monkeypatching lms.djangoapps.certificates.views.webview._update_course_context '
-            'to extend with Appsembler Mixin fields')
-orig__update_course_context = webview._update_course_context
-webview._update_course_context = _update_course_context
 
-# no 'honor code', just leave it blank.  Our clients probably won't have codes of honor
-# and if they do they won't miss it.
-logger.warn('Monkeypatching LinkedIn add to profile honor code cert name')
-orig_MODE_TO_CERT_NAME = LinkedInAddToProfileConfiguration.MODE_TO_CERT_NAME
-del LinkedInAddToProfileConfiguration.MODE_TO_CERT_NAME['honor']
+@patches('student.models')
+def linkedin_honor_cert_name(student_models):
+    # no 'honor code', just leave it blank.  Our clients probably won't have codes of honor
+    # and if they do they won't miss it.
+    global orig_MODE_TO_CERT_NAME  # pylint: disable=global-statement
+    logger.warn('Monkeypatching LinkedIn add to profile honor code cert name')
+    orig_MODE_TO_CERT_NAME = student_models.LinkedInAddToProfileConfiguration.MODE_TO_CERT_NAME
+    orig_MODE_TO_CERT_NAME.pop('honor', None)
 
 
 # override certificates handler which always enables self-gen'd certs for self-paced courses
 # so that it only enables self-gen'd certs on self-paced if we set feature flag for it
-# we have to disable celery tasks already registered for signal handlers in edx-platform
-logger.warn('Monkeypatching lms.djangoapps.certificates.signals.enable_self_generated_certs '
-            'to limit enabling of self-generated certs on self-paced courses by feature flag.')
-orig_enable_self_generated_certs = enable_self_generated_certs
+# we have to disable celery tasks already registered for signal handlers in edx-platform.
 # task seems to be registered twice, as 'certificates.signals.enable_self_generated_certs', and
 # 'lms.djangoapps.certificates.signals.enable_self_generated_certs'
-enable_self_generated_certs.delay = lambda course_key: None
-enable_self_generated_certs_fullpath.delay = lambda course_key: None
+@patches('certificates.signals', 'lms.djangoapps.certificates.signals')
+def self_generated_certs_task(certificates_signals):
+    global orig_enable_self_generated_certs  # pylint: disable=global-statement
+    logger.warn('Monkeypatching lms.djangoapps.certificates.signals.enable_self_generated_certs '
+                'to limit enabling of self-generated certs on self-paced courses by feature flag.')
+    orig_enable_self_generated_certs = certificates_signals.enable_self_generated_certs
+    certificates_signals.enable_self_generated_certs.delay = lambda course_key: None
@@ -0,0 +1,207 @@
+"""
+A registry of monkeypatches applied when the module they patch is imported.
+
+    @patches('certificates.views.webview')
+    def patch_webview(webview):
+        ...
+
+registers patch_webview to be called with the certificates.views.webview
+module right after it's first imported, or when Django is set up (see
+appsembleredx.apps) if it already has been.  So importing appsembleredx
+doesn't import what it patches, or read its settings, and a process that
+never imports a module never pays for patching it.
+
+For things that have to be in place while a module is imported,
+
+    @before_import('certificates.views')
+    @contextmanager
+    def certificate_views_import():
+        ...
+        yield
+
+registers a context manager to wrap the first import of certificates.views.
+
+Patches named in APPSEMBLER_FEATURES['DISABLED_MONKEYPATCHES'] aren't
+applied.  report() lists every patch with its state, the time spent applying
+it, and the time spent importing targets that were imported through the
+hook, i.e. the time the patch adds to a first import.
+"""
+import logging
+import sys
+import time
+
+from appsembleredx.app_settings import features
+
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+APPLIED = 'applied'
+DISABLED = 'disabled'
+FAILED = 'failed'
+
+
+class Patch(object):
+    """
+    A function to call with each of targets, the dotted names of modules,
+    once it's imported, and/or a context manager factory to wrap the import
+    """
+
+    def __init__(self, name, targets, func=None, import_context=None):
+        self.name = name
+        self.targets = targets
+        self.func = func
+        self.import_context = import_context
+        self.states = dict((target, PENDING) for target in targets)
+        self.apply_seconds = 0.0
+        self.import_seconds = 0.0
+
+    @property
+    def state(self):
+        for state in (FAILED, DISABLED, PENDING):
+            if state in self.states.values():
+                return state
+        return APPLIED
+
+    @property
+    def enabled(self):
+        return self.name not in (features.DISABLED_MONKEYPATCHES or ())
+
+    def apply(self, target, module):
+        if self.states[target] != PENDING:
+            return
+        if not self.enabled:
+            logger.info(u"Not applying disabled monkeypatch %s to %s", self.name, target)
+            self.states[target] = DISABLED
+            return
+        started = time.time()
+        try:
+            if self.func is not None:
+                self.func(module)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception(u"Failed to apply monkeypatch %s to %s", self.name, target)
+            self.states[target] = FAILED
+        else:
+            self.states[target] = APPLIED
+        finally:
+            self.apply_seconds += time.time() - started
+
+
+_PATCHES = []
+# every module some patch targets, so the import hook can pass over others quickly
+_TARGETS = set()
+
+
+def _register(patch):
+    _PATCHES.append(patch)
+    _TARGETS.update(patch.targets)
+
+
+def patches(*targets, **kwargs):
+    """
+    Decorator registering a function as the patch for the modules named by
+    targets.  Takes the patch name as a keyword argument, by default the
+    function name.
+    """
+    def decorator(func):
+        _register(Patch(kwargs.get('name', func.__name__), targets, func=func))
+        return func
+    return decorator
+
+
+def before_import(*targets, **kwargs):
+    """
+    Decorator registering a context manager factory to wrap the first import
+    of the modules named by targets.  Takes the patch name as a keyword
+    argument, by default the function name.
+    """
+    def decorator(import_context):
+        _register(Patch(kwargs.get('name', import_context.__name__), targets, import_context=import_context))
+        return import_context
+    return decorator
+
+
+def get_patch(name):
+    for patch in _PATCHES:
+        if patch.name == name:
+            return patch
+    raise KeyError(name)
+
+
+def _patches_for(target):
+    return [patch for patch in _PATCHES if patch.states.get(target) == PENDING]
+
+
+def _import_within(fullname, contexts):
+    if not contexts:
+        __import__(fullname)
+        return
+    with contexts[0]:
+        _import_within(fullname, contexts[1:])
+
+
+class PostImportHook(object):
+    """
+    sys.meta_path finder that imports patch targets itself (PEP 302), so it
+    can apply their patches as soon as they are imported
+    """
+
+    def __init__(self):
+        self.importing = set()
+
+    def find_module(self, fullname, path=None):  # pylint: disable=unused-argument
+        if fullname in _TARGETS and fullname not in self.importing and _patches_for(fullname):
+            return self
+        return None
+
+    def load_module(self, fullname):
+        if fullname in sys.modules:
+            return sys.modules[fullname]
+        pending = _patches_for(fullname)
+        contexts = [patch.import_context() for patch in pending if patch.import_context and patch.enabled]
+        self.importing.add(fullname)
+        started = time.time()
+        try:
+            # the regular finders take it from here, as we no longer claim fullname
+            _import_within(fullname, contexts)
+        finally:
+            self.importing.discard(fullname)
+        import_seconds = time.time() - started
+        module = sys.modules[fullname]
+        for patch in pending:
+            patch.import_seconds += import_seconds
+            patch.apply(fullname, module)
+        return module
+
+
+_hook = None
+
+
+def install():
+    """
+    Apply patches to targets as they are imported
+    """
+    global _hook  # pylint: disable=global-statement
+    if _hook is None:
+        _hook = PostImportHook()
+        sys.meta_path.insert(0, _hook)
+
+
+def apply_to_imported():
+    """
+    Apply patches to targets that were imported before install()
+    """
+    for patch in _PATCHES:
+        for target in patch.targets:
+            if target in sys.modules and patch.states[target] == PENDING:
+                patch.apply(target, sys.modules[target])
+
+
+def report():
+    """
+    (name, targets, state, apply seconds, import seconds) for every patch
+    """
+    return [
+        (patch.name, patch.targets, patch.state, patch.apply_seconds, patch.import_seconds)
+        for patch in _PATCHES
+    ]
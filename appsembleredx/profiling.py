@@ -0,0 +1,159 @@
+"""
+Per-course profiles of appsembler_setup_courses runs, for --profile.
+
+While a course is set up, every instrumented function it calls (see
+appsembleredx.instrumentation) is recorded as a phase of the course: the
+handlers themselves, and within them the modulestore loads
+(signals._get_course), writes (signals._update_course) and signature image
+uploads (signals.store_theme_signature_img_as_asset).  A phase's time and
+counts include those of the phases it calls.
+
+Each course's profile is written as a line of JSON as soon as the course
+is done, and ProfileReport sums them up at the end of the run.
+"""
+from collections import namedtuple
+import heapq
+import json
+import resource
+import sys
+import threading
+import time
+
+from appsembleredx import instrumentation
+
+
+SLOWEST_COURSES = 10
+
+# the profile of one course, as sent back from a worker: wall time, the
+# instrumentation.COUNTERS of the whole course, peak RSS of the process and
+# how much setting up the course grew it, and the phases
+CourseProfile = namedtuple('CourseProfile', ['seconds', 'counters', 'peak_rss_kb', 'rss_growth_kb', 'phases'])
+
+
+def peak_rss_kb():
+    """
+    Peak resident set size of this process so far, in KB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # bytes there, KB on Linux
+        peak /= 1024
+    return peak
+
+
+class PhaseSink(object):
+    """
+    Instrumentation sink collecting the instrumented calls made on the
+    thread that is profiling a course
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def start(self):
+        self.local.phases = {}
+
+    def stop(self):
+        phases, self.local.phases = self.local.phases, None
+        return phases
+
+    def record(self, name, wall_time, counters):
+        phases = getattr(self.local, 'phases', None)
+        if phases is None:
+            return  # not profiling on this thread
+        phase = phases.setdefault(name, dict([('calls', 0), ('seconds', 0.0)] +
+                                             [(counter, 0) for counter in instrumentation.COUNTERS]))
+        phase['calls'] += 1
+        phase['seconds'] += wall_time
+        for counter in instrumentation.COUNTERS:
+            phase[counter] += counters[counter]
+
+
+_sink = None
+
+
+def _get_sink():
+    global _sink  # pylint: disable=global-statement
+    if _sink is None:
+        _sink = PhaseSink()
+        instrumentation.add_sink(_sink)
+    return _sink
+
+
+class CourseProfiler(object):
+    """
+    Context manager profiling the setup of one course; its profile is a
+    CourseProfile once the block is done
+    """
+
+    def __init__(self):
+        self.profile = None
+
+    def __enter__(self):
+        self.sink = _get_sink()
+        self.sink.start()
+        self.measuring = instrumentation.measuring()
+        self.counters = self.measuring.__enter__()
+        self.rss_before = peak_rss_kb()
+        self.started = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.time() - self.started
+        self.measuring.__exit__(*exc_info)
+        peak = peak_rss_kb()
+        self.profile = CourseProfile(seconds, self.counters, peak, peak - self.rss_before, self.sink.stop())
+        return False
+
+
+class ProfileReport(object):
+    """
+    Writes each course's profile to stream as a line of JSON, and keeps the
+    slowest courses and totals per phase for the summary
+    """
+
+    def __init__(self, stream, slowest=SLOWEST_COURSES):
+        self.stream = stream
+        self.slowest = slowest
+        self.courses = []  # heap of (seconds, course key) of the slowest courses
+        self.phases = {}
+        self.profiled = 0
+        self.peak_rss_kb = 0
+
+    def record(self, worker, course_key, error, profile):
+        line = dict(profile._asdict(), course_key=course_key, worker=worker, error=error)
+        line.update(profile.counters)
+        del line['counters']
+        self.stream.write(json.dumps(line, sort_keys=True) + '\n')
+        self.stream.flush()
+
+        self.profiled += 1
+        self.peak_rss_kb = max(self.peak_rss_kb, profile.peak_rss_kb)
+        entry = (profile.seconds, course_key)
+        if len(self.courses) < self.slowest:
+            heapq.heappush(self.courses, entry)
+        else:
+            heapq.heappushpop(self.courses, entry)
+        for name, phase in profile.phases.items():
+            totals = self.phases.setdefault(name, dict.fromkeys(phase, 0))
+            for key, value in phase.items():
+                totals[key] += value
+
+    def lines(self):
+        """
+        Human-readable summary of the slowest courses and phases
+        """
+        yield u"Profiled {} course(s), peak RSS of any process {:.1f}MB".format(
+            self.profiled, self.peak_rss_kb / 1024.0)
+        if self.courses:
+            yield u"Slowest courses:"
+            for seconds, course_key in sorted(self.courses, reverse=True):
+                yield u"  {:>9.1f}ms  {}".format(seconds * 1000, course_key)
+        if self.phases:
+            yield u"Phases, slowest first (times include nested phases):"
+            yield u"  {:<48} {:>7} {:>10} {:>9} {:>8} {:>7} {:>7} {:>8}".format(
+                'name', 'calls', 'total ms', 'mean ms', 'queries', 'reads', 'writes', 'uploads')
+            for name, phase in sorted(self.phases.items(), key=lambda item: item[1]['seconds'], reverse=True):
+                yield u"  {:<48} {:>7} {:>10.1f} {:>9.2f} {:>8} {:>7} {:>7} {:>8}".format(
+                    name, phase['calls'], phase['seconds'] * 1000, phase['seconds'] * 1000 / phase['calls'],
+                    phase[instrumentation.DB_QUERIES], phase[instrumentation.MODULESTORE_READS],
+                    phase[instrumentation.MODULESTORE_WRITES], phase[instrumentation.CONTENTSTORE_WRITES])
@@ -1,9 +1,8 @@
 import copy
-from functools import partial
-import json
+import hashlib
+import mimetypes
 
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
 from django.dispatch.dispatcher import receiver
 from xmodule.modulestore.django import SignalHandler, modulestore
 from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
@@ -21,145 +20,351 @@ from xmodule.contentstore.django import contentstore
 from xmodule.contentstore.content import StaticContent
 from django.core.files.storage import get_storage_class
 
-from course_modes.models import CourseMode
 from certificates import models as cert_models
 
-from appsembleredx.app_settings import (
-    DEFAULT_COURSE_MODE_SLUG,
-    mode_name_from_slug,
-    USE_OPEN_ENDED_CERTS_DEFAULTS,
-    ALWAYS_ENABLE_SELF_GENERATED_CERTS,
-    DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED,
-    DEFAULT_CERT_SIGNATORIES,
-    ACTIVATE_DEFAULT_CERTS,
-    DISABLE_COURSE_COMPLETION_BADGES
+from appsembleredx.app_settings import course_org, features
+from appsembleredx import certs, modes, monkeypatch, tasks
+from appsembleredx.instrumentation import (
+    instrumented, count, MODULESTORE_READS, MODULESTORE_WRITES, CONTENTSTORE_WRITES
 )
 
-DEFAULT_CERT = """
-    {{"course_title": "", "name": "Default", "is_active": {},
-    "signatories": {}, "version": 1, "editing": false,
-    "description": "Default certificate"}}
-"""
+# parts of the default certificate that depend on neither settings nor the course
+DEFAULT_CERT = {
+    "course_title": "", "name": "Default", "version": 1, "editing": False,
+    "description": "Default certificate",
+}
 
+# default certificate templates by organization
+_default_cert_templates = {}
 
-def make_default_cert(course_key):
+
+def _get_default_cert_template(course_key):
     """
-    Add any signatories to default cert string and return the string
+    The default certificate with signatories from the settings of the
+    course's organization, built and validated as Studio would once per
+    organization
     """
+    org = course_org(course_key)
+    template = _default_cert_templates.get(org)
+    if template is None:
+        from contentstore.views import certificates as store_certificates
+        org_settings = features.for_org(org)
+        template = dict(DEFAULT_CERT, is_active=bool(org_settings.ACTIVATE_DEFAULT_CERTS))
+        template['signatories'] = [
+            dict(copy.deepcopy(sig), id=i) for i, sig in enumerate(org_settings.DEFAULT_CERT_SIGNATORIES or ())
+        ]
+        store_certificates.CertificateManager.validate(template)
+        _default_cert_templates[org] = template
+    return template
 
-    default_cert = DEFAULT_CERT
 
-    if DEFAULT_CERT_SIGNATORIES:
-        signatories = DEFAULT_CERT_SIGNATORIES
-        updated = []
-        for i, sig in enumerate(signatories):
-            default_cert_signatory = copy.deepcopy(sig)
-            default_cert_signatory['id'] = i
-            theme_asset_path = sig['signature_image_path']
-            sig_img_path = store_theme_signature_img_as_asset(course_key, theme_asset_path)
-            default_cert_signatory['signature_image_path'] = sig_img_path
-            updated.append(default_cert_signatory)
-        default_cert_signatories = json.dumps(updated)
-        return default_cert.format(str(ACTIVATE_DEFAULT_CERTS).lower(), default_cert_signatories)
+@features.on_reload
+def _forget_default_cert_templates():
+    _default_cert_templates.clear()
 
-    else:
-        return default_cert.format(str(ACTIVATE_DEFAULT_CERTS).lower(), "[]")
+
+def make_default_cert(course_key):
+    """
+    Return the default certificate for a course, with signature images
+    stored as course assets
+    """
+    template = _get_default_cert_template(course_key)
+    default_cert = dict(template)
+    default_cert['signatories'] = [
+        dict(sig, signature_image_path=store_theme_signature_img_as_asset(course_key, sig['signature_image_path']))
+        for sig in template['signatories']
+    ]
+    return default_cert
 
 
-def store_theme_signature_img_as_asset(course_key, theme_asset_path):
+# theme signature images read this process, by theme asset path:
+# (filename, content type, data, md5 hexdigest)
+_THEME_SIGNATURE_IMAGES = {}
+
+
+def _read_theme_signature_img(theme_asset_path):
     """
-    to be able to edit or delete signatories and Certificates properly
-    we must store signature PNG file as course content asset.
-    Store file from theme as asset.
-    Return static asset URL path
+    Read a signature image from static storage, once per process.  Raises
+    ValueError if its name isn't that of an image.
     """
+    try:
+        return _THEME_SIGNATURE_IMAGES[theme_asset_path]
+    except KeyError:
+        pass
     filename = theme_asset_path.split('/')[-1]
+    content_type = mimetypes.guess_type(filename)[0]
+    if content_type is None or not content_type.startswith('image/'):
+        raise ValueError(u"Signature image {} is not an image".format(theme_asset_path))
     static_storage = get_storage_class(settings.STATICFILES_STORAGE)()
     path = static_storage.path(theme_asset_path)
+    with open(path, 'rb') as imgfile:
+        data = imgfile.read()
+    image = (filename, content_type, data, hashlib.md5(data).hexdigest())
+    _THEME_SIGNATURE_IMAGES[theme_asset_path] = image
+    return image
+
+
+# md5 hexdigests of the signature images this process stored or found in the
+# contentstore, by content location; cleared when it reaches the maximum size
+_STORED_SIGNATURE_DIGESTS = {}
+STORED_SIGNATURE_DIGESTS_MAX_SIZE = 10000
 
+
+def _remember_signature_digest(content_loc, digest):
+    if len(_STORED_SIGNATURE_DIGESTS) >= STORED_SIGNATURE_DIGESTS_MAX_SIZE:
+        _STORED_SIGNATURE_DIGESTS.clear()
+    _STORED_SIGNATURE_DIGESTS[unicode(content_loc)] = digest
+
+
+def _stored_signature_digest(content_loc):
+    """
+    md5 hexdigest of what is stored at content_loc, or None if nothing is.
+    GridFS keeps an md5 of each file, so comparing it with the theme image's
+    digest tells us whether a save is needed.  The file is opened as a
+    stream, so only its metadata is read, and the digest is remembered.
+    """
+    try:
+        return _STORED_SIGNATURE_DIGESTS[unicode(content_loc)]
+    except KeyError:
+        pass
+    existing = contentstore().find(content_loc, throw_on_not_found=False, as_stream=True)
+    if existing is None:
+        return None
+    digest = getattr(existing, 'content_digest', None)
+    if digest is None:
+        # older releases don't expose the stored md5
+        md5 = hashlib.md5()
+        if hasattr(existing, 'stream_data'):
+            for chunk in existing.stream_data():
+                md5.update(chunk)
+        else:
+            md5.update(existing.data)
+        digest = md5.hexdigest()
+    if hasattr(existing, 'close'):
+        existing.close()
+    _remember_signature_digest(content_loc, digest)
+    return digest
+
+
+@instrumented('signals.store_theme_signature_img_as_asset')
+def store_theme_signature_img_as_asset(course_key, theme_asset_path):
+    """
+    to be able to edit or delete signatories and Certificates properly
+    we must store signature image file as course content asset.
+    Store file from theme as asset, unless identical bytes are already stored.
+    Return static asset URL path
+    """
+    filename, content_type, data, digest = _read_theme_signature_img(theme_asset_path)
     content_loc = StaticContent.compute_location(course_key, theme_asset_path)
-    # TODO: exception if not png
-    sc_partial = partial(StaticContent, content_loc, filename, 'image/png')
-    with open(path, 'rb') as imgfile:
-        content = sc_partial(imgfile.read())
 
-    # then commit the content
-    contentstore().save(content)
-    del_cached_content(content.location)
+    if _stored_signature_digest(content_loc) != digest:
+        content = StaticContent(content_loc, filename, content_type, data)
+
+        # then commit the content
+        contentstore().save(content)
+        count(CONTENTSTORE_WRITES)
+        del_cached_content(content.location)
+        _remember_signature_digest(content_loc, digest)
 
     # return a path to the asset.  new style courses will need extra /
     path_extra = "/" if course_key.to_deprecated_string().startswith("course") else ""
-    return "{}{}".format(path_extra, content.location.to_deprecated_string())
+    return "{}{}".format(path_extra, content_loc.to_deprecated_string())
 
 
 @receiver(SignalHandler.course_published)
-def _default_mode_on_course_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+@instrumented('signals._on_course_published')
+def _on_course_published(sender, course_key, **kwargs):  # pylint: disable=unused-argument
     """
     Catches the signal that a course has been published in Studio and
-    creates a CourseMode in the default mode
+    runs the course_published handlers, in a Celery task unless
+    RUN_PUBLISH_HANDLERS_ASYNC is off
+    """
+    monkeypatch.invalidate_course_context_cache(course_key)
+    modes.invalidate_modes_cache(course_key)
+
+    if features.RUN_PUBLISH_HANDLERS_ASYNC:
+        tasks.schedule_course_setup(course_key)
+    else:
+        setup_course_on_publish(course_key)
+
+
+@instrumented('signals.setup_course_on_publish')
+def setup_course_on_publish(course_key):
+    """
+    Run all course_published handlers for a course
+    """
+    _default_mode_on_course_publish(None, course_key)
+    enable_self_generated_certs(None, course_key)
+    update_extension_fields(None, course_key)
+
+
+@instrumented('signals._default_mode_on_course_publish')
+def _default_mode_on_course_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Creates a CourseMode in the default mode for a published course
+    """
+    modes.ensure_default_mode(course_key)
+
+
+@instrumented('signals._get_course')
+def _get_course(store, course_key):
+    """
+    Load a course from the modulestore
+    """
+    course = store.get_course(course_key)
+    count(MODULESTORE_READS)
+    return course
+
+
+@instrumented('signals._update_course')
+def _update_course(store, course):
+    """
+    Save and commit changed course fields to the modulestore
     """
+    course.save()
     try:
-        default_mode = CourseMode.objects.get(course_id=course_key, mode_slug=DEFAULT_COURSE_MODE_SLUG)
-    except ObjectDoesNotExist:
-        default_mode = CourseMode(course_id=course_key, mode_slug=DEFAULT_COURSE_MODE_SLUG,
-                                  mode_display_name=mode_name_from_slug)
-        default_mode.save()
+        store.update_item(course, course._edited_by)
+    except AttributeError:
+        store.update_item(course, 0)
+    count(MODULESTORE_WRITES)
 
 
-@receiver(SignalHandler.pre_publish)
-def _change_cert_defaults_on_pre_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+@instrumented('signals.update_extension_fields')
+def update_extension_fields(sender, course_key, **kwargs):  # pylint: disable=unused-argument
     """
-    Catches the signal that a course has been pre-published in Studio and
-    updates certificate_display_behavior and ...
+    Copies the credit and instruction type fields of a published course to
+    its CourseExtensionFields row
+    """
+    # not imported at the top: extension_fields imports drift, which imports this module
+    from appsembleredx import extension_fields
+    if not extension_fields.is_enabled():
+        return
+
+    if not isinstance(course_key, CourseKey):
+        course_key = CourseKey.from_string(unicode(course_key))
+    extension_fields.update_course(course_key)
+
+
+@instrumented('signals._apply_cert_defaults')
+def _apply_cert_defaults(course_key, course, **kwargs):  # pylint: disable=unused-argument
+    """
+    Pre-publish step which sets certificate_display_behavior and other cert-related
+    advanced settings to our defaults, once.  Returns True if the course was changed.
     """
     # has to be done this way since it's not possible to monkeypatch the default attrs on the
     # CourseFields fields
 
-    if not USE_OPEN_ENDED_CERTS_DEFAULTS:
-        return
+    org_settings = features.for_course(course_key)
+    if not org_settings.USE_OPEN_ENDED_CERTS_DEFAULTS:
+        return False
 
-    store = modulestore()
-    course = store.get_course(course_key)
     if course.cert_defaults_set:
-        return
+        return False
 
     course.certificates_display_behavior = 'early_with_info'
     course.certificates_show_before_end = True  # deprecated anyhow
     course.cert_html_view_enabled = True
     course.cert_defaults_set = True
     use_badges = settings.FEATURES.get('ENABLE_OPENBADGES', False)
-    if not use_badges or DISABLE_COURSE_COMPLETION_BADGES:
+    if not use_badges or org_settings.DISABLE_COURSE_COMPLETION_BADGES:
         course.issue_badges = False
-    course.save()
-    try:
-        store.update_item(course, course._edited_by)
-    except AttributeError:
-        store.update_item(course, 0)
+    return True
 
 
-@receiver(SignalHandler.course_published)
+@instrumented('signals._apply_default_active_certificate')
+def _apply_default_active_certificate(course_key, course, replace=False, force=False,
+                                      **kwargs):  # pylint: disable=unused-argument
+    """
+    Pre-publish step which creates an active default certificate on the course.
+    See _make_default_active_certificate for replace and force.  Returns True if
+    the course was changed.
+    """
+    if not features.for_course(course_key).USE_OPEN_ENDED_CERTS_DEFAULTS and not force:
+        return False
+
+    if course.active_default_cert_created and not replace:
+        return False
+
+    from contentstore.views import certificates as store_certificates
+    certificate_data = store_certificates.CertificateManager.assign_id(course, make_default_cert(course_key))
+    if 'certificates' not in course.certificates:
+        course.certificates['certificates'] = []
+    if replace:
+        course.certificates['certificates'] = [certificate_data, ]
+    else:
+        course.certificates['certificates'].append(certificate_data)
+    course.active_default_cert_created = True
+    return True
+
+
+PRE_PUBLISH_STEPS = (_apply_cert_defaults, _apply_default_active_certificate)
+
+
+@instrumented('signals.run_pre_publish_steps')
+def run_pre_publish_steps(course_key, steps=PRE_PUBLISH_STEPS, course=None, **kwargs):
+    """
+    Load the course once, unless it is passed in, let each step change it in
+    memory, and commit it once, only if some step changed it.  Extra kwargs
+    are passed to every step.  Returns True if the course was written.
+    """
+    store = modulestore()
+    with store.bulk_operations(course_key):
+        if course is None:
+            course = _get_course(store, course_key)
+        changed = False
+        for step in steps:
+            changed = step(course_key, course, **kwargs) or changed
+        if changed:
+            _update_course(store, course)
+    return changed
+
+
+@receiver(SignalHandler.pre_publish)
+@instrumented('signals._setup_course_on_pre_publish')
+def _setup_course_on_pre_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Catches the signal that a course has been pre-published in Studio and
+    runs all pre-publish steps with a single course read and write
+    """
+    if not features.for_course(course_key).USE_OPEN_ENDED_CERTS_DEFAULTS:
+        return  # no step applies unless forced
+
+    run_pre_publish_steps(course_key)
+
+
+def _change_cert_defaults_on_pre_publish(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Updates certificate_display_behavior and ... on its own.
+    Pre-publish runs this as part of _setup_course_on_pre_publish.
+    """
+    if not features.for_course(course_key).USE_OPEN_ENDED_CERTS_DEFAULTS:
+        return
+
+    run_pre_publish_steps(course_key, steps=(_apply_cert_defaults, ))
+
+
+@instrumented('signals.enable_self_generated_certs')
 def enable_self_generated_certs(sender, course_key, **kwargs):  # pylint: disable=unused-argument
     """
     If not already enabled, enable self-generated certificates on course if:
     course is a self-paced course and self-generated certs on self-paced not explicitly disabled
     course is not self-paced and self-generated certs are explicitly enabled
     """
-    course_key = unicode(course_key)
-    course_key = CourseKey.from_string(course_key)
-    course = CourseOverview.get_from_id(course_key)
-    is_enabled_for_course = cert_models.CertificateGenerationCourseSetting.is_enabled_for_course(course_key)
-    if is_enabled_for_course:
-        return
+    # cheapest checks first; loading the CourseOverview may load the course
+    if not certs.any_wants_self_generated_certs(course_key):
+        return  # neither self-paced nor instructor-paced courses qualify
 
-    if course.self_paced and DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED:
+    if not isinstance(course_key, CourseKey):
+        course_key = CourseKey.from_string(unicode(course_key))
+    if certs.is_self_generated_certs_enabled(course_key):
         return
 
-    if not course.self_paced and not ALWAYS_ENABLE_SELF_GENERATED_CERTS:
+    course = CourseOverview.get_from_id(course_key)
+    if not certs.wants_self_generated_certs(course.self_paced, course_key):
         return
     cert_models.CertificateGenerationCourseSetting.set_enabled_for_course(course_key, True)
 
 
-@receiver(SignalHandler.pre_publish)
 def _make_default_active_certificate(sender, course_key, replace=False,
                                      force=False, **kwargs):  # pylint: disable=unused-argument
     """
@@ -169,28 +374,9 @@ def _make_default_active_certificate(sender, course_key, replace=False,
     since a customer might wish not to enable student-generated certs but still have a
     default certificate ready, for example, if they want instructors to generate the HTML
     certs.
+    Pre-publish runs this as part of _setup_course_on_pre_publish.
     """
-    if not USE_OPEN_ENDED_CERTS_DEFAULTS and not force:
-        return
-
-    store = modulestore()
-    course = store.get_course(course_key)
-    if course.active_default_cert_created and not replace:
+    if not features.for_course(course_key).USE_OPEN_ENDED_CERTS_DEFAULTS and not force:
         return
 
-    default_cert_data = make_default_cert(course_key)
-
-    from contentstore.views import certificates as store_certificates
-    new_cert = store_certificates.CertificateManager.deserialize_certificate(course, default_cert_data)
-    if 'certificates' not in course.certificates:
-        course.certificates['certificates'] = []
-    if replace:
-        course.certificates['certificates'] = [new_cert.certificate_data, ]
-    else:
-        course.certificates['certificates'].append(new_cert.certificate_data)
-    course.active_default_cert_created = True
-    course.save()
-    try:
-        store.update_item(course, course._edited_by)
-    except AttributeError:
-        store.update_item(course, 0)
+    run_pre_publish_steps(course_key, steps=(_apply_default_active_certificate, ), replace=replace, force=force)
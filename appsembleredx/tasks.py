@@ -0,0 +1,53 @@
+"""
+Celery tasks to run appsembleredx course_published handlers off the
+Studio request path.  Publishing a course several times in a row schedules
+several tasks, but only the last one scheduled does any work, unless the
+record of which one is last was lost from the cache, in which case each
+of them does.
+"""
+import logging
+import uuid
+
+from celery.task import task
+from django.core.cache import cache
+from opaque_keys.edx.keys import CourseKey
+
+from appsembleredx.app_settings import features
+
+
+logger = logging.getLogger(__name__)
+
+PENDING_SETUP_CACHE_KEY = u"appsembleredx.tasks.pending_setup.{}"
+# keep the pending token around a while after the task should have run, in case workers are busy
+PENDING_SETUP_CACHE_TIMEOUT_MARGIN = 60 * 60
+
+
+def schedule_course_setup(course_key):
+    """
+    Schedule the course_published handlers for a course to run after the
+    debounce window, superseding any run already scheduled for it
+    """
+    countdown = features.PUBLISH_HANDLERS_DEBOUNCE_SECONDS
+    token = uuid.uuid4().hex
+    cache.set(PENDING_SETUP_CACHE_KEY.format(course_key), token, countdown + PENDING_SETUP_CACHE_TIMEOUT_MARGIN)
+    setup_course_on_publish.apply_async(args=[unicode(course_key), token], countdown=countdown)
+
+
+@task(name=u'appsembleredx.tasks.setup_course_on_publish')
+def setup_course_on_publish(course_key_string, token=None):
+    """
+    Run the course_published handlers for a course, unless a later publish
+    has scheduled another run in the meantime
+    """
+    course_key = CourseKey.from_string(course_key_string)
+    cache_key = PENDING_SETUP_CACHE_KEY.format(course_key)
+    if token is not None:
+        pending = cache.get(cache_key)
+        if pending is not None and pending != token:
+            logger.info(u"Skipping setup of %s, superseded by a later publish", course_key_string)
+            return
+        # run if the token is ours, or is gone (evicted, expired or not shared), rather than never
+        cache.delete(cache_key)
+
+    from appsembleredx import signals
+    signals.setup_course_on_publish(course_key)
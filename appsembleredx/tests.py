@@ -0,0 +1,993 @@
+"""
+Tests for appsembleredx
+"""
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from contextlib import contextmanager
+import copy
+from datetime import datetime, timedelta
+import functools
+import importlib
+import inspect
+import json
+import os
+import shutil
+from StringIO import StringIO
+import sys
+import tempfile
+import threading
+import urlparse
+import uuid
+import warnings
+
+from certificates.models import CertificateGenerationCourseSetting, CertificateHtmlViewConfiguration
+from contentstore.views.certificates import CertificateManager, CertificateValidationError
+from course_modes.models import CourseMode
+import mock
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+from pytz import UTC
+from student.models import LinkedInAddToProfileConfiguration
+from xblock.core import XBlock
+from xblock.field_data import DictFieldData
+from xblock.fields import ScopeIds, String
+from xmodule.modulestore import django as modulestore_django
+from opaque_keys.edx.keys import CourseKey
+
+import appsembleredx
+from appsembleredx import (
+    certs, config_sync, course_setup, drift, extension_fields, instrumentation, ledger, migration_utils, mixins, modes,
+    patching, signals, tasks, throttling, views
+)
+from appsembleredx.app_settings import compile_settings, features
+from appsembleredx.models import CourseExtensionFields, CourseSetupRecord
+
+
+COURSE_KEY = CourseKey.from_string(u'course-v1:TestX+T101+2017')
+PUBLISHED = datetime(2017, 1, 1, tzinfo=UTC)
+REPUBLISHED = PUBLISHED + timedelta(hours=1)
+
+
+def _features(**tokens):
+    """
+    override_settings with these APPSEMBLER_FEATURES on top of the current ones
+    """
+    features = dict(getattr(settings, 'ENV_TOKENS', {}).get('APPSEMBLER_FEATURES', {}), **tokens)
+    return override_settings(ENV_TOKENS=dict(getattr(settings, 'ENV_TOKENS', {}), APPSEMBLER_FEATURES=features))
+
+
+@mock.patch('appsembleredx.signals.setup_course_on_publish')
+class PublishDebounceTest(TestCase):
+    """
+    Tests for the debounced course_published task
+    """
+
+    def setUp(self):
+        super(PublishDebounceTest, self).setUp()
+        self.cache_key = tasks.PENDING_SETUP_CACHE_KEY.format(COURSE_KEY)
+        cache.delete(self.cache_key)
+
+    def test_runs_with_own_token(self, setup):
+        cache.set(self.cache_key, 'mine')
+        tasks.setup_course_on_publish(unicode(COURSE_KEY), 'mine')
+        setup.assert_called_once_with(COURSE_KEY)
+        self.assertIsNone(cache.get(self.cache_key))
+
+    def test_skips_when_superseded(self, setup):
+        cache.set(self.cache_key, 'later')
+        tasks.setup_course_on_publish(unicode(COURSE_KEY), 'earlier')
+        self.assertFalse(setup.called)
+        self.assertEqual(cache.get(self.cache_key), 'later')
+
+    def test_runs_when_token_evicted(self, setup):
+        tasks.setup_course_on_publish(unicode(COURSE_KEY), 'mine')
+        setup.assert_called_once_with(COURSE_KEY)
+
+    def test_runs_when_token_expired(self, setup):
+        cache.set(self.cache_key, 'mine', 0)  # expires at once
+        tasks.setup_course_on_publish(unicode(COURSE_KEY), 'mine')
+        setup.assert_called_once_with(COURSE_KEY)
+
+    def test_runs_without_token(self, setup):
+        cache.set(self.cache_key, 'other')
+        tasks.setup_course_on_publish(unicode(COURSE_KEY))
+        setup.assert_called_once_with(COURSE_KEY)
+
+    def test_later_publish_supersedes_earlier(self, setup):
+        with mock.patch.object(tasks.setup_course_on_publish, 'apply_async') as apply_async:
+            tasks.schedule_course_setup(COURSE_KEY)
+            tasks.schedule_course_setup(COURSE_KEY)
+        (first_args, second_args) = [call[1]['args'] for call in apply_async.call_args_list]
+        tasks.setup_course_on_publish(*first_args)
+        self.assertFalse(setup.called)
+        tasks.setup_course_on_publish(*second_args)
+        setup.assert_called_once_with(COURSE_KEY)
+
+    @_features(RUN_PUBLISH_HANDLERS_ASYNC=True, PUBLISH_HANDLERS_DEBOUNCE_SECONDS=5)
+    def test_publish_schedules_task(self, setup):
+        with mock.patch.object(tasks.setup_course_on_publish, 'apply_async') as apply_async:
+            signals._on_course_published(None, COURSE_KEY)  # pylint: disable=protected-access
+        self.assertFalse(setup.called)
+        apply_async.assert_called_once_with(args=[unicode(COURSE_KEY), cache.get(self.cache_key)], countdown=5)
+
+    @_features(RUN_PUBLISH_HANDLERS_ASYNC=False)
+    def test_publish_runs_synchronously(self, setup):
+        with mock.patch.object(tasks.setup_course_on_publish, 'apply_async') as apply_async:
+            signals._on_course_published(None, COURSE_KEY)  # pylint: disable=protected-access
+        setup.assert_called_once_with(COURSE_KEY)
+        self.assertFalse(apply_async.called)
+
+
+class MeasuringTest(TestCase):
+    """
+    Tests for counting DB queries in instrumentation.measuring
+    """
+
+    def test_counts_queries(self):
+        with instrumentation.measuring() as outer:
+            User.objects.count()
+            with instrumentation.measuring() as inner:
+                User.objects.count()
+        self.assertEqual(outer[instrumentation.DB_QUERIES], 2)
+        self.assertEqual(inner[instrumentation.DB_QUERIES], 1)
+        self.assertGreater(outer[instrumentation.DB_QUERY_SECONDS], 0)
+
+    def test_counts_queries_once_queries_log_is_full(self):
+        connection.queries_log.extend({'sql': '', 'time': '0'} for _ in range(connection.queries_log.maxlen))
+        try:
+            with instrumentation.measuring() as counters:
+                User.objects.count()
+        finally:
+            connection.queries_log.clear()
+        self.assertEqual(counters[instrumentation.DB_QUERIES], 1)
+
+    def test_does_not_log_queries(self):
+        with instrumentation.measuring():
+            User.objects.count()
+        self.assertFalse(connection.queries_log)
+
+
+class SetupCourseDriftTest(TestCase):
+    """
+    Tests for checking courses against the modulestore where they are set up
+    """
+
+    @mock.patch('appsembleredx.drift.modulestore')
+    def test_check_batch_without_loading_courses(self, get_modulestore):
+        (course_drift, ) = drift.check_batch([COURSE_KEY], load_courses=False)
+        self.assertFalse(get_modulestore.called)
+        self.assertIn(drift.DEFAULT_CERTIFICATE, course_drift.steps)
+
+    @mock.patch('appsembleredx.course_setup.with_self_generated_certs', side_effect=lambda drifts: drifts)
+    @mock.patch('appsembleredx.course_setup.with_default_modes', side_effect=lambda drifts: drifts)
+    @mock.patch('appsembleredx.drift.modulestore')
+    def test_drifted_leaves_course_reads_to_setup(self, get_modulestore, _with_default_modes,
+                                                  _with_self_generated_certs):
+        report = course_setup.SetupReport()
+        (course_drift, ) = course_setup._drifted([COURSE_KEY], False, False, report)  # pylint: disable=protected-access
+        self.assertFalse(get_modulestore.called)
+        self.assertIn(drift.DEFAULT_CERTIFICATE, course_drift.steps)
+        self.assertEqual(report.up_to_date, 0)
+
+    @mock.patch('appsembleredx.signals.run_pre_publish_steps')
+    @mock.patch('appsembleredx.signals._get_course')
+    @mock.patch('appsembleredx.course_setup.modulestore')
+    def test_setup_course_skips_course_steps_done(self, _get_modulestore, get_course, run_pre_publish_steps):
+        get_course.return_value = mock.Mock(cert_defaults_set=True, active_default_cert_created=True)
+        steps = course_setup.setup_course(COURSE_KEY, steps=drift.COURSE_STEPS)
+        self.assertEqual(steps, ())
+        self.assertFalse(run_pre_publish_steps.called)
+
+    @mock.patch('appsembleredx.signals.run_pre_publish_steps')
+    @mock.patch('appsembleredx.signals._get_course')
+    @mock.patch('appsembleredx.course_setup.modulestore')
+    def test_setup_course_runs_course_steps_needed(self, _get_modulestore, get_course, run_pre_publish_steps):
+        course = get_course.return_value = mock.Mock(cert_defaults_set=True, active_default_cert_created=False)
+        steps = course_setup.setup_course(COURSE_KEY, steps=drift.COURSE_STEPS)
+        self.assertEqual(steps, (drift.DEFAULT_CERTIFICATE, ))
+        self.assertEqual(run_pre_publish_steps.call_args[1]['course'], course)
+
+    @mock.patch('appsembleredx.signals._get_course', return_value=None)
+    @mock.patch('appsembleredx.course_setup.modulestore')
+    def test_setup_course_missing_from_modulestore(self, _get_modulestore, _get_course):
+        with self.assertRaises(ValueError):
+            course_setup.setup_course(COURSE_KEY, steps=drift.COURSE_STEPS)
+
+
+class SetupRunTest(TestCase):
+    """
+    Tests for running setup over many courses
+    """
+
+    def test_report_counts_from_threads(self):
+        report = course_setup.SetupReport()
+        threads = [threading.Thread(target=lambda: [report.skip() for _ in range(1000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(report.up_to_date, 4000)
+
+    @mock.patch('appsembleredx.course_setup._close_db_connections')
+    def test_feeder_closes_db_connections(self, close_db_connections):
+        course_drifts = course_setup._closing_db_connections(iter([1, 2]))  # pylint: disable=protected-access
+        self.assertEqual(next(course_drifts), 1)
+        self.assertFalse(close_db_connections.called)
+        self.assertEqual(list(course_drifts), [2])
+        self.assertTrue(close_db_connections.called)
+
+
+class PrePublishStepsTest(TestCase):
+    """
+    Tests for running the pre-publish steps with one course read and write
+    """
+
+    def setUp(self):
+        super(PrePublishStepsTest, self).setUp()
+        modulestore_django.clear_existing_modulestores()
+        self.addCleanup(modulestore_django.clear_existing_modulestores)
+        self.store = modulestore_django.modulestore()
+        self.store.create_course(COURSE_KEY, display_name=u'Test Course')
+        self.calls = []
+        self.in_bulk_operations = False
+        for name in ('get_course', 'update_item'):
+            patcher = mock.patch.object(self.store, name, side_effect=self._call(name, getattr(self.store, name)))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(self.store, 'bulk_operations', side_effect=self._bulk_operations)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _call(self, name, method):
+        def call(*args, **kwargs):
+            self.calls.append((name, self.in_bulk_operations))
+            return method(*args, **kwargs)
+        return call
+
+    @contextmanager
+    def _bulk_operations(self, course_key):  # pylint: disable=unused-argument
+        self.in_bulk_operations = True
+        try:
+            yield
+        finally:
+            self.in_bulk_operations = False
+
+    @_features(USE_OPEN_ENDED_CERTS_DEFAULTS=True)
+    @mock.patch('appsembleredx.signals.make_default_cert', return_value={'signatories': []})
+    def test_one_read_and_write(self, _make_default_cert):
+        self.assertTrue(signals.run_pre_publish_steps(COURSE_KEY))
+        self.assertEqual(self.calls, [('get_course', True), ('update_item', True)])
+        course = self.store.get_course(COURSE_KEY)
+        self.assertTrue(course.cert_defaults_set)
+        self.assertTrue(course.active_default_cert_created)
+
+    @_features(USE_OPEN_ENDED_CERTS_DEFAULTS=True)
+    @mock.patch('appsembleredx.signals.make_default_cert', return_value={'signatories': []})
+    def test_nothing_written_when_set_up(self, _make_default_cert):
+        signals.run_pre_publish_steps(COURSE_KEY)
+        self.calls = []
+        self.assertFalse(signals.run_pre_publish_steps(COURSE_KEY))
+        self.assertEqual(self.calls, [('get_course', True)])
+
+    @_features(USE_OPEN_ENDED_CERTS_DEFAULTS=False)
+    def test_nothing_written_when_no_step_applies(self):
+        self.assertFalse(signals.run_pre_publish_steps(COURSE_KEY))
+        self.assertEqual(self.calls, [('get_course', True)])
+
+
+@mock.patch('appsembleredx.signals.store_theme_signature_img_as_asset',
+            side_effect=lambda course_key, path: u'/{}/{}'.format(course_key, path))
+class DefaultCertTest(TestCase):
+    """
+    Tests for building the default certificate of a course
+    """
+
+    def setUp(self):
+        super(DefaultCertTest, self).setUp()
+        signals._forget_default_cert_templates()  # pylint: disable=protected-access
+        self.addCleanup(signals._forget_default_cert_templates)  # pylint: disable=protected-access
+
+    def test_per_course_signature_paths(self, _store_signature_img):
+        other_course_key = CourseKey.from_string(u'course-v1:TestX+T102+2017')
+        template = copy.deepcopy(signals._get_default_cert_template(COURSE_KEY))  # pylint: disable=protected-access
+        certificate = signals.make_default_cert(COURSE_KEY)
+        other_certificate = signals.make_default_cert(other_course_key)
+        self.assertTrue(template['signatories'])
+        self.assertEqual(
+            [sig['signature_image_path'] for sig in certificate['signatories']],
+            [u'/{}/{}'.format(COURSE_KEY, sig['signature_image_path']) for sig in template['signatories']]
+        )
+        self.assertNotEqual(certificate['signatories'], other_certificate['signatories'])
+        # Studio assigns ids in place
+        CertificateManager.assign_id(mock.Mock(certificates={}), certificate)
+        self.assertEqual(signals._get_default_cert_template(COURSE_KEY), template)  # pylint: disable=protected-access
+
+    def test_template_validated_once(self, _store_signature_img):
+        with mock.patch.object(CertificateManager, 'validate', wraps=CertificateManager.validate) as validate:
+            signals.make_default_cert(COURSE_KEY)
+            signals.make_default_cert(COURSE_KEY)
+        self.assertEqual(validate.call_count, 1)
+
+    @mock.patch.object(CertificateManager, 'validate', side_effect=CertificateValidationError)
+    def test_invalid_template_not_used(self, _validate, _store_signature_img):
+        with self.assertRaises(CertificateValidationError):
+            signals.make_default_cert(COURSE_KEY)
+        self.assertNotIn(u'TestX', signals._default_cert_templates)  # pylint: disable=protected-access
+
+
+@_features(ALWAYS_ENABLE_SELF_GENERATED_CERTS=False, DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED=False, ORG_OVERRIDES={
+    'AcmeX': {'ALWAYS_ENABLE_SELF_GENERATED_CERTS': True, 'DISABLE_SELF_GENERATED_CERTS_FOR_SELF_PACED': True}
+})
+class SelfGeneratedCertsTest(TestCase):
+    """
+    Tests for enabling self-generated certificates on one course and in bulk
+    """
+
+    def setUp(self):
+        super(SelfGeneratedCertsTest, self).setUp()
+        cache.clear()
+        self.course_keys = []
+        for org in ('TestX', 'AcmeX'):
+            for self_paced in (True, False):
+                course_key = CourseKey.from_string(u'course-v1:{}+{}+2017'.format(org, 'SP' if self_paced else 'IP'))
+                CourseOverview.objects.create(id=course_key, self_paced=self_paced)
+                self.course_keys.append(course_key)
+        self.expected = set([u'course-v1:TestX+SP+2017', u'course-v1:AcmeX+IP+2017'])
+
+    def test_bulk_same_rules_as_per_course(self):
+        for course_key in self.course_keys:
+            signals.enable_self_generated_certs(None, course_key)
+        self.assertEqual(certs.courses_with_self_generated_certs(self.course_keys), self.expected)
+
+        CertificateGenerationCourseSetting.objects.all().delete()
+        certs.invalidate_self_generated_certs_cache()
+        no_overview_key = CourseKey.from_string(u'course-v1:TestX+T404+2017')
+        enabled, undecided = certs.enable_self_generated_certs_in_bulk(self.course_keys + [no_overview_key])
+        self.assertEqual(set(unicode(course_key) for course_key in enabled), self.expected)
+        self.assertEqual(undecided, [no_overview_key])
+        self.assertEqual(certs.courses_with_self_generated_certs(self.course_keys), self.expected)
+
+    def test_bulk_forgets_cached_state(self):
+        for course_key in self.course_keys:
+            self.assertFalse(certs.is_self_generated_certs_enabled(course_key))
+        certs.enable_self_generated_certs_in_bulk(self.course_keys)
+        self.assertEqual(
+            set(unicode(course_key) for course_key in self.course_keys
+                if certs.is_self_generated_certs_enabled(course_key)),
+            self.expected
+        )
+        self.assertEqual(certs.enable_self_generated_certs_in_bulk(self.course_keys), ([], []))
+
+
+class LedgerTest(TestCase):
+    """
+    Tests for recording courses as set up
+    """
+
+    @mock.patch('appsembleredx.ledger.course_versions')
+    def test_flush_writes_recorded_version(self, course_versions):
+        setup_ledger = ledger.Ledger()
+        setup_ledger.record(COURSE_KEY, PUBLISHED, u'fingerprint')
+        # republished before the ledger is written
+        course_versions.return_value = {unicode(COURSE_KEY): REPUBLISHED}
+        setup_ledger.flush()
+        record = CourseSetupRecord.objects.get(course_id=COURSE_KEY)
+        self.assertEqual((record.course_version, record.settings_fingerprint), (PUBLISHED, u'fingerprint'))
+        self.assertEqual(ledger.unchanged_course_keys([COURSE_KEY]), set())
+
+    def test_flush_writes_latest_record(self):
+        setup_ledger = ledger.Ledger()
+        setup_ledger.record(COURSE_KEY, PUBLISHED, u'fingerprint')
+        setup_ledger.record(COURSE_KEY, REPUBLISHED, u'fingerprint')
+        setup_ledger.flush()
+        self.assertEqual(CourseSetupRecord.objects.get(course_id=COURSE_KEY).course_version, REPUBLISHED)
+
+    @mock.patch('appsembleredx.ledger.course_versions')
+    @mock.patch('appsembleredx.course_setup.setup_course', return_value=())
+    def test_run_one_captures_version_set_up(self, _setup_course, course_versions):
+        course_versions.return_value = {unicode(COURSE_KEY): PUBLISHED}
+        result = course_setup._run_one(COURSE_KEY, False)  # pylint: disable=protected-access
+        self.assertEqual(result.course_version, PUBLISHED)
+        self.assertEqual(result.fingerprint, ledger.course_fingerprint(COURSE_KEY))
+
+
+class DefaultModesTest(TestCase):
+    """
+    Tests for creating default-mode CourseModes
+    """
+
+    def _course_key(self, number):
+        return CourseKey.from_string(u'course-v1:TestX+T{}+2017'.format(number))
+
+    def test_insert_ignore_sql(self):
+        fields = [CourseMode._meta.get_field('course_id'), CourseMode._meta.get_field('mode_slug')]
+        expected = {
+            'mysql': u' ON DUPLICATE KEY UPDATE "id" = "id"',
+            'postgresql': u' ON CONFLICT DO NOTHING',
+            'sqlite': u' ON CONFLICT DO NOTHING',
+        }
+        for vendor, clause in expected.items():
+            connection = mock.Mock(vendor=vendor, ops=mock.Mock(quote_name=lambda name: u'"{}"'.format(name)))
+            self.assertEqual(
+                modes._insert_ignore_sql(connection, fields, 2),  # pylint: disable=protected-access
+                u'INSERT INTO "{}" ("course_id", "mode_slug") VALUES (%s, %s), (%s, %s){}'.format(
+                    CourseMode._meta.db_table, clause
+                )
+            )
+
+    def test_ensure_default_mode_with_existing_row(self):
+        CourseMode.objects.create(course_id=COURSE_KEY, mode_slug=features.DEFAULT_COURSE_MODE_SLUG,
+                                  mode_display_name=u'Existing')
+        self.assertFalse(modes.ensure_default_mode(COURSE_KEY))
+        self.assertEqual(CourseMode.objects.get(course_id=COURSE_KEY).mode_display_name, u'Existing')
+
+    def test_ensure_default_mode_twice(self):
+        self.assertTrue(modes.ensure_default_mode(COURSE_KEY))
+        self.assertFalse(modes.ensure_default_mode(COURSE_KEY))
+        self.assertEqual(CourseMode.objects.filter(course_id=COURSE_KEY).count(), 1)
+
+    def test_other_errors_are_not_ignored(self):
+        with self.assertRaises(IntegrityError):
+            modes._insert_ignore([CourseMode(course_id=COURSE_KEY, mode_slug=None)])  # pylint: disable=protected-access
+
+    def test_course_keys_missing_default_mode(self):
+        with_default, with_other, without = [self._course_key(number) for number in range(3)]
+        CourseMode.objects.create(course_id=with_default, mode_slug=features.DEFAULT_COURSE_MODE_SLUG)
+        CourseMode.objects.create(course_id=with_other, mode_slug='verified')
+        self.assertEqual(modes.course_keys_missing_default_mode([with_default, with_other, without]),
+                         [with_other, without])
+
+    def test_create_missing_default_modes(self):
+        # more rows than SQLite takes parameters for in one statement
+        course_keys = [self._course_key(number) for number in range(150)]
+        CourseMode.objects.create(course_id=course_keys[0], mode_slug=features.DEFAULT_COURSE_MODE_SLUG)
+        self.assertEqual(modes.create_missing_default_modes(course_keys), 149)
+        self.assertEqual(modes.create_missing_default_modes(course_keys), 0)
+        self.assertEqual(CourseMode.objects.filter(course_id__in=course_keys).count(), 150)
+
+
+class ModesCacheTest(TestCase):
+    """
+    Tests for caching CourseMode.modes_for_course
+    """
+
+    def setUp(self):
+        super(ModesCacheTest, self).setUp()
+        cache.clear()
+        self.modes_for_course = mock.Mock(__name__='modes_for_course', side_effect=lambda course_id, **kwargs: [
+            course_mode.to_tuple() for course_mode in CourseMode.objects.filter(course_id=course_id)
+        ])
+        self.cached_modes_for_course = functools.partial(
+            modes.caching_modes_for_course(self.modes_for_course), CourseMode
+        )
+
+    def test_cached_per_arguments(self):
+        CourseMode.objects.create(course_id=COURSE_KEY, mode_slug='verified', mode_display_name='Verified')
+        self.cached_modes_for_course(COURSE_KEY)
+        self.cached_modes_for_course(COURSE_KEY)
+        self.assertEqual(self.modes_for_course.call_count, 1)
+        self.cached_modes_for_course(COURSE_KEY, only_selectable=False)
+        self.assertEqual(self.modes_for_course.call_count, 2)
+
+    def test_saved_mode_invalidates(self):
+        self.assertEqual(self.cached_modes_for_course(COURSE_KEY), [])
+        CourseMode.objects.create(course_id=COURSE_KEY, mode_slug='verified', mode_display_name='Verified')
+        self.assertEqual([mode.slug for mode in self.cached_modes_for_course(COURSE_KEY)], ['verified'])
+
+    def test_created_default_mode_is_cached(self):
+        self.cached_modes_for_course(COURSE_KEY)
+        self.assertEqual(modes.create_missing_default_modes([COURSE_KEY]), 1)
+        default_mode = CourseMode.objects.get(course_id=COURSE_KEY).to_tuple()
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.assertEqual(self.cached_modes_for_course(COURSE_KEY), [default_mode])
+            self.assertEqual(self.cached_modes_for_course(COURSE_KEY, include_expired=True), [default_mode])
+        self.assertEqual(self.modes_for_course.call_count, 1)
+        self.assertEqual(get_many.call_count, 2)
+
+    def test_created_default_mode_with_other_modes(self):
+        CourseMode.objects.create(course_id=COURSE_KEY, mode_slug='verified', mode_display_name='Verified')
+        self.cached_modes_for_course(COURSE_KEY)
+        modes.create_missing_default_modes([COURSE_KEY])
+        self.assertEqual(
+            sorted(mode.slug for mode in self.cached_modes_for_course(COURSE_KEY)),
+            sorted(['verified', features.DEFAULT_COURSE_MODE_SLUG])
+        )
+
+    def test_chunked_update_invalidates(self):
+        other_course_key = CourseKey.from_string(u'course-v1:TestX+T102+2017')
+        for course_key in (COURSE_KEY, other_course_key):
+            CourseMode.objects.create(course_id=course_key, mode_slug='audit', mode_display_name='Audit')
+            self.cached_modes_for_course(course_key)
+        migration_utils.chunked_update(
+            CourseMode.objects.filter(mode_slug='audit'), batch_size=1, stdout=StringIO(), mode_slug='honor'
+        )
+        for course_key in (COURSE_KEY, other_course_key):
+            self.assertEqual([mode.slug for mode in self.cached_modes_for_course(course_key)], ['honor'])
+        self.assertEqual(self.modes_for_course.call_count, 4)
+
+
+class ThrottlingTest(TestCase):
+    """
+    Tests for pacing appsembler_setup_courses
+    """
+
+    def test_probe_measures_queries_once_queries_log_is_full(self):
+        connection.queries_log.extend({'sql': '', 'time': '0'} for _ in range(connection.queries_log.maxlen))
+        try:
+            with throttling.LatencyProbe() as probe:
+                User.objects.count()
+        finally:
+            connection.queries_log.clear()
+        self.assertGreater(probe.latency, 0)
+
+    @mock.patch('appsembleredx.drift.check_batch', return_value=[])
+    def test_batches_are_paced(self, _check_batch):
+        throttle = mock.Mock(probes_latency=True)
+        throttle.latency_threshold = 1.0
+        course_keys = [CourseKey.from_string(u'course-v1:TestX+T{}+2017'.format(i))
+                       for i in range(drift.CHECK_BATCH_SIZE + 1)]
+        list(course_setup._drifted(  # pylint: disable=protected-access
+            course_keys, False, False, course_setup.SetupReport(), throttle
+        ))
+        self.assertEqual(throttle.acquire.call_count, 2)
+        self.assertEqual(throttle.observe.call_count, 2)
+
+
+class DefinitionChainTest(TestCase):
+    """
+    Tests for chaining definition_to_xml and definition_from_xml over mixins
+    """
+
+    def setUp(self):
+        super(DefinitionChainTest, self).setUp()
+        calls = self.calls = []
+
+        class ChainBase(object):
+            def definition_to_xml(self, xmlobj):
+                calls.append(('ChainBase', 'to_xml'))
+                return xmlobj + ['base']
+
+            @classmethod
+            def definition_from_xml(cls, definition, children):
+                calls.append(('ChainBase', 'from_xml'))
+                return definition, children
+
+        class FirstMixin(object):
+            def definition_to_xml(self, xmlobj):
+                calls.append(('FirstMixin', 'to_xml'))
+                return xmlobj + ['first']
+
+            @classmethod
+            def definition_from_xml(cls, definition, children):
+                calls.append(('FirstMixin', 'from_xml'))
+                return dict(definition, first=True), children
+
+        class SecondMixin(object):
+            def definition_to_xml(self, xmlobj):
+                calls.append(('SecondMixin', 'to_xml'))
+                return xmlobj + ['second']
+
+            @classmethod
+            def definition_from_xml(cls, definition, children):
+                calls.append(('SecondMixin', 'from_xml'))
+                return dict(definition, second=True), children
+
+        class ImportOnlyMixin(object):
+            @classmethod
+            def definition_from_xml(cls, definition, children):
+                calls.append(('ImportOnlyMixin', 'from_xml'))
+                return definition, children
+
+        self.block_class = type('ChainedBlock', (
+            mixins.XMLDefinitionChainingMixin, FirstMixin, SecondMixin, ImportOnlyMixin, ChainBase
+        ), {})
+
+    def test_chains_in_mro_order(self):
+        block = self.block_class.__new__(self.block_class)
+        self.assertEqual(block.definition_to_xml([]), ['base', 'second', 'first'])
+        self.assertEqual(self.block_class.definition_from_xml({}, []), ({'first': True, 'second': True}, []))
+        self.assertEqual(self.calls, [
+            ('ChainBase', 'to_xml'), ('SecondMixin', 'to_xml'), ('FirstMixin', 'to_xml'),
+            ('ChainBase', 'from_xml'), ('ImportOnlyMixin', 'from_xml'), ('SecondMixin', 'from_xml'),
+            ('FirstMixin', 'from_xml'),
+        ])
+
+    def test_chain_resolved_once(self):
+        definition_chain = mixins._definition_chain  # pylint: disable=protected-access
+        chain = definition_chain(self.block_class, 'definition_to_xml')
+        with mock.patch('appsembleredx.mixins.inspect.getmro', wraps=inspect.getmro) as getmro:
+            self.assertIs(definition_chain(self.block_class, 'definition_to_xml'), chain)
+            definition_chain(self.block_class, 'definition_from_xml')
+        self.assertEqual(getmro.call_count, 1)
+
+
+class PatchingTest(TestCase):
+    """
+    Tests for applying monkeypatches as the modules they patch are imported
+    """
+
+    def setUp(self):
+        super(PatchingTest, self).setUp()
+        self.events = []
+        self.target = 'appsembleredx_patch_target_{}'.format(uuid.uuid4().hex)
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        with open(os.path.join(path, self.target + '.py'), 'w') as module_file:
+            module_file.write('EVENTS.append("import")\n')
+        sys.path.insert(0, path)
+        self.addCleanup(sys.path.remove, path)
+        self.addCleanup(sys.modules.pop, self.target, None)
+        registered = list(patching._PATCHES)  # pylint: disable=protected-access
+        self.addCleanup(patching._TARGETS.discard, self.target)  # pylint: disable=protected-access
+        self.addCleanup(setattr, patching, '_PATCHES', registered)
+
+    def _import_target(self):
+        # the module body records that it ran in self.events
+        with mock.patch('__builtin__.EVENTS', self.events, create=True):
+            return importlib.import_module(self.target)
+
+    def _patch(self, name='test_patch'):
+        def test_patch(module):
+            self.events.append(('patch', module.__name__))
+        return patching.patches(self.target, name=name)(test_patch)
+
+    def test_applied_on_first_import(self):
+        self._patch()
+        self.assertEqual(patching.get_patch('test_patch').state, patching.PENDING)
+        self._import_target()
+        self._import_target()
+        self.assertEqual(self.events, ['import', ('patch', self.target)])
+        self.assertEqual(patching.get_patch('test_patch').state, patching.APPLIED)
+
+    def test_applied_to_module_already_imported(self):
+        self._import_target()
+        self._patch()
+        patching.apply_to_imported()
+        self.assertEqual(self.events, ['import', ('patch', self.target)])
+        self.assertEqual(patching.get_patch('test_patch').state, patching.APPLIED)
+
+    def test_before_import_order(self):
+        @patching.before_import(self.target)
+        @contextmanager
+        def test_import_context():
+            self.events.append('before')
+            # the target imported within is left to the regular finders
+            self.assertIsNone(patching._hook.find_module(self.target))  # pylint: disable=protected-access
+            yield
+            self.events.append('after')
+
+        self._patch()
+        self._import_target()
+        self.assertEqual(self.events, ['before', 'import', 'after', ('patch', self.target)])
+
+    def test_disabled(self):
+        @patching.before_import(self.target, name='test_patch')
+        @contextmanager
+        def test_import_context():
+            self.events.append('before')
+            yield
+
+        self._patch()
+        with _features(DISABLED_MONKEYPATCHES=['test_patch']):
+            self._import_target()
+        self.assertEqual(self.events, ['import'])
+        self.assertEqual(patching.get_patch('test_patch').state, patching.DISABLED)
+
+    def test_install_reads_no_settings(self):
+        self._import_target()
+        self._patch()
+        with mock.patch.object(features, '_values', None):
+            patching.install()
+            self.assertIsNone(features._values)  # pylint: disable=protected-access
+        self.assertEqual(patching.get_patch('test_patch').state, patching.PENDING)
+
+
+class SettingsModuleTest(TestCase):
+    """
+    Tests for reading settings lazily, and the deprecated module attributes
+    """
+
+    def test_deprecated_module_attributes(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            from appsembleredx.app_settings import DEFAULT_COURSE_MODE_SLUG, features
+        self.assertEqual(DEFAULT_COURSE_MODE_SLUG, features.DEFAULT_COURSE_MODE_SLUG)
+        self.assertTrue(any(issubclass(warning.category, DeprecationWarning) for warning in caught))
+
+    def test_unknown_module_attribute(self):
+        with self.assertRaises(ImportError):
+            from appsembleredx.app_settings import NO_SUCH_SETTING  # noqa: F401  pylint: disable=unused-variable
+
+    def test_importing_mixins_reads_no_settings(self):
+        # import a second copy of the module, leaving the one imported, and its
+        # classes, in place for the rest of the run
+        self.addCleanup(setattr, appsembleredx, 'mixins', mixins)
+        self.addCleanup(sys.modules.__setitem__, 'appsembleredx.mixins', mixins)
+        del sys.modules['appsembleredx.mixins']
+        with mock.patch.object(features, '_values', None):
+            fresh_mixins = importlib.import_module('appsembleredx.mixins')
+            self.assertIsNone(features._values)  # pylint: disable=protected-access
+        self.assertIsNot(fresh_mixins, mixins)
+        self.assertEqual(
+            fresh_mixins.CreditsMixin.credit_provider.values,
+            fresh_mixins.build_field_values(features.CREDIT_PROVIDERS)
+        )
+
+
+ACME_COURSE_KEY = CourseKey.from_string(u'course-v1:AcmeX+A101+2017')
+
+
+class CreditsBlock(mixins.CreditsMixin, XBlock):
+    """
+    XBlock with the credit fields
+    """
+
+
+@_features(CREDIT_PROVIDERS_DEFAULT='NASBA', ACTIVATE_DEFAULT_CERTS=True,
+           ORG_OVERRIDES={'AcmeX': {'CREDIT_PROVIDERS_DEFAULT': 'ACPE', 'ACTIVATE_DEFAULT_CERTS': False}})
+class OrgSettingsTest(TestCase):
+    """
+    Tests for settings overridden per organization
+    """
+
+    def _block(self, course_key, **fields):
+        usage_key = course_key.make_usage_key('course', 'course')
+        return CreditsBlock(mock.Mock(), DictFieldData(fields), ScopeIds(None, 'course', usage_key, usage_key))
+
+    def test_for_org_and_for_course(self):
+        self.assertEqual(features.for_org('AcmeX').CREDIT_PROVIDERS_DEFAULT, 'ACPE')
+        self.assertEqual(features.for_course(ACME_COURSE_KEY).CREDIT_PROVIDERS_DEFAULT, 'ACPE')
+        self.assertEqual(features.for_course(unicode(ACME_COURSE_KEY)).CREDIT_PROVIDERS_DEFAULT, 'ACPE')
+        # settings the organization doesn't override are the global ones
+        self.assertEqual(features.for_org('AcmeX').DEFAULT_CERT_SIGNATORIES, features.DEFAULT_CERT_SIGNATORIES)
+        for org_settings in (features.for_org(None), features.for_course(COURSE_KEY), features.for_course(u'nonsense')):
+            self.assertEqual((org_settings.CREDIT_PROVIDERS_DEFAULT, org_settings.ACTIVATE_DEFAULT_CERTS),
+                             ('NASBA', True))
+
+    def test_org_override_errors(self):
+        with self.assertRaises(ImproperlyConfigured) as raised:
+            compile_settings({'ORG_OVERRIDES': {
+                'AcmeX': {'DEFAULT_COURSE_MODE_SLUG': 'honor', 'DEFAULT_CERT_SIGNATORIES': [{}]},
+                'BadX': ['ACTIVATE_DEFAULT_CERTS'],
+            }})
+        message = unicode(raised.exception)
+        self.assertIn(u"ORG_OVERRIDES['AcmeX'].DEFAULT_COURSE_MODE_SLUG can't be set per organization", message)
+        self.assertIn(u"ORG_OVERRIDES['AcmeX'].DEFAULT_CERT_SIGNATORIES[0] should be a dict", message)
+        self.assertIn(u"ORG_OVERRIDES['BadX'] should be dict", message)
+
+    def test_ledger_fingerprint_per_org(self):
+        global_fingerprint = ledger.settings_fingerprint()
+        self.assertNotEqual(ledger.course_fingerprint(ACME_COURSE_KEY), global_fingerprint)
+        self.assertEqual(ledger.course_fingerprint(COURSE_KEY), global_fingerprint)
+        # the fingerprint of an organization follows its overrides
+        with _features(CREDIT_PROVIDERS_DEFAULT='NASBA', ACTIVATE_DEFAULT_CERTS=True,
+                       ORG_OVERRIDES={'AcmeX': {'ACTIVATE_DEFAULT_CERTS': True}}):
+            self.assertEqual(ledger.course_fingerprint(ACME_COURSE_KEY), global_fingerprint)
+            self.assertEqual(ledger.settings_fingerprint(), global_fingerprint)
+
+    def test_org_default_field(self):
+        self.assertEqual(self._block(ACME_COURSE_KEY).credit_provider, 'ACPE')
+        self.assertEqual(self._block(COURSE_KEY).credit_provider, 'NASBA')
+        self.assertEqual(self._block(ACME_COURSE_KEY, credit_provider='Other').credit_provider, 'Other')
+        self.assertEqual(CreditsBlock.credit_provider.default, 'NASBA')
+
+    def test_default_value_hook_checked(self):
+        mixins.check_default_value_hook(String)
+        with self.assertRaises(ImproperlyConfigured):
+            mixins.check_default_value_hook(object)
+
+
+@mock.patch('appsembleredx.signals.contentstore')
+class StoredSignatureDigestTest(TestCase):
+    """
+    Tests for reading the digests of stored signature images
+    """
+
+    def setUp(self):
+        super(StoredSignatureDigestTest, self).setUp()
+        signals._STORED_SIGNATURE_DIGESTS.clear()  # pylint: disable=protected-access
+        self.content_loc = u'/c4x/TestX/T101/asset/sig.png'
+
+    def test_reads_stored_md5_from_stream_once(self, get_contentstore):
+        get_contentstore.return_value.find.return_value = mock.Mock(content_digest='abc')
+        self.assertEqual(signals._stored_signature_digest(self.content_loc), 'abc')  # pylint: disable=protected-access
+        self.assertEqual(signals._stored_signature_digest(self.content_loc), 'abc')  # pylint: disable=protected-access
+        get_contentstore.return_value.find.assert_called_once_with(
+            self.content_loc, throw_on_not_found=False, as_stream=True
+        )
+
+    def test_nothing_stored(self, get_contentstore):
+        get_contentstore.return_value.find.return_value = None
+        self.assertIsNone(signals._stored_signature_digest(self.content_loc))  # pylint: disable=protected-access
+        self.assertNotIn(self.content_loc, signals._STORED_SIGNATURE_DIGESTS)  # pylint: disable=protected-access
+
+    def test_signature_image_not_png(self, get_contentstore):
+        with self.assertRaises(ValueError):
+            signals.store_theme_signature_img_as_asset(COURSE_KEY, u'images/sig.pdf')
+        self.assertFalse(get_contentstore.called)
+
+    @mock.patch('appsembleredx.signals.get_storage_class')
+    def test_signature_image_content_type(self, get_storage_class, get_contentstore):
+        signals._THEME_SIGNATURE_IMAGES.clear()  # pylint: disable=protected-access
+        get_storage_class.return_value.return_value.path.return_value = __file__
+        get_contentstore.return_value.find.return_value = None
+        with mock.patch('appsembleredx.signals.StaticContent') as static_content:
+            signals.store_theme_signature_img_as_asset(COURSE_KEY, u'images/sig.jpg')
+        self.assertEqual(static_content.call_args[0][1:3], (u'sig.jpg', 'image/jpeg'))
+        signals._THEME_SIGNATURE_IMAGES.clear()  # pylint: disable=protected-access
+
+
+class UpdateExtensionFieldsTest(TestCase):
+    """
+    Tests for mirroring a course's fields to CourseExtensionFields
+    """
+
+    def _store(self, version, **fields):
+        course = mock.Mock(id=COURSE_KEY, course_version=version, **dict(
+            dict.fromkeys(extension_fields.MIRRORED_FIELDS), **fields
+        ))
+        return mock.Mock(get_course=mock.Mock(return_value=course))
+
+    def test_creates_row(self):
+        self.assertTrue(extension_fields.update_course(COURSE_KEY, self._store('v1', credits=2.0)))
+        row = CourseExtensionFields.objects.get(course_id=COURSE_KEY)
+        self.assertEqual((row.org, row.credits, row.course_version), ('TestX', 2.0, 'v1'))
+
+    def test_republish_without_changes_writes_nothing(self):
+        extension_fields.update_course(COURSE_KEY, self._store('v1', credits=2.0))
+        self.assertFalse(extension_fields.update_course(COURSE_KEY, self._store('v2', credits=2.0)))
+        self.assertEqual(CourseExtensionFields.objects.get(course_id=COURSE_KEY).course_version, 'v1')
+
+    def test_updates_changed_row(self):
+        extension_fields.update_course(COURSE_KEY, self._store('v1', credits=2.0))
+        self.assertTrue(extension_fields.update_course(COURSE_KEY, self._store('v2', credits=3.0)))
+        row = CourseExtensionFields.objects.get(course_id=COURSE_KEY)
+        self.assertEqual((row.credits, row.course_version), (3.0, 'v2'))
+
+    def test_backfill_updates_stale_row_in_place(self):
+        row = CourseExtensionFields.objects.create(course_id=COURSE_KEY, org='TestX', credits=2.0)
+        result = extension_fields.backfill_batch([COURSE_KEY], self._store('v2', credits=3.0))
+        self.assertEqual(result, extension_fields.BackfillResult(0, 1, 0, 0))
+        updated = CourseExtensionFields.objects.get(course_id=COURSE_KEY)
+        self.assertEqual((updated.id, updated.credits, updated.course_version), (row.id, 3.0, 'v2'))
+        self.assertGreater(updated.modified, row.modified)
+
+    def test_backfill_creates_rows(self):
+        result = extension_fields.backfill_batch([COURSE_KEY], self._store('v1', credits=2.0))
+        self.assertEqual(result, extension_fields.BackfillResult(1, 0, 0, 0))
+        self.assertEqual(CourseExtensionFields.objects.get(course_id=COURSE_KEY).credits, 2.0)
+
+    def test_backfill_row_created_concurrently(self):
+        row = CourseExtensionFields.objects.create(course_id=COURSE_KEY, org='TestX', credits=2.0)
+        # as if a publish created the row after backfill read the rows
+        with mock.patch('django.db.models.query.QuerySet.filter', side_effect=[
+            CourseExtensionFields.objects.none(), CourseExtensionFields.objects.filter(course_id=COURSE_KEY)
+        ]):
+            extension_fields.backfill_batch([COURSE_KEY], self._store('v2', credits=3.0))
+        updated = CourseExtensionFields.objects.get(course_id=COURSE_KEY)
+        self.assertEqual((updated.id, updated.credits), (row.id, 3.0))
+
+    def test_row_created_concurrently(self):
+        CourseExtensionFields.objects.create(course_id=COURSE_KEY, org='TestX', credits=2.0)
+        # as if another process created the row after this one looked for it
+        with mock.patch('django.db.models.query.QuerySet.first', return_value=None):
+            self.assertTrue(extension_fields.update_course(COURSE_KEY, self._store('v2', credits=3.0)))
+        self.assertEqual(CourseExtensionFields.objects.get(course_id=COURSE_KEY).credits, 3.0)
+
+
+class CourseExtensionFieldsApiTest(TestCase):
+    """
+    Tests for listing course extension fields
+    """
+
+    def setUp(self):
+        super(CourseExtensionFieldsApiTest, self).setUp()
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'password')
+        self.staff.is_staff = True
+        self.staff.save()
+        self.rows = [
+            CourseExtensionFields.objects.create(
+                course_id=CourseKey.from_string(u'course-v1:{}+T{}+2017'.format(org, number)),
+                org=org, credits=float(number), course_version=u'v1'
+            ) for number, org in enumerate(['TestX', 'TestX', 'OtherX'])
+        ]
+
+    def _get(self, user=None, **params):
+        headers = dict((name, params.pop(name)) for name in list(params) if name.startswith('HTTP_'))
+        request = RequestFactory().get('/api/v1/course_extension_fields/', params, **headers)
+        request.user = user or self.staff
+        return views.course_extension_fields(request)
+
+    def _json(self, response):
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_staff_only(self):
+        self.assertEqual(self._get(user=AnonymousUser()).status_code, 403)
+        learner = User.objects.create_user('learner', 'learner@example.com', 'password')
+        self.assertEqual(self._get(user=learner).status_code, 403)
+
+    def test_cursor_round_trip(self):
+        page = self._json(self._get(page_size=2))
+        self.assertEqual([result['course_id'] for result in page['results']],
+                         [unicode(row.course_id) for row in self.rows[:2]])
+        cursor = urlparse.parse_qs(urlparse.urlparse(page['next']).query)['cursor'][0]
+        self.assertEqual(views.decode_cursor(cursor), self.rows[1].id)
+        page = self._json(self._get(page_size=2, cursor=cursor))
+        self.assertEqual([result['course_id'] for result in page['results']], [unicode(self.rows[2].course_id)])
+        self.assertIsNone(page['next'])
+
+    def test_invalid_parameters(self):
+        for params in ({'cursor': '!'}, {'page_size': 'ten'}, {'page_size': views.MAX_PAGE_SIZE + 1},
+                       {'fields': 'credits,grade'}, {'credits': '1.0'}):
+            self.assertEqual(self._get(**params).status_code, 400, params)
+
+    def test_fields_and_filters(self):
+        page = self._json(self._get(fields='credits', org='TestX'))
+        self.assertEqual(page['results'], [
+            {'course_id': unicode(row.course_id), 'credits': row.credits} for row in self.rows[:2]
+        ])
+
+    def test_not_modified(self):
+        response = self._get(org='TestX')
+        etag = response['ETag']
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(self._get(org='TestX', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self._get(org='OtherX', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_modified_when_a_row_leaves_the_page(self):
+        etag = self._get(org='TestX')['ETag']
+        self.rows[1].delete()
+        response = self._get(org='TestX', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(self._json(response)['results']), 1)
+
+
+@_features(LINKEDIN_ADDTOPROFILE_COMPANY_ID=1234, CERTS_HTML_VIEW_CONFIGURATION={'default': {'platform_name': 'Test'}})
+class ConfigSyncTest(TestCase):
+    """
+    Tests for syncing site-wide configurations with the settings
+    """
+
+    def _counts(self):
+        return [spec.model.objects.count() for spec in config_sync.CONFIGS]
+
+    def test_second_sync_writes_nothing(self):
+        self.assertEqual([result.status for result in config_sync.sync()], [config_sync.CREATED] * 3)
+        self.assertEqual(LinkedInAddToProfileConfiguration.objects.get().company_identifier, u'1234')
+        counts = self._counts()
+        self.assertEqual([result.status for result in config_sync.sync()], [config_sync.UNCHANGED] * 3)
+        self.assertEqual(self._counts(), counts)
+
+    def test_changed_settings(self):
+        config_sync.sync()
+        with _features(LINKEDIN_ADDTOPROFILE_COMPANY_ID=5678):
+            (result, ) = config_sync.sync(['linkedin'])
+        self.assertEqual(result.status, config_sync.CREATED)
+        self.assertEqual(LinkedInAddToProfileConfiguration.objects.count(), 2)
+
+    def test_dry_run(self):
+        CertificateHtmlViewConfiguration.objects.create(configuration='{}', enabled=True)
+        stdout = StringIO()
+        call_command('appsembler_sync_config', dry_run=True, stdout=stdout)
+        self.assertIn(u'cert_html_view: created, 1 other enabled row(s) disabled', stdout.getvalue())
+        self.assertEqual(self._counts(), [0, 0, 1])
+        self.assertTrue(CertificateHtmlViewConfiguration.objects.get().enabled)
+
+    def test_disables_other_html_view_configs(self):
+        for configuration in ('{}', '{"default": {}}'):
+            CertificateHtmlViewConfiguration.objects.create(configuration=configuration, enabled=True)
+        (result, ) = config_sync.sync(['cert_html_view'])
+        self.assertEqual((result.status, result.disabled), (config_sync.CREATED, 2))
+        enabled = CertificateHtmlViewConfiguration.objects.get(enabled=True)
+        self.assertEqual(json.loads(enabled.configuration), {'default': {'platform_name': 'Test'}})
+
+    def test_one_transaction(self):
+        with mock.patch.object(CertificateHtmlViewConfiguration, 'save', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                config_sync.sync()
+        self.assertEqual(self._counts(), [0, 0, 0])
@@ -0,0 +1,178 @@
+"""
+Pacing for appsembler_setup_courses runs on shared datastores.
+
+A Throttle lets courses be set up at no more than max_rate per second, with
+a token bucket, and backs off when the datastores slow down: after each
+course, the mean latency of its modulestore operations and DB queries is
+fed to observe(), and while a moving average of it is above
+latency_threshold, each course waits a little longer before it starts,
+doubling up to MAX_BACKOFF.  The wait halves again once latency is back
+under the threshold.
+
+Courses are paced where they are handed out, so with worker processes the
+rate applies to the run as a whole.  The bulk reads and writes done for
+each batch of courses before they are handed out are paced and observed
+the same way, each batch taking one token like a course.
+"""
+import logging
+import threading
+import time
+
+from appsembleredx import instrumentation
+
+
+logger = logging.getLogger(__name__)
+
+MIN_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+# weight of the latest course in the moving average of latency
+LATENCY_SMOOTHING = 0.3
+
+# instrumented functions that wait on the modulestore or contentstore
+DATASTORE_PHASES = (
+    'signals._get_course',
+    'signals._update_course',
+    'signals.store_theme_signature_img_as_asset',
+)
+
+
+class LatencySink(object):
+    """
+    Instrumentation sink collecting the wall times of DATASTORE_PHASES
+    called on the thread that is probing a course
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def start(self):
+        self.local.wall_times = []
+
+    def stop(self):
+        wall_times, self.local.wall_times = self.local.wall_times, None
+        return wall_times
+
+    def record(self, name, wall_time, counters):  # pylint: disable=unused-argument
+        wall_times = getattr(self.local, 'wall_times', None)
+        if wall_times is not None and name in DATASTORE_PHASES:
+            wall_times.append(wall_time)
+
+
+_sink = None
+
+
+def _get_sink():
+    global _sink  # pylint: disable=global-statement
+    if _sink is None:
+        _sink = LatencySink()
+        instrumentation.add_sink(_sink)
+    return _sink
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else None
+
+
+class LatencyProbe(object):
+    """
+    Context manager measuring the datastore latency of setting up one
+    course: the larger of the mean modulestore operation time and the mean
+    DB query time, in seconds, or None if the course made neither
+    """
+
+    def __init__(self):
+        self.latency = None
+
+    def __enter__(self):
+        self.sink = _get_sink()
+        self.sink.start()
+        self.measuring = instrumentation.measuring()
+        self.counters = self.measuring.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.measuring.__exit__(*exc_info)
+        queries = self.counters[instrumentation.DB_QUERIES]
+        query_time = self.counters[instrumentation.DB_QUERY_SECONDS] / queries if queries else None
+        latencies = [latency for latency in (_mean(self.sink.stop()), query_time) if latency is not None]
+        self.latency = max(latencies) if latencies else None
+        return False
+
+
+class Throttle(object):
+    """
+    Token bucket of max_rate courses per second (no limit if None), with
+    backoff while datastore latency is above latency_threshold seconds (no
+    backoff if None).  Thread-safe.
+    """
+
+    def __init__(self, max_rate=None, latency_threshold=None):
+        self.max_rate = max_rate
+        self.latency_threshold = latency_threshold
+        self.lock = threading.Lock()
+        self.tokens = 1.0
+        self.updated = time.time()
+        self.latency = None
+        self.backoff = 0.0
+        self.backoffs = 0
+        self.waited = 0.0
+
+    @property
+    def probes_latency(self):
+        return self.latency_threshold is not None
+
+    def _reserve(self):
+        """
+        Take a token, returning how long to wait for it
+        """
+        if not self.max_rate:
+            return 0.0
+        now = time.time()
+        capacity = max(self.max_rate, 1.0)
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * self.max_rate)
+        self.updated = now
+        self.tokens -= 1
+        return -self.tokens / self.max_rate if self.tokens < 0 else 0.0
+
+    def acquire(self):
+        """
+        Wait until the next course may start
+        """
+        with self.lock:
+            wait = self._reserve() + self.backoff
+        if wait > 0:
+            time.sleep(wait)
+            with self.lock:
+                self.waited += wait
+
+    def observe(self, latency):
+        """
+        Take the datastore latency of a course into account
+        """
+        if latency is None or self.latency_threshold is None:
+            return
+        with self.lock:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+            if self.latency > self.latency_threshold:
+                if not self.backoff:
+                    logger.warning(u"Datastore latency %.1fms is above %.1fms, backing off",
+                                   self.latency * 1000, self.latency_threshold * 1000)
+                self.backoff = min(MAX_BACKOFF, max(MIN_BACKOFF, self.backoff * 2))
+                self.backoffs += 1
+            elif self.backoff:
+                self.backoff = self.backoff / 2 if self.backoff > MIN_BACKOFF else 0.0
+
+    def lines(self):
+        """
+        Human-readable summary of the pacing
+        """
+        limits = []
+        if self.max_rate:
+            limits.append(u"at most {:g} course(s)/s".format(self.max_rate))
+        if self.latency_threshold is not None:
+            limits.append(u"latency threshold {:g}ms".format(self.latency_threshold * 1000))
+        yield u"Throttled to {}: waited {:.1f}s, backed off {} time(s)".format(
+            u", ".join(limits), self.waited, self.backoffs)
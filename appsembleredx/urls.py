@@ -1 +1,13 @@
-#
+"""
+URLs for appsembleredx, to include in the LMS urls, e.g.
+
+    url(r'^appsembler/', include('appsembleredx.urls')),
+"""
+from django.conf.urls import url
+
+from appsembleredx import views
+
+
+urlpatterns = [
+    url(r'^api/v1/course_extension_fields/$', views.course_extension_fields, name='course_extension_fields'),
+]
@@ -0,0 +1,154 @@
+"""
+Read-only API over CourseExtensionFields, for integrations that need the
+credit and instruction type fields of many courses.
+
+Results are ordered by row and paginated with an opaque cursor.  Each page
+carries an ETag computed from the ids and versions of the courses on it, so
+clients can revalidate pages with If-None-Match and get 304s for pages that
+haven't changed.  There is no Last-Modified: the latest change among the
+rows on a page doesn't change when a row leaves it.
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+
+from appsembleredx.extension_fields import MIRRORED_FIELDS
+from appsembleredx.models import CourseExtensionFields
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# fields a client can ask for with ?fields=, course_id is always included
+FIELDS = ('org', ) + MIRRORED_FIELDS + ('course_version', 'modified')
+
+# indexed columns results can be filtered on, e.g. ?field_of_study=Nursing
+FILTERS = ('org', 'credit_provider', 'field_of_study', 'instructional_method', 'instruction_location')
+
+PARAMETERS = ('fields', 'page_size', 'cursor') + FILTERS
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def encode_cursor(row_id):
+    return base64.urlsafe_b64encode(str(row_id))
+
+
+def decode_cursor(cursor):
+    """
+    Row id after which the next page starts, or ValueError
+    """
+    try:
+        return int(base64.urlsafe_b64decode(str(cursor)))
+    except (TypeError, binascii.Error, UnicodeEncodeError):
+        raise ValueError(cursor)
+
+
+def _page_etag(params, rows):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True))
+    for row in rows:
+        digest.update(u"{}|{}|{}\n".format(row['id'], row['course_version'], row['modified'].isoformat()))
+    return '"{}"'.format(digest.hexdigest())
+
+
+def _not_modified(request, etag):
+    """
+    Whether the client's copy of the page, per If-None-Match, is current
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or 'W/' + etag in tags
+
+
+def _serialize(value):
+    if value is None or isinstance(value, (basestring, int, long, float, bool)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return unicode(value)
+
+
+@require_GET
+def course_extension_fields(request):
+    """
+    Course extension fields of many courses.  Query parameters, all optional:
+
+        fields     comma-separated names of the fields to return
+        page_size  number of courses per page, at most MAX_PAGE_SIZE
+        cursor     the cursor of the page to get, from the previous page's next
+        org, credit_provider, field_of_study, instructional_method, instruction_location
+                   only return courses with this value
+
+    Other parameters are rejected, rather than ignored.
+
+    Returns {"results": [{"course_id": ..., <field>: ...}, ...], "next": <url or null>}
+    """
+    if not request.user.is_authenticated() or not request.user.is_staff:
+        return _error(u"Only staff can list course extension fields", status=403)
+
+    unknown = sorted(name for name in request.GET if name not in PARAMETERS)
+    if unknown:
+        return _error(u"Unknown parameter(s): {}".format(u", ".join(unknown)))
+
+    fields = FIELDS
+    if request.GET.get('fields'):
+        fields = tuple(name.strip() for name in request.GET['fields'].split(',') if name.strip())
+        unknown = [name for name in fields if name not in FIELDS]
+        if unknown:
+            return _error(u"Unknown field(s): {}".format(u", ".join(unknown)))
+
+    try:
+        page_size = int(request.GET.get('page_size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return _error(u"page_size must be a number")
+    if not 0 < page_size <= MAX_PAGE_SIZE:
+        return _error(u"page_size must be between 1 and {}".format(MAX_PAGE_SIZE))
+
+    rows = CourseExtensionFields.objects.order_by('id')
+    filters = dict((name, request.GET[name]) for name in FILTERS if name in request.GET)
+    if filters:
+        rows = rows.filter(**filters)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            rows = rows.filter(id__gt=decode_cursor(cursor))
+        except ValueError:
+            return _error(u"Invalid cursor")
+
+    columns = set(('id', 'course_id', 'course_version', 'modified') + fields)
+    rows = list(rows.values(*columns)[:page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    etag = _page_etag(
+        {'fields': fields, 'filters': filters, 'cursor': cursor, 'page_size': page_size, 'has_next': has_next},
+        rows
+    )
+    if _not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        next_url = None
+        if has_next:
+            params = request.GET.copy()
+            params['cursor'] = encode_cursor(rows[-1]['id'])
+            next_url = request.build_absolute_uri(u"{}?{}".format(request.path, params.urlencode()))
+        response = JsonResponse({
+            'results': [
+                dict([('course_id', unicode(row['course_id']))] + [(name, _serialize(row[name])) for name in fields])
+                for row in rows
+            ],
+            'next': next_url,
+        })
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=0)
+    return response
@@ -0,0 +1,71 @@
+"""
+Django settings for running appsembleredx against the stand-ins in
+stub_platform, with SQLite and a local memory cache
+"""
+import tempfile
+
+SECRET_KEY = 'benchmarks'
+DEBUG = False
+USE_TZ = True
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'django.contrib.auth',
+    'course_modes',
+    'certificates',
+    'student',
+    'openedx.core.djangoapps.content.course_overviews',
+    'appsembleredx',
+]
+
+STATIC_URL = '/static/'
+STATIC_ROOT = tempfile.mkdtemp(prefix='appsembleredx-benchmarks-')
+STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+FEATURES = {'ENABLE_OPENBADGES': False}
+
+SIGNATURE_IMAGE_PATHS = ['themes/bench/images/sig-1.png', 'themes/bench/images/sig-2.png']
+
+ENV_TOKENS = {
+    'APPSEMBLER_FEATURES': {
+        'DEFAULT_COURSE_MODE_SLUG': 'honor',
+        'USE_OPEN_ENDED_CERTS_DEFAULTS': True,
+        'ALWAYS_ENABLE_SELF_GENERATED_CERTS': True,
+        'ENABLE_CREDITS_EXTRA_FIELDS': True,
+        'ENABLE_INSTRUCTION_TYPE_EXTRA_FIELDS': True,
+        'CREDIT_PROVIDERS': ['NASBA', 'ACPE'],
+        'COURSE_FIELDS_OF_STUDY': ['Accounting', 'Finance', 'Ethics'],
+        'COURSE_INSTRUCTIONAL_METHODS': ['Group Live', 'Self-Study'],
+        'COURSE_INSTRUCTION_LOCATIONS': ['Online', 'Classroom'],
+        'RUN_PUBLISH_HANDLERS_ASYNC': False,
+        'DEFAULT_CERT_SIGNATORIES': [
+            {'name': u'Signatory {}'.format(i), 'title': 'Director', 'organization': 'Benchmarks',
+             'signature_image_path': path}
+            for i, path in enumerate(SIGNATURE_IMAGE_PATHS)
+        ],
+    }
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'level': 'ERROR'},
+    },
+    'loggers': {
+        'appsembleredx': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
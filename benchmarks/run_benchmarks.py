@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+Offline benchmarks for appsembleredx.
+
+Runs the publish handlers, make_default_cert, XMLDefinitionChainingMixin and
+appsembler_setup_courses against synthetic catalogs, using the in-memory
+modulestore and contentstore in stub_platform and an in-memory SQLite
+database, so no Open edX stack is needed.  Needs Django 1.8, edx-opaque-keys
+and XBlock on a Python 2.7 path.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 10,1000 --output after.json --compare before.json
+
+Reports throughput and latency percentiles per scenario and catalog size,
+and writes them as JSON with --output.  --compare prints the change from an
+earlier JSON report.
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, 'stub_platform'), HERE, os.path.dirname(HERE)]
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmark_settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.apps import apps  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from opaque_keys.edx.keys import CourseKey  # noqa: E402
+from xmodule.contentstore import django as contentstore_django  # noqa: E402
+from xmodule.modulestore import django as modulestore_django  # noqa: E402
+from xmodule.modulestore.django import SignalHandler, modulestore  # noqa: E402
+
+from appsembleredx import course_setup, signals  # noqa: E402
+
+
+DEFAULT_SIZES = (10, 1000, 10000)
+# a 1x1 PNG
+SIGNATURE_IMAGE = (
+    '\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4'
+    '\x89\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd8N\x00\x00\x00\x00IEND\xaeB`\x82'
+)
+
+
+def create_tables():
+    with connection.schema_editor() as editor:
+        for model in apps.get_models():
+            editor.create_model(model)
+
+
+def write_signature_images():
+    for path in settings.SIGNATURE_IMAGE_PATHS:
+        full_path = os.path.join(settings.STATIC_ROOT, path)
+        if not os.path.isdir(os.path.dirname(full_path)):
+            os.makedirs(os.path.dirname(full_path))
+        with open(full_path, 'wb') as image:
+            image.write(SIGNATURE_IMAGE)
+
+
+def reset_state():
+    """ Empty every table, store and cache """
+    for model in apps.get_models():
+        model.objects.all().delete()
+    modulestore_django.clear_existing_modulestores()
+    contentstore_django._CONTENTSTORE.clear()  # pylint: disable=protected-access
+    signals._THEME_SIGNATURE_IMAGES.clear()  # pylint: disable=protected-access
+    signals._STORED_SIGNATURE_DIGESTS.clear()  # pylint: disable=protected-access
+    cache.clear()
+
+
+def make_catalog(size):
+    """
+    Create size courses in the modulestore, a third of them self-paced, and
+    return their keys
+    """
+    store = modulestore()
+    course_keys = []
+    for i in range(size):
+        course_key = CourseKey.from_string(u'course-v1:BenchOrg{}+C{}+Run'.format(i % 7, i))
+        store.create_course(
+            course_key,
+            display_name=u'Course {}'.format(i),
+            self_paced=(i % 3 == 0),
+            credit_provider='NASBA',
+            credits=float(i % 5),
+            field_of_study='Accounting',
+        )
+        course_keys.append(course_key)
+    return course_keys
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(pct / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def summarize(scenario, size, latencies, elapsed):
+    latencies = sorted(latencies)
+    ops = len(latencies)
+    return {
+        'scenario': scenario,
+        'courses': size,
+        'ops': ops,
+        'seconds': round(elapsed, 4),
+        'throughput': round(ops / elapsed, 2) if elapsed else None,
+        'latency_ms': dict(
+            [('p{}'.format(p), round(percentile(latencies, p) * 1000, 3)) for p in (50, 90, 99)] +
+            [('max', round(latencies[-1] * 1000, 3) if latencies else 0.0),
+             ('mean', round(sum(latencies) / ops * 1000, 3) if ops else 0.0)]
+        ),
+    }
+
+
+def timed_calls(course_keys, func):
+    latencies = []
+    started = time.time()
+    for course_key in course_keys:
+        call_started = time.time()
+        func(course_key)
+        latencies.append(time.time() - call_started)
+    return latencies, time.time() - started
+
+
+def publish(course_key):
+    SignalHandler.pre_publish.send(sender=None, course_key=course_key)
+    SignalHandler.course_published.send(sender=None, course_key=course_key)
+
+
+def bench_first_publish(course_keys):
+    """ Publish each course for the first time: every handler has work to do """
+    return timed_calls(course_keys, publish)
+
+
+def bench_republish(course_keys):
+    """ Publish already set-up courses again: the common case in Studio """
+    for course_key in course_keys:
+        publish(course_key)
+    return timed_calls(course_keys, publish)
+
+
+def bench_make_default_cert(course_keys):
+    return timed_calls(course_keys, signals.make_default_cert)
+
+
+def bench_xml_definition_chain(course_keys):
+    store = modulestore()
+    courses = [store.get_course(course_key) for course_key in course_keys]
+
+    def export_import(course):
+        course.definition_to_xml(None)
+        type(course).definition_from_xml({}, [])
+
+    return timed_calls(courses, export_import)
+
+
+def bench_setup_courses(course_keys):
+    """ appsembler_setup_courses --all, serially """
+    latencies = []
+    setup_course = course_setup.setup_course
+
+    def timed_setup_course(*args, **kwargs):
+        call_started = time.time()
+        try:
+            return setup_course(*args, **kwargs)
+        finally:
+            latencies.append(time.time() - call_started)
+
+    course_setup.setup_course = timed_setup_course
+    try:
+        started = time.time()
+        report = course_setup.run_serial(course_setup.iter_all_course_keys())
+        elapsed = time.time() - started
+    finally:
+        course_setup.setup_course = setup_course
+    if report.failed:
+        raise RuntimeError(u"setup failed for {} course(s), e.g. {}".format(len(report.failed), report.failed[0]))
+    return latencies, elapsed
+
+
+SCENARIOS = [
+    ('first_publish', bench_first_publish),
+    ('republish', bench_republish),
+    ('make_default_cert', bench_make_default_cert),
+    ('xml_definition_chain', bench_xml_definition_chain),
+    ('setup_courses', bench_setup_courses),
+]
+
+
+def compare(results, baseline):
+    """ Lines comparing results with an earlier report """
+    earlier = dict(((r['scenario'], r['courses']), r) for r in baseline['results'])
+    for result in results:
+        before = earlier.get((result['scenario'], result['courses']))
+        if not before or not before['throughput']:
+            continue
+        yield u"{:<22} {:>6} courses: throughput x{:.2f}, p50 {:+.3f}ms, p99 {:+.3f}ms".format(
+            result['scenario'], result['courses'],
+            result['throughput'] / before['throughput'],
+            result['latency_ms']['p50'] - before['latency_ms']['p50'],
+            result['latency_ms']['p99'] - before['latency_ms']['p99'],
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma-separated catalog sizes (default: %(default)s)')
+    parser.add_argument('--scenarios', default=','.join(name for name, _bench in SCENARIOS),
+                        help='Comma-separated scenarios to run (default: all)')
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Compare with results from an earlier --output file')
+    options = parser.parse_args(argv)
+
+    sizes = [int(size) for size in options.sizes.split(',')]
+    wanted = options.scenarios.split(',')
+    unknown = set(wanted) - set(name for name, _bench in SCENARIOS)
+    if unknown:
+        parser.error(u"unknown scenario(s): {}".format(', '.join(sorted(unknown))))
+
+    create_tables()
+    write_signature_images()
+
+    results = []
+    for name, bench in SCENARIOS:
+        if name not in wanted:
+            continue
+        for size in sizes:
+            reset_state()
+            course_keys = make_catalog(size)
+            latencies, elapsed = bench(course_keys)
+            result = summarize(name, size, latencies, elapsed)
+            results.append(result)
+            print(u"{:<22} {:>6} courses: {:>9.1f} ops/s  p50 {:>8.3f}ms  p90 {:>8.3f}ms  p99 {:>8.3f}ms".format(
+                name, size, result['throughput'] or 0,
+                result['latency_ms']['p50'], result['latency_ms']['p90'], result['latency_ms']['p99']))
+
+    report = {
+        'created': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'results': results,
+    }
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as baseline:
+            print(u"\nCompared with {}:".format(options.compare))
+            for line in compare(results, json.load(baseline)):
+                print(line)
+
+
+if __name__ == '__main__':
+    main()
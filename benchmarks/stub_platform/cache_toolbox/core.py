@@ -0,0 +1,2 @@
+def del_cached_content(location):  # pylint: disable=unused-argument
+    pass
@@ -0,0 +1,11 @@
+"""
+Stand-in for celery.task: tasks run synchronously
+"""
+
+
+def task(*args, **kwargs):  # pylint: disable=unused-argument
+    def decorator(func):
+        func.delay = func
+        func.apply_async = lambda args=(), kwargs=None, **options: func(*args, **(kwargs or {}))
+        return func
+    return decorator
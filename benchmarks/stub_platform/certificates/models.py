@@ -0,0 +1,52 @@
+"""
+Stand-in for edx-platform's certificates.models
+"""
+from django.db import models
+
+from openedx.core.djangoapps.xmodule_django.models import CourseKeyField
+
+
+class ConfigurationModel(models.Model):
+    """ Minimal config_models.models.ConfigurationModel: the latest row is current """
+    change_date = models.DateTimeField(auto_now_add=True)
+    enabled = models.BooleanField(default=False)
+
+    class Meta(object):
+        abstract = True
+        ordering = ('-change_date', )
+
+    @classmethod
+    def current(cls):
+        return cls.objects.order_by('-change_date', '-id').first() or cls()
+
+
+class CertificateGenerationConfiguration(ConfigurationModel):
+    class Meta(ConfigurationModel.Meta):
+        app_label = 'certificates'
+
+
+class CertificateHtmlViewConfiguration(ConfigurationModel):
+    configuration = models.TextField()
+
+    class Meta(ConfigurationModel.Meta):
+        app_label = 'certificates'
+
+
+class CertificateGenerationCourseSetting(models.Model):
+    course_key = CourseKeyField(db_index=True)
+    enabled = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta(object):
+        app_label = 'certificates'
+        get_latest_by = 'created'
+
+    @classmethod
+    def is_enabled_for_course(cls, course_key):
+        latest = cls.objects.filter(course_key=course_key).order_by('-created', '-id').first()
+        return latest.enabled if latest else False
+
+    @classmethod
+    def set_enabled_for_course(cls, course_key, is_enabled):
+        cls.objects.create(course_key=course_key, enabled=is_enabled)
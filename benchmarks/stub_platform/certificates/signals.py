@@ -0,0 +1,11 @@
+"""
+Stand-in for edx-platform's certificates.signals
+"""
+
+
+class _Task(object):
+    def delay(self, course_key):
+        pass
+
+
+enable_self_generated_certs = _Task()
@@ -0,0 +1,2 @@
+def query_yes_no(question, default="yes"):  # pylint: disable=unused-argument
+    return True
@@ -0,0 +1,62 @@
+"""
+Stand-in for Studio's certificate views: just the parts appsembleredx uses
+"""
+import json
+
+CERTIFICATE_SCHEMA_VERSION = 1
+
+
+class CertificateValidationError(Exception):
+    pass
+
+
+class Certificate(object):
+    def __init__(self, course, certificate_data):
+        self.course = course
+        self._certificate_data = certificate_data
+        self.id = certificate_data['id']
+
+    @property
+    def certificate_data(self):
+        return self._certificate_data
+
+
+class CertificateManager(object):
+    @staticmethod
+    def parse(json_string):
+        certificate = json.loads(json_string)
+        certificate['version'] = 1
+        if certificate.get('signatories') is None:
+            certificate['signatories'] = []
+        certificate['editing'] = False
+        return certificate
+
+    @staticmethod
+    def validate(certificate_data):
+        if certificate_data.get('version') != CERTIFICATE_SCHEMA_VERSION:
+            raise TypeError("Unsupported certificate schema version: {0}.  Expected version: {1}.".format(
+                certificate_data.get('version'), CERTIFICATE_SCHEMA_VERSION))
+        if not certificate_data.get('name'):
+            raise CertificateValidationError("must have name of the certificate")
+
+    @staticmethod
+    def get_used_ids(course):
+        return set(cert['id'] for cert in course.certificates.get('certificates', []))
+
+    @staticmethod
+    def assign_id(course, certificate_data, certificate_id=None):
+        used_ids = CertificateManager.get_used_ids(course)
+        if certificate_id:
+            certificate_data['id'] = int(certificate_id)
+        else:
+            certificate_data['id'] = max(used_ids | set([100])) + 1
+        for index, signatory in enumerate(certificate_data['signatories']):
+            signatory['id'] = index
+        return certificate_data
+
+    @staticmethod
+    def deserialize_certificate(course, value):
+        certificate_data = CertificateManager.parse(value)
+        CertificateManager.validate(certificate_data)
+        certificate_data = CertificateManager.assign_id(course, certificate_data, certificate_data.get('id', None))
+        return Certificate(course, certificate_data)
@@ -0,0 +1,44 @@
+"""
+Stand-in for edx-platform's course_modes.models
+"""
+from collections import namedtuple
+
+from django.db import models
+
+from openedx.core.djangoapps.xmodule_django.models import CourseKeyField
+
+
+Mode = namedtuple('Mode', [
+    'slug', 'name', 'min_price', 'suggested_prices', 'currency',
+    'expiration_datetime', 'description', 'sku', 'bulk_sku',
+])
+
+
+class CourseMode(models.Model):
+    course_id = CourseKeyField(db_index=True)
+    mode_slug = models.CharField(max_length=100)
+    mode_display_name = models.CharField(max_length=255)
+    min_price = models.IntegerField(default=0)
+    currency = models.CharField(default='usd', max_length=8)
+    suggested_prices = models.CharField(max_length=255, blank=True, default='')
+    expiration_datetime = models.DateTimeField(default=None, null=True, blank=True)
+    description = models.TextField(null=True, blank=True)
+    sku = models.CharField(max_length=255, null=True, blank=True)
+    bulk_sku = models.CharField(max_length=255, null=True, blank=True)
+
+    DEFAULT_MODE = Mode('audit', 'Audit', 0, '', 'usd', None, None, None, None)
+    DEFAULT_MODE_SLUG = 'audit'
+
+    class Meta(object):
+        app_label = 'course_modes'
+        unique_together = ('course_id', 'mode_slug', 'currency')
+
+    def to_tuple(self):
+        return Mode(self.mode_slug, self.mode_display_name, self.min_price, self.suggested_prices,
+                    self.currency, self.expiration_datetime, self.description, self.sku, self.bulk_sku)
+
+    @classmethod
+    def modes_for_course(cls, course_id, include_expired=False,
+                         only_selectable=True):  # pylint: disable=unused-argument
+        modes = [mode.to_tuple() for mode in cls.objects.filter(course_id=course_id)]
+        return modes or [cls.DEFAULT_MODE]
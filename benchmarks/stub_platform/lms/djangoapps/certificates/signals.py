@@ -0,0 +1 @@
+from certificates.signals import *  # noqa
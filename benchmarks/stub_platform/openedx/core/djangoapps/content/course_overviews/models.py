@@ -0,0 +1,26 @@
+"""
+Stand-in for edx-platform's CourseOverview
+"""
+from django.db import models
+
+from openedx.core.djangoapps.xmodule_django.models import CourseKeyField
+
+
+class CourseOverview(models.Model):
+    id = CourseKeyField(db_index=True, primary_key=True)
+    version = models.IntegerField(default=1)
+    display_name = models.TextField(null=True)
+    self_paced = models.BooleanField(default=False)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta(object):
+        app_label = 'course_overviews'
+
+    @classmethod
+    def get_from_id(cls, course_id):
+        try:
+            return cls.objects.get(id=course_id)
+        except cls.DoesNotExist:
+            from xmodule.modulestore.django import modulestore
+            course = modulestore().get_course(course_id)
+            return cls.objects.create(id=course_id, display_name=course.display_name, self_paced=course.self_paced)
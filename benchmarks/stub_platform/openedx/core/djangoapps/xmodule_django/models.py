@@ -0,0 +1,26 @@
+"""
+Stand-in for edx-platform's CourseKeyField
+"""
+from django.db import models
+from opaque_keys.edx.keys import CourseKey
+
+
+class CourseKeyField(models.CharField):
+    """ Stores a CourseKey as its string form """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', 255)
+        super(CourseKeyField, self).__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection, context):  # pylint: disable=unused-argument
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if not value or isinstance(value, CourseKey):
+            return value
+        return CourseKey.from_string(value)
+
+    def get_prep_value(self, value):
+        if not value:
+            return value
+        return unicode(value)
@@ -0,0 +1,18 @@
+"""
+Stand-in for edx-platform's request_cache.middleware
+"""
+import threading
+
+_REQUEST_CACHE = threading.local()
+
+
+class RequestCache(object):
+    @classmethod
+    def get_request_cache(cls):
+        if not hasattr(_REQUEST_CACHE, 'data'):
+            _REQUEST_CACHE.data = {}
+        return _REQUEST_CACHE
+
+    @classmethod
+    def clear_request_cache(cls):
+        _REQUEST_CACHE.data = {}
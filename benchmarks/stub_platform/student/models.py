@@ -0,0 +1,18 @@
+"""
+Stand-in for edx-platform's student.models
+"""
+from django.db import models
+
+from certificates.models import ConfigurationModel
+
+
+class LinkedInAddToProfileConfiguration(ConfigurationModel):
+    MODE_TO_CERT_NAME = {
+        'honor': u'{platform_name} Honor Code Certificate for {course_name}',
+        'verified': u'{platform_name} Verified Certificate for {course_name}',
+    }
+
+    company_identifier = models.TextField()
+
+    class Meta(ConfigurationModel.Meta):
+        app_label = 'student'
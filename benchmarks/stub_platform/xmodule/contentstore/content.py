@@ -0,0 +1,22 @@
+"""
+Stand-in for edx-platform's StaticContent
+"""
+
+
+class StaticContent(object):
+    def __init__(self, loc, name, content_type, data, last_modified_at=None, thumbnail_location=None,
+                 import_path=None, length=None, locked=False, content_digest=None):
+        self.location = loc
+        self.name = name
+        self.content_type = content_type
+        self._data = data
+        self.length = length if length is not None else len(data)
+        self.content_digest = content_digest
+
+    @property
+    def data(self):
+        return self._data
+
+    @staticmethod
+    def compute_location(course_key, path, revision=None, is_thumbnail=False):  # pylint: disable=unused-argument
+        return course_key.make_asset_key('asset', path.lstrip('/').replace('/', '_'))
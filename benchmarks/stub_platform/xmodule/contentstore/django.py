@@ -0,0 +1,39 @@
+"""
+Stand-in for edx-platform's xmodule.contentstore.django, with an in-memory
+contentstore that keeps an md5 of each file, as GridFS does
+"""
+import hashlib
+
+from xmodule.contentstore.content import StaticContent
+
+
+class InMemoryContentStore(object):
+
+    def __init__(self):
+        self.contents = {}
+        self.saves = 0
+
+    def save(self, content):
+        self.saves += 1
+        self.contents[unicode(content.location)] = StaticContent(
+            content.location, content.name, content.content_type, content.data,
+            content_digest=hashlib.md5(content.data).hexdigest()
+        )
+        return content
+
+    def find(self, location, throw_on_not_found=True, as_stream=False):  # pylint: disable=unused-argument
+        try:
+            return self.contents[unicode(location)]
+        except KeyError:
+            if throw_on_not_found:
+                raise
+            return None
+
+
+_CONTENTSTORE = {}
+
+
+def contentstore(name='default'):
+    if name not in _CONTENTSTORE:
+        _CONTENTSTORE[name] = InMemoryContentStore()
+    return _CONTENTSTORE[name]
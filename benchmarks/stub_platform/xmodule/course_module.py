@@ -0,0 +1,48 @@
+"""
+Stand-in for edx-platform's CourseDescriptor.  Instances keep their field
+values in a DictFieldData, like a course loaded from the modulestore.
+"""
+from lxml import etree
+from xblock.field_data import DictFieldData
+from xblock.fields import Boolean, Dict, Scope, ScopeIds, String, XBlockMixin
+
+from xmodule.xml_module import XmlDescriptor
+
+
+class SequenceDescriptor(XmlDescriptor):
+    @classmethod
+    def definition_from_xml(cls, definition, children):
+        return definition, children
+
+    def definition_to_xml(self, resource_fs):  # pylint: disable=unused-argument
+        xml_object = etree.Element('course')
+        for child in range(10):
+            etree.SubElement(xml_object, 'chapter', url_name='chapter_{}'.format(child))
+        return xml_object
+
+
+class CourseFields(XBlockMixin):
+    display_name = String(default='Course', scope=Scope.settings)
+    self_paced = Boolean(default=False, scope=Scope.settings)
+    certificates = Dict(default={}, scope=Scope.settings)
+    certificates_display_behavior = String(default='end', scope=Scope.settings)
+    certificates_show_before_end = Boolean(default=False, scope=Scope.settings)
+    cert_html_view_enabled = Boolean(default=False, scope=Scope.settings)
+    issue_badges = Boolean(default=True, scope=Scope.settings)
+
+
+class CourseDescriptor(CourseFields, SequenceDescriptor):
+
+    def __init__(self, course_key, field_data, course_version=None):
+        self.scope_ids = ScopeIds(None, 'course', course_key, course_key)
+        self._field_data = DictFieldData(field_data)
+        self._field_data_cache = {}
+        self._dirty_fields = {}
+        self.id = course_key
+        self.location = course_key
+        self.course_version = course_version
+        self._edited_by = 0
+
+    @property
+    def field_values(self):
+        return self._field_data._data  # pylint: disable=protected-access
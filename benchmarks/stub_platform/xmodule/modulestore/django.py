@@ -0,0 +1,84 @@
+"""
+Stand-in for edx-platform's xmodule.modulestore.django, with an in-memory
+modulestore.  Each get_course builds a new course instance from stored
+field values, and each update_item stores a new course version.
+"""
+from __future__ import absolute_import
+
+from collections import namedtuple
+from contextlib import contextmanager
+import copy
+import itertools
+
+import django.dispatch
+
+from xmodule import course_module
+
+
+CourseSummary = namedtuple('CourseSummary', ['id', 'display_name'])
+
+
+class SignalHandler(object):
+    pre_publish = django.dispatch.Signal(providing_args=['course_key'])
+    course_published = django.dispatch.Signal(providing_args=['course_key'])
+
+
+class InMemoryModuleStore(object):
+
+    def __init__(self):
+        self.courses = {}
+        self.versions = itertools.count(1)
+        self.reads = 0
+        self.writes = 0
+
+    def _course_class(self):
+        # like XBlock's mixologist, build the concrete class after mixins are patched in
+        if not hasattr(self, '_concrete_course_class'):
+            self._concrete_course_class = type(
+                'CourseDescriptorWithMixins', (course_module.CourseDescriptor, ), {}
+            )
+        return self._concrete_course_class
+
+    def create_course(self, course_key, **fields):
+        self.courses[unicode(course_key)] = (course_key, copy.deepcopy(fields), next(self.versions))
+
+    def get_course(self, course_key, depth=0, **kwargs):  # pylint: disable=unused-argument
+        self.reads += 1
+        try:
+            course_key, fields, version = self.courses[unicode(course_key)]
+        except KeyError:
+            return None
+        return self._course_class()(course_key, copy.deepcopy(fields), version)
+
+    def get_courses(self, **kwargs):
+        return [self.get_course(course_key) for course_key, _fields, _version in self.courses.values()]
+
+    def get_course_summaries(self, **kwargs):  # pylint: disable=unused-argument
+        return [CourseSummary(course_key, fields.get('display_name'))
+                for course_key, fields, _version in self.courses.values()]
+
+    def update_item(self, xblock, user_id, **kwargs):  # pylint: disable=unused-argument
+        self.writes += 1
+        version = next(self.versions)
+        self.courses[unicode(xblock.id)] = (xblock.id, copy.deepcopy(xblock.field_values), version)
+        xblock.course_version = version
+        return xblock
+
+    @contextmanager
+    def bulk_operations(self, course_key):  # pylint: disable=unused-argument
+        yield
+
+
+_MIXED_MODULESTORE = None
+
+
+def modulestore():
+    global _MIXED_MODULESTORE  # pylint: disable=global-statement
+    if _MIXED_MODULESTORE is None:
+        _MIXED_MODULESTORE = InMemoryModuleStore()
+    return _MIXED_MODULESTORE
+
+
+def clear_existing_modulestores():
+    global _MIXED_MODULESTORE  # pylint: disable=global-statement
+    _MIXED_MODULESTORE = None
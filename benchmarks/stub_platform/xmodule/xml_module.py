@@ -0,0 +1,16 @@
+"""
+Stand-in for edx-platform's xmodule.xml_module
+"""
+
+
+class XmlParserMixin(object):
+    @classmethod
+    def definition_from_xml(cls, definition, children):
+        raise NotImplementedError
+
+    def definition_to_xml(self, resource_fs):
+        raise NotImplementedError
+
+
+class XmlDescriptor(XmlParserMixin):
+    pass